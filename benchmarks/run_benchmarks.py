@@ -0,0 +1,178 @@
+"""
+Time the hot paths of the cleaning scripts on synthetic data and keep a history of the results.
+
+    python run_benchmarks.py --sizes 10000 1000000 --repeat 3
+
+Every run is appended to results.jsonl, and each timing is compared with the median of the earlier runs
+of the same benchmark and size, so a regression shows up as soon as it is introduced.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPO_DIRECTORY = os.path.dirname(BENCHMARKS_DIRECTORY)
+sys.path.append(REPO_DIRECTORY)
+sys.path.append(os.path.join(REPO_DIRECTORY, 'example_existing_cleaning_scripts'))
+
+from cleaning_utils.consolidation import consolidate_language_data
+from cleaning_utils.language_rules import apply_language_rules
+from cleaning_utils.search_queries import normalize_search_query, fix_entity_results, prepare_entity_search_queries
+from cleaning_utils.polars_engine import POLARS_AVAILABLE, prepare_with_polars
+from cleaning_utils.category_counts import CategoryCountCache
+from cleaning_utils.name_matching import match_names
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA, apply_schema
+from clean_features import load_and_prepare_data, print_category_counts
+import synthetic_data
+
+RESULTS_PATH = os.path.join(BENCHMARKS_DIRECTORY, 'results.jsonl')
+DEFAULT_SIZES = [10000]
+REGRESSION_THRESHOLD = 1.25
+
+
+def search_queries(rows):
+    # With the compact dtypes `verify_results_exist` loads the join files with
+    df = apply_schema(synthetic_data.search_query_join(rows), SEARCH_QUERY_SCHEMA)
+    df['cleaned_search_query'] = normalize_search_query(df['search_query'])
+    return df
+
+
+def setup_clean_languages(rows):
+    return (search_queries(rows), 'full_name')
+
+
+def setup_consolidation(rows):
+    return (search_queries(rows), 'full_name')
+
+
+def setup_fix_results(rows):
+    return (search_queries(rows), 'full_name')
+
+
+def setup_prepare_search_queries(rows):
+    return (search_queries(rows), 'full_name', True)
+
+
+def setup_load_and_prepare_data(rows):
+    directory = tempfile.mkdtemp(prefix='benchmark-')
+    tw_df, serials_df = synthetic_data.column_distributions(rows)
+    tw_path = os.path.join(directory, 'tw_column_distribution.csv')
+    serials_path = os.path.join(directory, 'serials_column_distribution.csv')
+    tw_df.to_csv(tw_path, index=False)
+    serials_df.to_csv(serials_path, index=False)
+    return (os.path.join(directory, 'combined_column_distribution.csv'), tw_path, serials_path)
+
+
+def setup_print_category_counts(rows):
+    category_counts = CategoryCountCache(synthetic_data.classified_serials(rows), ['third_world_serials', 'sampled_serials'])
+    return (category_counts, 'third_world_serials', 'marc_0', 'too many for categorical', Console(file=io.StringIO(), width=120))
+
+
+def setup_match_names(rows):
+    people_df = synthetic_data.ischool_people(rows)
+    return (people_df.name.unique().tolist(), synthetic_data.committee_names(people_df.committee_member.unique()))
+
+
+# name: (setup function from a row count to the arguments, function to time, largest row count worth running)
+BENCHMARKS = {
+    'clean_languages': (setup_clean_languages, apply_language_rules, None),
+    'consolidate_language_data': (setup_consolidation, consolidate_language_data, None),
+    'fix_results': (setup_fix_results, fix_entity_results, None),
+    'load_and_prepare_data': (setup_load_and_prepare_data, load_and_prepare_data, None),
+    'print_category_counts': (setup_print_category_counts, print_category_counts, None),
+    'match_names': (setup_match_names, match_names, 100000),
+    'prepare_search_queries': (setup_prepare_search_queries, prepare_entity_search_queries, None),
+}
+if POLARS_AVAILABLE:
+    BENCHMARKS['prepare_search_queries_polars'] = (setup_prepare_search_queries, prepare_with_polars, None)
+
+
+def time_benchmark(setup_function, function, rows, repeat):
+    """
+    Return the best wall time over `repeat` runs. Arguments are rebuilt before every run since most stages
+    modify their input, and setup isn't timed.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup_function(rows)
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIRECTORY, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(results_path):
+    if not os.path.exists(results_path):
+        return pd.DataFrame(columns=['benchmark', 'rows', 'seconds'])
+    with open(results_path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def run_benchmarks(names, sizes, repeat, results_path):
+    """
+    Run the benchmarks, append the timings to the history and return them with the ratio to the historical median.
+    """
+    history = load_history(results_path)
+    baselines = history.groupby(['benchmark', 'rows']).seconds.median() if len(history) > 0 else pd.Series(dtype=float)
+    run = {'commit': git_commit(), 'timestamp': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(), 'pandas': pd.__version__}
+    results = []
+    with open(results_path, 'a') as f:
+        for name in names:
+            setup_function, function, max_rows = BENCHMARKS[name]
+            for rows in sizes:
+                if max_rows is not None and rows > max_rows:
+                    continue
+                seconds = time_benchmark(setup_function, function, rows, repeat)
+                result = {'benchmark': name, 'rows': rows, 'seconds': round(seconds, 6), **run}
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                baseline = baselines.get((name, rows))
+                results.append({**result, 'ratio': None if baseline is None else seconds / baseline})
+    return pd.DataFrame(results)
+
+
+def print_results(results, console, threshold=REGRESSION_THRESHOLD):
+    table = Table(show_header=True, header_style="bold magenta")
+    for column, justify in [('Benchmark', 'left'), ('Rows', 'right'), ('Seconds', 'right'), ('vs. history', 'right')]:
+        table.add_column(column, justify=justify)
+    for result in results.itertuples():
+        if pd.isna(result.ratio):
+            ratio = '-'
+        else:
+            style = 'red' if result.ratio > threshold else 'green'
+            ratio = f"[{style}]{result.ratio:.2f}x[/{style}]"
+        table.add_row(result.benchmark, f"{result.rows:,}", f"{result.seconds:.4f}", ratio)
+    console.print(table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='Row counts, e.g. 10000 1000000 10000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--results', default=RESULTS_PATH, help='The JSON lines history file')
+    parser.add_argument('--fail-on-regression', action='store_true', help=f'Exit with an error if a timing is over {REGRESSION_THRESHOLD}x its historical median')
+    args = parser.parse_args()
+
+    console = Console()
+    results = run_benchmarks(args.benchmarks, args.sizes, args.repeat, args.results)
+    print_results(results, console)
+    if args.fail_on_regression and (results.ratio.fillna(0) > REGRESSION_THRESHOLD).any():
+        sys.exit(1)
@@ -0,0 +1,106 @@
+"""Synthetic data shaped like the inputs of the cleaning scripts, for benchmarking at any size."""
+import numpy as np
+import pandas as pd
+
+FIRST_NAMES = ['Bonnie', 'Daniel', 'Maria', 'Wei', 'Aisha', 'Carlos', 'Elena', 'Kofi', 'Priya', 'Tomas', 'Yuki', 'Zoe']
+LAST_NAMES = ['Mak', 'Tracy', 'Garcia', 'Chen', 'Okafor', 'Silva', 'Novak', 'Mensah', 'Patel', 'Berg', 'Sato', 'LeBlanc']
+RESEARCH_AREAS = ['Archives and Preservation', 'Data Science', 'Digital Humanities', 'Information Policy', 'Human-Computer Interaction', 'Machine Learning']
+COMMITTEES = ['Undergraduate Programs', 'Faculty Affairs', 'Diversity and Inclusion', 'Doctoral Studies']
+LANGUAGES = np.array(['en', 'fr', 'zh', 'de', 'es', 'xh, zu', None], dtype=object)
+CATEGORIES = np.array(['well suited for categorical', 'could be categorical', 'too many for categorical'], dtype=object)
+SEARCH_TERM_SOURCES = np.array(['Digital Humanities', 'Humanities', 'Digital History'], dtype=object)
+
+
+def _names(rng, n):
+    first = rng.choice(FIRST_NAMES, n).astype(object)
+    last = rng.choice(LAST_NAMES, n).astype(object)
+    suffix = pd.Series(rng.integers(0, max(n // 10, 1), n)).astype(str).to_numpy(dtype=object)
+    return first + ' ' + last + ' ' + suffix
+
+
+def ischool_people(n, seed=0):
+    """
+    Rows shaped like `scraped_ischool_people.csv`.
+    """
+    rng = np.random.default_rng(seed)
+    names = _names(rng, n)
+    research_areas = rng.choice(RESEARCH_AREAS, n)
+    return pd.DataFrame({
+        'name': names,
+        'description': rng.choice(['Associate Professor', 'Professor', 'Affiliate Associate Professor', 'Lecturer'], n),
+        'url': 'https://ischool.illinois.edu/people/' + pd.Series(names).str.lower().str.replace(' ', '-'),
+        'research_area': research_areas,
+        'research_url': 'https://ischool.illinois.edu/research/areas/' + pd.Series(research_areas).str.lower().str.replace(' ', '-'),
+        'research_description': 'Protecting and maintaining collections and materials in archives',
+        'committee_member': names,
+        'score': 100.0,
+        'committee_title': rng.choice(COMMITTEES, n),
+    })
+
+
+def committee_names(original_names, seed=0, typo_rate=0.3):
+    """
+    Committee member names: the original names with some characters swapped, like names scraped from a second page.
+    """
+    rng = np.random.default_rng(seed)
+    names = pd.Series(original_names).to_numpy(dtype=object).copy()
+    for position in np.flatnonzero(rng.random(len(names)) < typo_rate):
+        name = names[position]
+        swap = rng.integers(0, len(name) - 1)
+        names[position] = name[:swap] + name[swap + 1] + name[swap] + name[swap + 2:]
+    return names.tolist()
+
+
+def column_distributions(n, seed=0):
+    """
+    A pair of frames shaped like the tw and serials MARC column distribution files, sharing most column names.
+    """
+    rng = np.random.default_rng(seed)
+    column_names = pd.Series(np.arange(n)).astype(str).radd('marc_').to_numpy(dtype=object)
+    frames = []
+    for offset in [0, n // 20]:
+        frames.append(pd.DataFrame({
+            'column_name': column_names[offset:],
+            'unique_values': rng.integers(1, 100000, n - offset),
+            'category': rng.choice(CATEGORIES, n - offset),
+        }))
+    return frames[0], frames[1]
+
+
+def classified_serials(n, cardinality=10000, seed=0):
+    """
+    A frame shaped like `combined_classified_serials_dataset.csv`: a classification and one high-cardinality MARC column.
+    """
+    rng = np.random.default_rng(seed)
+    values = pd.Series(rng.integers(0, cardinality, n)).astype(str).radd('value ').to_numpy(dtype=object)
+    values[rng.random(n) < 0.2] = None
+    return pd.DataFrame({
+        'classification': rng.choice(['third_world_serials', 'sampled_serials'], n),
+        'marc_0': values,
+    })
+
+
+def search_query_join(n, key_field='full_name', seed=0):
+    """
+    Rows shaped like the search query join files for repos (`full_name`) or users (`login`).
+    """
+    rng = np.random.default_rng(seed)
+    entities = max(n // 4, 1)
+    text_field = 'description' if key_field == 'full_name' else 'bio'
+    search_terms = rng.integers(0, 20, n).astype(str)
+    df = pd.DataFrame({
+        key_field: pd.Series(rng.integers(0, entities, n)).astype(str).radd('entity/').to_numpy(dtype=object),
+        'search_query': pd.Series(search_terms).radd('https://api.github.com/search/repositories?q=%22Digital+Humanities%22+').to_numpy(dtype=object) + np.where(rng.random(n) < 0.5, '&page=2', ''),
+        'search_term': search_terms,
+        'search_term_source': rng.choice(SEARCH_TERM_SOURCES, n),
+        'search_query_time': rng.choice(np.array(['2022-10-10', '2023-01-05', None], dtype=object), n),
+        'detected_language': rng.choice(LANGUAGES, n),
+        'detected_language_confidence': rng.random(n),
+        'natural_language': rng.choice(LANGUAGES, n),
+        'finalized_language': rng.choice(LANGUAGES, n, p=[0.1, 0.05, 0.05, 0.05, 0.05, 0.0, 0.7]),
+        'keep_resource': rng.choice(np.array([True, None], dtype=object), n),
+        text_field: rng.choice(np.array(['A short one', 'A longer description of a digital humanities project', None], dtype=object), n),
+    })
+    if key_field == 'full_name':
+        df['size'] = rng.integers(0, 5000, n)
+    return df
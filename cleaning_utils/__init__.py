@@ -0,0 +1 @@
+"""Shared helpers for the data cleaning CLI scripts."""
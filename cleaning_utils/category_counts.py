@@ -0,0 +1,88 @@
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CategoryCountCache:
+    """
+    LRU cache of per-column value counts for each corpus in the `classification` column.
+
+    The corpus split is computed once. Counts for a column are computed the first time they are
+    requested, or ahead of time in a background thread with `prefetch`.
+    """
+
+    def __init__(self, df, classifications, maxsize=32, prefetch_workers=1):
+        """
+        :param df: A DataFrame or LazyLiteralFrame with a `classification` column
+        :param classifications: The corpora to count, e.g. ['third_world_serials', 'sampled_serials']
+        :param maxsize: Number of columns kept in the cache
+        :param prefetch_workers: Number of background threads used by `prefetch`, 0 disables prefetching
+        """
+        self.df = df
+        self.maxsize = maxsize
+        classification = df['classification']
+        self.masks = {name: (classification == name).to_numpy() for name in classifications}
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=prefetch_workers) if prefetch_workers else None
+
+    def _compute(self, col):
+        values = self.df[col]
+        counts = {}
+        for name, mask in self.masks.items():
+            corpus_values = values[mask]
+            counts[name] = (corpus_values.value_counts(), corpus_values.notna().sum())
+        return counts
+
+    def _store(self, col, counts):
+        with self._lock:
+            self._cache[col] = counts
+            self._cache.move_to_end(col)
+            self._pending.pop(col, None)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def get(self, classification, col):
+        """
+        Return (value_counts, not null count) for a column within one corpus.
+        """
+        with self._lock:
+            counts = self._cache.get(col)
+            if counts is not None:
+                self._cache.move_to_end(col)
+            pending = self._pending.get(col)
+        if counts is None:
+            try:
+                counts = pending.result() if pending is not None else self._compute(col)
+            except Exception:
+                # A failed prefetch is raised here, where its value is requested, and computed again on the next request
+                with self._lock:
+                    self._pending.pop(col, None)
+                raise
+            self._store(col, counts)
+        return counts[classification]
+
+    def _prefetched(self, col, future):
+        # A failed prefetch stays pending so `get` raises its exception, instead of the executor logging and dropping it
+        if future.exception() is None:
+            self._store(col, future.result())
+
+    def prefetch(self, cols):
+        """
+        Compute counts for the given columns in the background if they aren't cached yet.
+        """
+        if self._executor is None:
+            return
+        for col in cols:
+            with self._lock:
+                if col in self._cache or col in self._pending:
+                    continue
+                future = self._executor.submit(self._compute, col)
+                self._pending[col] = future
+            future.add_done_callback(functools.partial(self._prefetched, col))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
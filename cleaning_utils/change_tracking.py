@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from cleaning_utils.storage import read_frame, write_frame, frame_exists, resolve_path
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Content hash of a stored frame (the Parquet/Feather copy is hashed if that is what would be read).
+    """
+    digest = hashlib.sha256()
+    with open(resolve_path(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def inputs_changed(manifest_path, input_paths):
+    """
+    Compare the content hashes of input files with the ones recorded in a JSON manifest.
+
+    :return: (changed, hashes) where hashes should be passed to `save_input_hashes` once the output is written
+    """
+    hashes = {path: file_hash(path) for path in input_paths}
+    if not os.path.exists(manifest_path):
+        return True, hashes
+    with open(manifest_path) as f:
+        return json.load(f) != hashes, hashes
+
+
+def save_input_hashes(manifest_path, hashes):
+    with open(manifest_path, 'w') as f:
+        json.dump(hashes, f, indent=2)
+
+
+def key_hashes(df, key_field):
+    """
+    Content hash per row key. Row hashes are summed per key so the result doesn't depend on row order.
+    """
+    row_hashes = pd.util.hash_pandas_object(df.drop(columns=[key_field]).astype(str), index=False)
+    return row_hashes.groupby(df[key_field].to_numpy()).sum().astype('uint64')
+
+
+def unchanged_keys(previous_hashes, hashes):
+    """
+    Return the keys present in both hash series with the same hash. The series are aligned on their common keys
+    rather than reindexed, since introducing NaN would cast the uint64 hashes to float and lose precision.
+    """
+    common = hashes.index.intersection(previous_hashes.index)
+    return common[hashes[common].to_numpy() == previous_hashes[common].to_numpy()]
+
+
+class ChangeTracker:
+    """
+    Keeps the content hash of every row key a stage last materialized, so the next run can
+    recompute only the keys whose input rows changed. The stage parameters are kept in a JSON file next to
+    the manifest, and every key counts as changed when they differ from the last run.
+    """
+
+    def __init__(self, manifest_path, parameters=None):
+        self.manifest_path = manifest_path
+        self.parameters_path = os.path.splitext(manifest_path)[0] + '.parameters.json'
+        self.parameters = parameters or {}
+
+    def load(self):
+        if not frame_exists(self.manifest_path) or not os.path.exists(self.parameters_path):
+            return None
+        with open(self.parameters_path) as f:
+            if json.load(f) != self.parameters:
+                return None
+        manifest = read_frame(self.manifest_path)
+        return pd.Series(manifest.hash.to_numpy(dtype='uint64'), index=manifest.key.to_numpy())
+
+    def save(self, hashes):
+        write_frame(pd.DataFrame({'key': hashes.index, 'hash': hashes.to_numpy()}), self.manifest_path)
+        save_input_hashes(self.parameters_path, self.parameters)
+
+    def diff(self, df, key_field):
+        """
+        :return: (changed keys, unchanged keys, current hashes). Every key is changed if there is no manifest yet
+            or the stage parameters changed.
+        """
+        hashes = key_hashes(df, key_field)
+        previous = self.load()
+        if previous is None:
+            return set(hashes.index), set(), hashes
+        unchanged = set(unchanged_keys(previous, hashes))
+        return set(hashes.index) - unchanged, unchanged, hashes
+
+
+def incremental_apply(df, key_field, stage_function, output_path, manifest_path=None, parameters=None):
+    """
+    Run a per-key stage only on the keys whose input rows changed since the last run, and reuse the
+    last materialized output for the rest. Keys that disappeared from the input are dropped.
+
+    :param df: The stage input
+    :param key_field: The row key, e.g. `full_name`, `login` or `column_name`
+    :param stage_function: Function from an input frame to an output frame. It must treat keys independently.
+    :param output_path: Where the stage output is materialized
+    :param manifest_path: Where the key hashes are kept, next to the output by default
+    :param parameters: JSON-serializable dict of everything besides the input rows that the output depends on
+        (stage options, rule table versions). Every key is recomputed when it differs from the last run.
+    :return: The full stage output
+    """
+    tracker = ChangeTracker(manifest_path or os.path.splitext(output_path)[0] + '.manifest.parquet', parameters)
+    changed_keys, unchanged_keys, hashes = tracker.diff(df, key_field)
+    if not frame_exists(output_path):
+        changed_keys, unchanged_keys = changed_keys | unchanged_keys, set()
+
+    print(f"{key_field}: recomputing {len(changed_keys)} changed keys, reusing {len(unchanged_keys)}")
+    outputs = []
+    if len(unchanged_keys) > 0:
+        previous_output = read_frame(output_path)
+        outputs.append(previous_output[previous_output[key_field].isin(unchanged_keys)])
+    if len(changed_keys) > 0:
+        outputs.append(stage_function(df[df[key_field].isin(changed_keys)].copy()))
+    output = pd.concat(outputs) if len(outputs) > 0 else df.iloc[0:0]
+
+    write_frame(output, output_path)
+    tracker.save(hashes)
+    return output
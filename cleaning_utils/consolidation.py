@@ -0,0 +1,56 @@
+import pandas as pd
+
+LANGUAGE_FIELDS = ['detected_language', 'detected_language_confidence', 'finalized_language', 'keep_resource']
+
+
+def consolidate_language_data(search_df: pd.DataFrame, key_field: str) -> tuple:
+    """Fill in the missing language data for every entity at once. Vectorized equivalent of
+    `groupby(key_field).apply(fill_missing_language_data)`: each entity gets its first non-null
+    detected language, its max confidence, and its first non-null finalized language and keep flag.
+    :param search_df: The search queries data
+    :type search_df: pandas.DataFrame
+    :param key_field: The entity key, `full_name` for repos or `login` for users
+    :type key_field: str
+    :return: The consolidated search queries data and a frame of entities with conflicting or missing values
+    :rtype: tuple"""
+    search_df = search_df[search_df[key_field].notna()].copy()
+    grouped = search_df.groupby(key_field, sort=False)
+    conflicts = grouped.agg(
+        detected_languages=('detected_language', 'nunique'),
+        finalized_languages=('finalized_language', 'nunique'),
+        keep_resources=('keep_resource', 'nunique'),
+    )
+    conflicts['missing_finalized_language'] = conflicts.finalized_languages == 0
+    conflicts = conflicts[(conflicts.detected_languages > 1) | (conflicts.finalized_languages > 1) | (conflicts.keep_resources > 1) | conflicts.missing_finalized_language]
+
+    for field in ['detected_language', 'finalized_language', 'keep_resource']:
+        search_df[field] = grouped[field].transform('first')
+    search_df['detected_language_confidence'] = grouped['detected_language_confidence'].transform('max')
+    return search_df, conflicts.reset_index()
+
+
+def summarize_conflicts(conflicts: pd.DataFrame, entity_type: str) -> str:
+    """Summarize the entities flagged by `consolidate_language_data` in a single line.
+    :param conflicts: The conflicts frame
+    :type conflicts: pandas.DataFrame
+    :param entity_type: Repo or User
+    :type entity_type: str
+    :return: The summary"""
+    return f"{entity_type}: {conflicts.missing_finalized_language.sum()} with no finalized language, {(conflicts.detected_languages > 1).sum()} with multiple detected languages, {(conflicts.finalized_languages > 1).sum()} with multiple finalized languages, {(conflicts.keep_resources > 1).sum()} with multiple keep values"
+
+
+def check_consolidation_parity(search_df: pd.DataFrame, key_field: str, reference_function, **kwargs) -> pd.DataFrame:
+    """Compare `consolidate_language_data` against the per-group reference implementation.
+    :param search_df: The search queries data
+    :type search_df: pandas.DataFrame
+    :param key_field: The entity key
+    :type key_field: str
+    :param reference_function: The per-group function, e.g. `fill_missing_language_data`
+    :param kwargs: Extra arguments passed to the reference function
+    :return: The rows where the two implementations disagree (empty when they match)"""
+    expected = search_df.groupby(search_df[key_field].rename(None), group_keys=False).apply(reference_function, **kwargs)
+    actual, _ = consolidate_language_data(search_df, key_field)
+    expected = expected.sort_index()[LANGUAGE_FIELDS].astype(object)
+    actual = actual.sort_index()[LANGUAGE_FIELDS].astype(object)
+    matches = (expected == actual) | (expected.isna() & actual.isna())
+    return actual[~matches.all(axis=1)]
@@ -0,0 +1,310 @@
+"""
+Long-lived local process that keeps the search queries join frames loaded, typed and indexed between review
+sessions, so reopening a session doesn't pay for the imports and the reload again.
+
+    python -m cleaning_utils.daemon --socket /tmp/data-cleaning-cli.sock
+
+Usually started through `python -m cleaning_utils.daemon_client start`. It listens on a Unix socket (readable
+by the current user only) for one JSON request per line, {"command": ..., "args": {...}}, and answers each
+with one JSON line. A frame is reloaded when its file changes on disk. Decisions go to the usual journal next to
+the file, so they survive the daemon stopping before a `save`; the journal is locked while the file is open here, so
+a script can't write decisions to it at the same time. `clean` only changes the warm frame: its results are lost if
+the daemon stops before a `save`, and `clean` has to be run again.
+"""
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from cleaning_utils.daemon_client import default_socket_path, is_running
+from cleaning_utils.journal import DecisionJournal, JournalLock, _to_json_value
+from cleaning_utils.language_review import REPO_REVIEW_FIELDS, USER_REVIEW_FIELDS, get_potential_language, review_lines
+from cleaning_utils.language_rules import apply_language_rules
+from cleaning_utils.review_driver import QueuedJournal
+from cleaning_utils.review_session import ReviewSession
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA
+from cleaning_utils.storage import read_frame, resolve_path
+from cleaning_utils.suggestions import language_suggester, prefill, describe_suggestion
+
+REVIEW_PROFILES = {
+    'repos': {'key_field': 'full_name', 'entity_type': 'Repo', 'fields': REPO_REVIEW_FIELDS},
+    'users': {'key_field': 'login', 'entity_type': 'User', 'fields': USER_REVIEW_FIELDS},
+}
+
+
+def file_signature(path):
+    """
+    The resolved file with its modification time and size, to tell when a warm frame is out of date.
+    """
+    resolved_path = resolve_path(path)
+    if resolved_path is None:
+        raise FileNotFoundError(path)
+    stat = os.stat(resolved_path)
+    return resolved_path, stat.st_mtime_ns, stat.st_size
+
+
+class WarmReview:
+    """
+    A search queries frame kept in memory with its ReviewSession index and journal, and the review queues over it.
+    """
+
+    def __init__(self, path, profile):
+        start = time.perf_counter()
+        self.path = path
+        self.profile = profile
+        self.key_field = REVIEW_PROFILES[profile]['key_field']
+        self.signature = file_signature(path)
+        # Held until the file is closed here, across saves, so no other process writes to the journal meanwhile
+        self.journal_lock = JournalLock(path + ".journal.jsonl").acquire()
+        self.journal = self._open_journal()
+        self.cleaned = False
+        df = self.journal.replay(read_frame(path, schema=SEARCH_QUERY_SCHEMA).reset_index(drop=True))
+        self.session = ReviewSession(df, self.key_field, journal=self.journal)
+        self.queues = {}
+        self._suggester = None
+        self.lock = threading.Lock()
+        self.load_seconds = time.perf_counter() - start
+
+    def _open_journal(self):
+        return QueuedJournal(DecisionJournal(self.path + ".journal.jsonl", key_field=self.key_field, lock=self.journal_lock))
+
+    def stale(self):
+        try:
+            return file_signature(self.path) != self.signature
+        except FileNotFoundError:
+            return True
+
+    def queue(self, name):
+        """
+        The keys to review, computed once per load: entities without a finalized language that have no decision yet,
+        or for `double_check`, the entities still left with conflicting finalized languages.
+        """
+        if name not in self.queues:
+            if name == 'review':
+                self.journal.flush()
+                reviewed = self.journal.reviewed_keys('finalized_language')
+                df = self.session.df
+                keys = [key for key in df[df.finalized_language.isna()][self.key_field].unique().tolist() if key not in reviewed]
+            elif name == 'double_check':
+                keys = self.session.resolve_unambiguous(self.session.conflicting_keys('finalized_language'), 'finalized_language', 'detected_language')
+            else:
+                raise ValueError(f"Unknown queue {name}")
+            self.queues[name] = {'keys': keys, 'decided': set(), 'cursor': 0}
+        return self.queues[name]
+
+    @property
+    def suggester(self):
+        """
+        The answers learned from the reviewers' decisions in the journal, built on first use and updated as
+        decisions come in.
+        """
+        if self._suggester is None:
+            self.journal.flush()
+            self._suggester = language_suggester(self.session.df, self.key_field, self.journal.history())
+        return self._suggester
+
+    def invalidate(self):
+        """
+        Forget the queues and the suggestions after the frame was changed in bulk, e.g. by the language rules.
+        """
+        self.queues = {}
+        self._suggester = None
+
+    def next_record(self, queue_name):
+        queue = self.queue(queue_name)
+        keys = queue['keys']
+        while queue['cursor'] < len(keys) and keys[queue['cursor']] in queue['decided']:
+            queue['cursor'] += 1
+        if queue['cursor'] == len(keys):
+            return {'key': None, 'position': len(keys), 'total': len(keys)}
+        key = keys[queue['cursor']]
+        all_rows = self.session.rows(key)
+        profile = REVIEW_PROFILES[self.profile]
+        suggestion = self.suggester.suggest(key)
+        suggested_language = prefill(suggestion, 'finalized_language')
+        return {'key': _to_json_value(key), 'position': queue['cursor'], 'total': len(keys),
+                'lines': review_lines(all_rows, self.key_field, profile['entity_type'], profile['fields']),
+                'potential_language': suggested_language if suggested_language is not None else get_potential_language(all_rows),
+                'suggested_keep': prefill(suggestion, 'keep_resource'),
+                'suggestion': describe_suggestion(*suggestion['finalized_language']) if suggested_language is not None else None}
+
+    def decide(self, queue_name, key, values):
+        for column, value in values.items():
+            self.session.set(key, column, value)
+        self.suggester.observe(key, values)
+        self.queue(queue_name)['decided'].add(key)
+
+    def save(self):
+        """
+        Write the frame and fold the journal into it, then start a new journal for further decisions.
+        """
+        output_path = self.journal.compact(self.session.df, self.path)
+        self.journal = self._open_journal()
+        self.session.journal = self.journal
+        self.signature = file_signature(self.path)
+        self.cleaned = False
+        return output_path
+
+    def close(self):
+        self.journal.close()
+        self.journal_lock.release()
+
+    def status(self):
+        return {'profile': self.profile, 'path': self.path, 'rows': len(self.session.df),
+                'memory_mb': self.session.df.memory_usage(deep=True).sum() / 1e6,
+                'pending': sum(len(queue['keys']) - len(queue['decided']) for queue in self.queues.values()),
+                'unsaved_clean': self.cleaned,
+                'load_seconds': self.load_seconds}
+
+
+class CleaningDaemon:
+    """
+    Keeps one WarmReview per (profile, path) and answers the client commands against it.
+    """
+
+    def __init__(self):
+        self.reviews = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.commands = {
+            'ping': self.ping, 'status': self.status, 'open': self.open, 'next': self.next,
+            'decide': self.decide, 'clean': self.clean, 'save': self.save, 'close': self.close,
+        }
+
+    def review(self, profile, path):
+        """
+        Return the warm review for a file, loading it on first use or when the file changed on disk.
+        """
+        if profile not in REVIEW_PROFILES:
+            raise ValueError(f"Unknown profile {profile}, expected one of {list(REVIEW_PROFILES)}")
+        with self.lock:
+            warm = self.reviews.get((profile, path))
+            if warm is not None and warm.stale():
+                # Queued decisions are flushed to the journal first, so the reload replays them
+                warm.close()
+                warm = None
+            if warm is None:
+                warm = self.reviews[(profile, path)] = WarmReview(path, profile)
+            return warm
+
+    def handle(self, request):
+        command = self.commands.get(request.get('command'))
+        if command is None:
+            raise ValueError(f"Unknown command {request.get('command')}")
+        return command(**request.get('args', {}))
+
+    def ping(self):
+        return {'pid': os.getpid()}
+
+    def status(self):
+        with self.lock:
+            sessions = [warm.status() for warm in self.reviews.values()]
+        return {'pid': os.getpid(), 'uptime_seconds': time.time() - self.started_at, 'sessions': sessions}
+
+    def open(self, profile, path, queue='review'):
+        warm = self.review(profile, path)
+        with warm.lock:
+            keys = warm.queue(queue)
+            return {'pending': len(keys['keys']) - len(keys['decided']), 'load_seconds': warm.load_seconds}
+
+    def next(self, profile, path, queue='review'):
+        warm = self.review(profile, path)
+        with warm.lock:
+            return warm.next_record(queue)
+
+    def decide(self, profile, path, key, values, queue='review'):
+        warm = self.review(profile, path)
+        with warm.lock:
+            warm.decide(queue, key, values)
+        return {}
+
+    def clean(self, profile, path):
+        """
+        Run the language rules on the warm frame. The changes aren't journaled: they are only kept by the next `save`.
+        """
+        warm = self.review(profile, path)
+        with warm.lock:
+            _, report = apply_language_rules(warm.session.df, warm.key_field)
+            warm.invalidate()
+            warm.cleaned = True
+        return {'rules': list(zip(report.rule, report.rows.astype(int).tolist()))}
+
+    def save(self, profile, path):
+        warm = self.review(profile, path)
+        with warm.lock:
+            return {'output_path': warm.save(), 'rows': len(warm.session.df)}
+
+    def close(self, profile, path):
+        """
+        Drop a warm frame. Unsaved decisions stay in its journal.
+        """
+        with self.lock:
+            warm = self.reviews.pop((profile, path), None)
+        if warm is not None:
+            warm.close()
+        return {}
+
+    def close_all(self):
+        with self.lock:
+            reviews, self.reviews = list(self.reviews.values()), {}
+        for warm in reviews:
+            warm.close()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get('command') == 'shutdown':
+                    self._respond({'ok': True})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                response = {'ok': True, **self.server.cleaning_daemon.handle(request)}
+            except Exception as e:
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            self._respond(response)
+
+    def _respond(self, response):
+        self.wfile.write((json.dumps(response, default=str) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, cleaning_daemon):
+        self.cleaning_daemon = cleaning_daemon
+        super().__init__(socket_path, RequestHandler)
+
+
+def serve(socket_path):
+    if os.path.exists(socket_path):
+        if is_running(socket_path):
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+        # Left over from a daemon that didn't shut down cleanly
+        os.remove(socket_path)
+    previous_umask = os.umask(0o177)
+    try:
+        server = DaemonServer(socket_path, CleaningDaemon())
+    finally:
+        os.umask(previous_umask)
+    print(f"Listening on {socket_path} (pid {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.cleaning_daemon.close_all()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=None, help='Defaults to $CLEANING_DAEMON_SOCKET or a socket in the temp directory')
+    args = parser.parse_args()
+    serve(args.socket or default_socket_path())
@@ -0,0 +1,172 @@
+"""
+Thin client for the cleaning daemon (see cleaning_utils/daemon.py). It only imports the standard library so a
+session opens in milliseconds; the frames are loaded and kept warm by the daemon.
+
+    python -m cleaning_utils.daemon_client start
+    python -m cleaning_utils.daemon_client review repos ../data/derived_files/updated_search_queries_repo_join_subset_dh_dataset.csv
+    python -m cleaning_utils.daemon_client review users ../data/derived_files/updated_search_queries_user_join_subset_dh_dataset.csv --double-check
+    python -m cleaning_utils.daemon_client status
+    python -m cleaning_utils.daemon_client stop
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SOCKET_ENVIRONMENT_VARIABLE = 'CLEANING_DAEMON_SOCKET'
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_socket_path():
+    return os.environ.get(SOCKET_ENVIRONMENT_VARIABLE) or os.path.join(tempfile.gettempdir(), f"data-cleaning-cli-{os.getuid()}.sock")
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonClient:
+    """
+    A connection to the daemon. Requests and responses are single JSON lines.
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket_path()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(self.socket_path)
+        self._file = self._socket.makefile('rw', encoding='utf-8')
+
+    def request(self, command, **args):
+        """
+        Send a command and return its response. Raises DaemonError if the daemon reports an error.
+        """
+        self._file.write(json.dumps({'command': command, 'args': args}) + '\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("The daemon closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error'))
+        return response
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_running(socket_path=None):
+    try:
+        with DaemonClient(socket_path, timeout=2) as client:
+            client.request('ping')
+        return True
+    except (OSError, DaemonError):
+        return False
+
+
+def start_daemon(socket_path=None, log_path=None, timeout=60):
+    """
+    Start the daemon in the background if it isn't running yet and wait until it answers.
+    """
+    socket_path = socket_path or default_socket_path()
+    if is_running(socket_path):
+        return False
+    log_path = log_path or os.path.splitext(socket_path)[0] + '.log'
+    with open(log_path, 'a') as log:
+        subprocess.Popen([sys.executable, '-m', 'cleaning_utils.daemon', '--socket', socket_path], cwd=REPO_DIRECTORY,
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_running(socket_path):
+            return True
+        time.sleep(0.05)
+    raise DaemonError(f"The daemon didn't start within {timeout}s, see {log_path}")
+
+
+def review(client, profile, path, double_check=False):
+    """
+    Run the repo or user review loop of check_clean_search_results.py against the daemon.
+    """
+    entity = 'repo' if profile == 'repos' else 'user'
+    queue = 'double_check' if double_check else 'review'
+    opened = client.request('open', profile=profile, path=path, queue=queue)
+    print(f"{opened['pending']} {profile} to check, loaded in {opened['load_seconds']:.2f}s")
+    while True:
+        record = client.request('next', profile=profile, path=path, queue=queue)
+        if record['key'] is None:
+            break
+        print(f"On {record['position']} out of {record['total']}")
+        print('\n'.join(record['lines']))
+        if double_check:
+            values = {'finalized_language': input("What is the correct language? ")}
+        else:
+            suggested_keep = record.get('suggested_keep')
+            answer = input("stay in the dataset? (y/n{})".format(", suggested n" if suggested_keep is False else ""))
+            keep_resource = not (answer == 'n' or (answer == '' and suggested_keep is False))
+            potential_language = record['potential_language']
+            if record.get('suggestion'):
+                print(f"Suggested from earlier decisions: {record['suggestion']}")
+            language_answers = input(f"Is the finalized language: {potential_language} of this {entity} correct? ")
+            finalized_language = potential_language if language_answers != 'n' else input("What is the correct language? ")
+            values = {'keep_resource': keep_resource, 'finalized_language': finalized_language}
+        client.request('decide', profile=profile, path=path, queue=queue, key=record['key'], values=values)
+        print(u'─' * 10)
+    saved = client.request('save', profile=profile, path=path)
+    print(f"Saved {saved['rows']} rows to {saved['output_path']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=None, help=f'Defaults to ${SOCKET_ENVIRONMENT_VARIABLE} or a socket in the temp directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('start', help='Start the daemon in the background')
+    commands.add_parser('stop', help='Stop the daemon, keeping unsaved decisions in their journals')
+    commands.add_parser('status', help='List the frames the daemon keeps warm')
+    for name, help_text in [('review', 'Review the entities without a finalized language'), ('clean', 'Run the language rules on the warm frame, kept in memory until save'), ('save', 'Write the warm frame and fold its journal into it')]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('profile', choices=['repos', 'users'])
+        command.add_argument('path', help='The search queries join file to review')
+        if name == 'review':
+            command.add_argument('--double-check', action='store_true', help='Review the entities with conflicting finalized languages instead')
+    args = parser.parse_args()
+
+    socket_path = args.socket or default_socket_path()
+    if args.command == 'start':
+        print("Daemon started" if start_daemon(socket_path) else "Daemon already running")
+        sys.exit(0)
+    if args.command != 'stop':
+        start_daemon(socket_path)
+    elif not is_running(socket_path):
+        print("Daemon not running")
+        sys.exit(0)
+
+    with DaemonClient(socket_path) as client:
+        if args.command == 'stop':
+            client.request('shutdown')
+            print("Daemon stopped")
+        elif args.command == 'status':
+            status = client.request('status')
+            print(f"Daemon {status['pid']}, up {status['uptime_seconds']:.0f}s")
+            for session in status['sessions']:
+                print(f"  {session['profile']} {session['path']}: {session['rows']} rows, {session['memory_mb']:.1f} MB, {session['pending']} pending"
+                      + (", cleaned but not saved" if session['unsaved_clean'] else ""))
+        elif args.command == 'review':
+            review(client, args.profile, os.path.abspath(args.path), args.double_check)
+        elif args.command == 'clean':
+            report = client.request('clean', profile=args.profile, path=os.path.abspath(args.path))
+            print(f"Language rules applied: {', '.join(f'{rule}: {rows}' for rule, rows in report['rules'])}")
+            print("These changes aren't journaled, run save to keep them")
+        elif args.command == 'save':
+            saved = client.request('save', profile=args.profile, path=os.path.abspath(args.path))
+            print(f"Saved {saved['rows']} rows to {saved['output_path']}")
@@ -0,0 +1,253 @@
+import json
+import os
+from datetime import date
+import pandas as pd
+from lxml import etree
+from cleaning_utils.change_tracking import file_hash
+from cleaning_utils.storage import read_frame, write_frame, frame_exists
+
+GEXF_NAMESPACE = "http://www.gexf.net/1.2draft"
+XSI_NAMESPACE = "http://www.w3.org/2001/XMLSchema-instance"
+PERSON_ATTRIBUTES = ['description', 'url']
+GROUP_ATTRIBUTES = ['variable', 'research_description', 'research_url']
+GROUP_COLUMNS = ['research_area', 'committee_title']
+# Columns of the cleaned people data that the graph depends on
+GRAPH_COLUMNS = ['name'] + PERSON_ATTRIBUTES + GROUP_COLUMNS + ['research_description', 'research_url']
+NODE_COLUMNS = ['id', 'bipartite'] + PERSON_ATTRIBUTES + GROUP_ATTRIBUTES
+
+
+def memberships(df, missing_group='nan'):
+    """
+    One row per (person, research area or committee) pair, like the melt in the iSchool people notebook.
+
+    As in the notebook, missing research areas and committees become a "nan" group, which links everyone missing
+    one in the projected graph. Pass `missing_group=None` to drop them instead; people without any membership left
+    are then kept as isolated nodes by `person_nodes`.
+    """
+    melted = pd.melt(df[df.name.notna()], id_vars=['name', 'research_description', 'research_url'], value_vars=GROUP_COLUMNS)
+    if missing_group is not None:
+        return melted.fillna({'value': missing_group})
+    return melted[melted.value.notna()]
+
+
+def person_nodes(df):
+    people = df[df.name.notna()].groupby('name', sort=False).agg({col: 'first' for col in PERSON_ATTRIBUTES}).reset_index()
+    return people.rename(columns={'name': 'id'}).assign(bipartite=pd.array([0] * len(people), dtype='Int64'))
+
+
+def group_nodes(member_df, missing_group='nan'):
+    # Committees have no description or url, only research areas do
+    member_df = member_df.copy()
+    member_df.loc[member_df.variable != 'research_area', ['research_description', 'research_url']] = None
+    groups = member_df.groupby(['value', 'variable'], sort=False).agg({'research_description': 'first', 'research_url': 'first'}).reset_index()
+    # A name used as both a research area and a committee is one node, as in NetworkX
+    groups = groups.drop_duplicates(subset=['value'], keep='last')
+    groups = groups.rename(columns={'value': 'id'}).assign(bipartite=pd.array([1] * len(groups), dtype='Int64'))
+    # NetworkX only saw the missing group as an edge endpoint, so it has no attributes
+    groups.loc[groups.id == missing_group, ['variable', 'research_description', 'research_url', 'bipartite']] = None
+    return groups
+
+
+def membership_edges(member_df):
+    return member_df[['name', 'value']].drop_duplicates().rename(columns={'name': 'source', 'value': 'target'})
+
+
+def shared_group_counts(edges, other_edges):
+    """
+    Count the groups every person in `edges` shares with every other person in `other_edges`.
+
+    :return: A (source, target, weight) frame with source < target
+    """
+    pairs = edges.merge(other_edges, on='target')
+    pairs = pairs[pairs.source_x < pairs.source_y]
+    return pairs.groupby(['source_x', 'source_y'], sort=False).size().reset_index(name='weight').rename(columns={'source_x': 'source', 'source_y': 'target'})
+
+
+class PeopleGraph:
+    """
+    The bipartite people / research area and committee graph as a node table and an edge table.
+
+    Corrections from a cleaning session are applied as patches: only the nodes and edges of the people and groups
+    on changed rows are recomputed, instead of rebuilding the graph from the whole frame. The projected edges are
+    kept with the graph and patched the same way.
+    """
+
+    def __init__(self, nodes, edges, projected=None, missing_group='nan'):
+        """
+        :param projected: The projected edges if already computed, see `projected_edges`
+        :param missing_group: The group missing research areas and committees belong to, see `memberships`
+        """
+        self.nodes = nodes.reindex(columns=NODE_COLUMNS)
+        self.edges = edges.reset_index(drop=True)
+        self.projected = None if projected is None else projected.reset_index(drop=True)
+        self.missing_group = missing_group
+
+    @classmethod
+    def from_frame(cls, df, missing_group='nan'):
+        member_df = memberships(df, missing_group)
+        return cls(pd.concat([person_nodes(df), group_nodes(member_df, missing_group)], ignore_index=True), membership_edges(member_df), missing_group=missing_group)
+
+    @classmethod
+    def load(cls, directory, missing_group='nan'):
+        projected_path = os.path.join(directory, 'projected_edges.parquet')
+        projected = read_frame(projected_path) if frame_exists(projected_path) else None
+        return cls(read_frame(os.path.join(directory, 'nodes.parquet')), read_frame(os.path.join(directory, 'edges.parquet')), projected, missing_group)
+
+    @staticmethod
+    def exists(directory):
+        return frame_exists(os.path.join(directory, 'nodes.parquet')) and frame_exists(os.path.join(directory, 'edges.parquet'))
+
+    def save(self, directory):
+        write_frame(self.nodes, os.path.join(directory, 'nodes.parquet'))
+        write_frame(self.edges, os.path.join(directory, 'edges.parquet'))
+        self.write_edge_list(os.path.join(directory, 'projected_edges.parquet'), projected=True)
+
+    def patch(self, before_df, after_df):
+        """
+        Apply the differences between two versions of the cleaned people data (same index) as node and edge patches.
+
+        :return: The number of changed rows
+        """
+        columns = [col for col in GRAPH_COLUMNS if col in after_df.columns]
+        before = before_df[columns].reindex(after_df.index)
+        changed = ~((before == after_df[columns]) | (before.isna() & after_df[columns].isna())).all(axis=1)
+        if not changed.any():
+            return 0
+
+        changed_members = pd.concat([memberships(before[changed], self.missing_group), memberships(after_df[changed], self.missing_group)])
+        people = set(before[changed].name.dropna()) | set(after_df[changed].name.dropna())
+        groups = set(changed_members.value)
+
+        people_df = after_df[after_df.name.isin(people)]
+        all_members = memberships(after_df, self.missing_group)
+        group_df = all_members[all_members.value.isin(groups)]
+
+        is_person = self.nodes.bipartite.eq(0).fillna(False)
+        self.nodes = pd.concat([
+            self.nodes[~((is_person & self.nodes.id.isin(people)) | (~is_person & self.nodes.id.isin(groups)))],
+            person_nodes(people_df).reindex(columns=NODE_COLUMNS),
+            group_nodes(group_df, self.missing_group).reindex(columns=NODE_COLUMNS),
+        ], ignore_index=True)
+        self.edges = pd.concat([self.edges[~self.edges.source.isin(people)], membership_edges(memberships(people_df, self.missing_group))], ignore_index=True)
+        if self.projected is not None:
+            # A pair's weight only depends on the groups of its two people, so only the pairs of changed people are recounted
+            changed_edges = self.edges[self.edges.source.isin(people)]
+            kept = self.projected[~(self.projected.source.isin(people) | self.projected.target.isin(people))]
+            unchanged_edges = self.edges[~self.edges.source.isin(people)]
+            self.projected = pd.concat([kept, shared_group_counts(changed_edges, self.edges), shared_group_counts(unchanged_edges, changed_edges)], ignore_index=True)
+        return int(changed.sum())
+
+    def projected_edges(self):
+        """
+        Weighted projection onto the people: two people are linked with a weight equal to the number of
+        research areas and committees they share, as `bipartite.weighted_projected_graph` does.
+        Computed once and then patched with the graph.
+        """
+        if self.projected is None:
+            self.projected = shared_group_counts(self.edges, self.edges)
+        return self.projected
+
+    def write_gexf(self, path, projected=False):
+        nodes = self.nodes[self.nodes.bipartite.eq(0).fillna(False)] if projected else self.nodes
+        edges = self.projected_edges() if projected else self.edges
+        write_gexf(path, nodes.set_index('id').dropna(axis=1, how='all'), edges)
+
+    def write_edge_list(self, path, projected=False):
+        """
+        Write the edges as a compact edge list, in the format of the path's extension (see `write_frame`).
+        """
+        return write_frame(self.projected_edges() if projected else self.edges, path)
+
+
+def _attribute_type(values):
+    if pd.api.types.is_bool_dtype(values):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(values):
+        return 'long'
+    if pd.api.types.is_float_dtype(values):
+        return 'double'
+    return 'string'
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def write_gexf(path, nodes, edges, creator="data_cleaning_cli"):
+    """
+    Stream a GEXF 1.2 file with an incremental XML writer, without building a NetworkX graph.
+
+    :param nodes: Node attributes indexed by node id. Missing values are left out, like NetworkX does.
+    :param edges: Frame with `source` and `target` columns, and optionally `weight`
+    """
+    attribute_ids = {col: str(position) for position, col in enumerate(nodes.columns)}
+    has_weight = 'weight' in edges.columns
+    # Elements are written without a namespace and inherit the default one declared on the root
+    root_attributes = {'xmlns': GEXF_NAMESPACE, 'xmlns:xsi': XSI_NAMESPACE, 'xsi:schemaLocation': f"{GEXF_NAMESPACE} {GEXF_NAMESPACE}/gexf.xsd", 'version': "1.2"}
+    with etree.xmlfile(path, encoding='utf-8') as xf:
+        xf.write_declaration()
+        with xf.element("gexf", attrib=root_attributes):
+            meta = etree.Element("meta", lastmodifieddate=date.today().isoformat())
+            etree.SubElement(meta, "creator").text = creator
+            xf.write(meta)
+            with xf.element("graph", defaultedgetype="undirected", mode="static", name=""):
+                attributes = etree.Element("attributes", mode="static", attrib={'class': 'node'})
+                for col, attribute_id in attribute_ids.items():
+                    etree.SubElement(attributes, "attribute", id=attribute_id, title=col, type=_attribute_type(nodes[col]))
+                xf.write(attributes)
+
+                with xf.element("nodes"):
+                    for node_id, values in zip(nodes.index, nodes.itertuples(index=False)):
+                        node = etree.Element("node", id=str(node_id), label=str(node_id))
+                        attvalues = etree.SubElement(node, "attvalues")
+                        for col, value in zip(nodes.columns, values):
+                            if not pd.isna(value):
+                                etree.SubElement(attvalues, "attvalue", attrib={'for': attribute_ids[col], 'value': _format_value(value)})
+                        xf.write(node)
+
+                with xf.element("edges"):
+                    for edge_id, edge in enumerate(edges.itertuples(index=False)):
+                        attrib = {'source': str(edge.source), 'target': str(edge.target), 'id': str(edge_id)}
+                        if has_weight:
+                            attrib['weight'] = str(edge.weight)
+                        xf.write(etree.Element("edge", attrib=attrib))
+
+
+def update_graph_exports(before_df, after_df, source_path, loaded_hash, graph_directory, bipartite_path, projected_path, missing_group='nan'):
+    """
+    Keep the graph exports in sync with the cleaned people data. The stored graph is patched with the rows that
+    changed this session, unless it was built from a different version of the source file or with a different
+    `missing_group`, then it is rebuilt.
+
+    :param before_df: The data as loaded at the start of the session
+    :param after_df: The cleaned data
+    :param source_path: The cleaned data file, already written
+    :param loaded_hash: The `file_hash` of the source file when `before_df` was loaded. The stored graph is only patched if it was
+        built from that version.
+    :param graph_directory: Where the node and edge tables are kept between sessions
+    :param bipartite_path: The GEXF file for the people / research area and committee graph
+    :param projected_path: The GEXF file for the projected people graph
+    :param missing_group: The group missing research areas and committees belong to, None to drop them (see `memberships`)
+    :return: The number of patched rows, or None if the graph was rebuilt
+    """
+    manifest_path = os.path.join(graph_directory, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    if PeopleGraph.exists(graph_directory) and manifest.get('source_hash') == loaded_hash and manifest.get('missing_group') == missing_group:
+        graph = PeopleGraph.load(graph_directory, missing_group)
+        patched_rows = graph.patch(before_df, after_df)
+    else:
+        graph = PeopleGraph.from_frame(after_df, missing_group)
+        patched_rows = None
+
+    graph.save(graph_directory)
+    graph.write_gexf(bipartite_path)
+    graph.write_gexf(projected_path, projected=True)
+    with open(manifest_path, 'w') as f:
+        json.dump({'source_hash': file_hash(source_path), 'missing_group': missing_group}, f)
+    return patched_rows
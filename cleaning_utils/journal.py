@@ -0,0 +1,252 @@
+import json
+import os
+import time
+import pandas as pd
+from cleaning_utils.storage import write_frame
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def _to_json_value(value):
+    """
+    Convert pandas/numpy scalars into plain JSON values. Missing values become None.
+    """
+    if value is None:
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+def _read_entries(path):
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return entries
+
+
+class JournalLockedError(RuntimeError):
+    pass
+
+
+class JournalLock:
+    """
+    Exclusive `flock` on a journal, so only one process (a script or the daemon) writes decisions to it at a time.
+    The lock is taken on a `.lock` file next to the journal, which outlives the journal being compacted and removed.
+    Without `fcntl` (on Windows) locking is skipped.
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.path = journal_path + '.lock'
+        self._handle = None
+
+    def acquire(self):
+        """
+        Take the lock without waiting. Raises JournalLockedError if another process holds it.
+        """
+        if self._handle is not None or fcntl is None:
+            return self
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            raise JournalLockedError(f"{self.journal_path} is being written by another process, e.g. the cleaning daemon. "
+                                     "Close the file there (or stop the daemon) first.")
+        self._handle = handle
+        return self
+
+    def release(self):
+        if self._handle is not None:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+
+class DecisionJournal:
+    """
+    Append-only log of reviewer decisions.
+
+    Every decision is written as one JSON line (row key, column, old value, new value, timestamp)
+    and fsynced, so a session can be interrupted at any point without rewriting the full output file.
+    The log is replayed on restart and folded back into the output with `compact`.
+
+    A journal takes its JournalLock when it is replayed or first written to, and keeps it until `close`, so a
+    second writer (e.g. a script while the daemon has the same file open) is refused instead of losing decisions.
+    """
+
+    def __init__(self, journal_path, key_field=None, lock=None):
+        """
+        :param journal_path: Path of the JSON lines journal file
+        :param key_field: Column used to match decisions to rows. If None, the dataframe index is used.
+        :param lock: A JournalLock held by the caller for longer than this journal, None to lock the journal itself,
+            or False for a journal that is only read
+        """
+        self.journal_path = journal_path
+        self.key_field = key_field
+        self._owns_lock = lock is None
+        self.lock = JournalLock(journal_path) if lock is None else lock
+        self.history_path = os.path.splitext(journal_path)[0] + '.history.jsonl'
+        self._handle = None
+
+    def _acquire(self):
+        if self.lock:
+            self.lock.acquire()
+
+    def _open(self):
+        if self._handle is None:
+            self._acquire()
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._handle = open(self.journal_path, 'a', encoding='utf-8')
+        return self._handle
+
+    def record(self, row_key, column, old_value, new_value):
+        """
+        Append a single decision to the journal and flush it to disk.
+        """
+        entry = {
+            'row_key': _to_json_value(row_key),
+            'column': column,
+            'old_value': _to_json_value(old_value),
+            'new_value': _to_json_value(new_value),
+            'timestamp': time.time(),
+        }
+        handle = self._open()
+        handle.write(json.dumps(entry, default=str) + '\n')
+        handle.flush()
+        os.fsync(handle.fileno())
+        return entry
+
+    def record_many(self, decisions, source=None):
+        """
+        Append several (row key, column, old value, new value) decisions with a single write and fsync.
+
+        :param source: What made the decisions if not a reviewer, e.g. "resolve_unambiguous". Stored with every entry.
+        """
+        timestamp = time.time()
+        lines = []
+        for row_key, column, old_value, new_value in decisions:
+            entry = {
+                'row_key': _to_json_value(row_key),
+                'column': column,
+                'old_value': _to_json_value(old_value),
+                'new_value': _to_json_value(new_value),
+                'timestamp': timestamp,
+            }
+            if source is not None:
+                entry['source'] = source
+            lines.append(json.dumps(entry, default=str) + '\n')
+        if len(lines) == 0:
+            return
+        handle = self._open()
+        handle.write(''.join(lines))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def append_entries(self, entries):
+        """
+        Append already recorded entries (e.g. merged from another journal) as they are, keeping their timestamps.
+        """
+        lines = [json.dumps(entry, default=str) + '\n' for entry in entries]
+        if len(lines) == 0:
+            return
+        handle = self._open()
+        handle.write(''.join(lines))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    def entries(self):
+        """
+        Read all decisions from the journal. A partially written last line is ignored.
+        """
+        return _read_entries(self.journal_path)
+
+    def history(self):
+        """
+        Every decision ever recorded: the ones already folded into the output by `compact`, then the journal.
+        """
+        return _read_entries(self.history_path) + self.entries()
+
+    def apply(self, df, entry):
+        """
+        Apply a single journal entry to the dataframe in place.
+        """
+        if self.key_field is None:
+            df.at[entry['row_key'], entry['column']] = entry['new_value']
+        else:
+            df.loc[df[self.key_field] == entry['row_key'], entry['column']] = entry['new_value']
+
+    def replay(self, df):
+        """
+        Replay every recorded decision onto the dataframe so an interrupted session resumes where it stopped.
+        """
+        self._acquire()
+        entries = self.entries()
+        if self.key_field is None:
+            for entry in entries:
+                self.apply(df, entry)
+            return df
+        positions = df.groupby(self.key_field, sort=False).indices
+        for entry in entries:
+            if entry['row_key'] in positions:
+                df.iloc[positions[entry['row_key']], df.columns.get_loc(entry['column'])] = entry['new_value']
+        return df
+
+    def reviewed_keys(self, column=None):
+        """
+        Return the set of row keys that already have a decision recorded, optionally only for one column.
+        """
+        return {entry['row_key'] for entry in self.entries() if column is None or entry['column'] == column}
+
+    def compact(self, df, output_path):
+        """
+        Fold the journal into the output file (written with `write_frame`) and truncate the journal.
+        The dataframe is expected to already contain the decisions (either recorded live or replayed).
+        The folded decisions are appended to the history file, see `history`.
+        """
+        written_path = write_frame(df, output_path)
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if os.path.exists(self.journal_path):
+            # Rewritten line by line, so a partially written last line doesn't end up in the middle of the history
+            with open(self.history_path, 'a', encoding='utf-8') as history:
+                history.write(''.join(json.dumps(entry, default=str) + '\n' for entry in self.entries()))
+                history.flush()
+                os.fsync(history.fileno())
+            os.remove(self.journal_path)
+        self.close()
+        return written_path
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._owns_lock:
+            self.lock.release()
+
+    def __len__(self):
+        return len(self.entries())
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from tqdm import tqdm
+
+DETECTION_COLUMNS = ['detected_language', 'detected_language_confidence']
+
+
+def text_hash(text: str) -> str:
+    """Hash a text so it can be used as a cache key.
+    :param text: The text
+    :type text: str
+    :return: The sha1 hex digest of the text"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class DetectionCache:
+    """Persistent SQLite cache of language detection results keyed by text hash."""
+
+    def __init__(self, cache_path: str):
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS detections (text_hash TEXT PRIMARY KEY, result TEXT)')
+
+    def get_many(self, hashes: list) -> dict:
+        """Look up cached results.
+        :param hashes: The text hashes
+        :type hashes: list
+        :return: A dict of text hash to result for the hashes that are cached"""
+        results = {}
+        for start in range(0, len(hashes), 900):
+            chunk = hashes[start:start + 900]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self.connection.execute(f'SELECT text_hash, result FROM detections WHERE text_hash IN ({placeholders})', chunk)
+            results.update({key: json.loads(result) for key, result in rows})
+        return results
+
+    def put_many(self, results: dict):
+        """Store results in the cache.
+        :param results: A dict of text hash to result
+        :type results: dict"""
+        self.connection.executemany('INSERT OR REPLACE INTO detections (text_hash, result) VALUES (?, ?)',
+                                    [(key, json.dumps(result, default=str)) for key, result in results.items()])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def _detect_batch(batch: list, detect_function, is_repo: bool, detection_columns: list) -> list:
+    """Run the row-wise detection function over a batch of representative rows.
+    :param batch: A list of (text hash, row dict) tuples
+    :type batch: list
+    :return: A list of (text hash, result dict) tuples"""
+    results = []
+    for key, row in batch:
+        detected = detect_function(pd.Series(row), is_repo=is_repo)
+        result = {}
+        for column in detection_columns:
+            value = detected.get(column)
+            result[column] = None if pd.isna(value) else value
+        results.append((key, result))
+    return results
+
+
+def detect_languages(search_df: pd.DataFrame, text_field: str, detect_function, cache_path: str, is_repo: bool = True, workers: int = None, batch_size: int = 500, detection_columns: list = DETECTION_COLUMNS) -> pd.DataFrame:
+    """Detect languages for each unique text only once. Texts are deduplicated, looked up in a persistent
+    cache, and the remaining ones are detected in batches over a process pool.
+    :param search_df: The search queries data
+    :type search_df: pandas.DataFrame
+    :param text_field: The column holding the text to detect, `description` for repos or `bio` for users
+    :type text_field: str
+    :param detect_function: The row-wise detection function, e.g. `check_detect_language`
+    :param cache_path: Path of the SQLite cache
+    :type cache_path: str
+    :param is_repo: Passed through to the detection function
+    :type is_repo: bool
+    :param workers: Number of worker processes. 1 runs in the current process.
+    :type workers: int
+    :param batch_size: Number of texts sent to a worker at a time
+    :type batch_size: int
+    :return: The search queries data with the detection columns filled in"""
+    texts = search_df[text_field].fillna('')
+    unique_texts = pd.unique(texts)
+    hashes = {text: text_hash(text) for text in unique_texts}
+
+    cache = DetectionCache(cache_path)
+    results = cache.get_many(list(set(hashes.values())))
+
+    missing = ~texts.map(hashes).isin(list(results.keys())) & ~texts.duplicated()
+    representative_rows = search_df[missing]
+    batch = [(hashes[text], {**row, text_field: text}) for text, row in zip(texts[missing], representative_rows.to_dict('records'))]
+    batches = [batch[start:start + batch_size] for start in range(0, len(batch), batch_size)]
+
+    if len(batches) > 0:
+        if workers == 1:
+            detected_batches = (_detect_batch(current, detect_function, is_repo, detection_columns) for current in batches)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            detected_batches = executor.map(_detect_batch, batches, [detect_function] * len(batches), [is_repo] * len(batches), [detection_columns] * len(batches))
+        for detected in tqdm(detected_batches, total=len(batches), desc='Detecting language'):
+            detected = dict(detected)
+            cache.put_many(detected)
+            results.update(detected)
+        if workers != 1:
+            executor.shutdown()
+    cache.close()
+
+    text_results = texts.map(hashes).map(results)
+    search_df = search_df.copy()
+    for column in detection_columns:
+        search_df[column] = text_results.map(lambda result: result.get(column))
+    return search_df
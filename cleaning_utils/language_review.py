@@ -0,0 +1,44 @@
+import pandas as pd
+from cleaning_utils.schema import object_values
+
+REPO_REVIEW_FIELDS = [('URL', 'html_url'), ('Description', 'description'), ('Natural Language', 'natural_language'), ('Detected Language', 'detected_language'), ('Search Query', 'search_query'), ('Search Query Term', 'search_term'), ('Search Query Source Term', 'search_term_source')]
+USER_REVIEW_FIELDS = [('URL', 'html_url'), ('Type', 'type'), ('Bio', 'bio'), ('Location', 'location'), ('Natural Language', 'natural_language'), ('Detected Language', 'detected_language'), ('Search Query', 'search_query'), ('Search Query Term', 'search_term'), ('Search Query Source Term', 'search_term_source')]
+
+
+def get_potential_language(all_rows: pd.DataFrame) -> str:
+    """Guess the finalized language of an entity from its detected and natural languages.
+    :param all_rows: All the rows for the entity
+    :type all_rows: pandas.DataFrame
+    :return: The potential language"""
+    detected_languages = all_rows[all_rows.detected_language.notna()].detected_language.unique().tolist()
+    natural_languages = all_rows[all_rows.natural_language.notna()].natural_language.unique().tolist()
+
+    detected_languages = detected_languages[0] if len(detected_languages) == 1 else str(detected_languages).replace('[', '').replace(']', '')
+    natural_languages = natural_languages[0] if len(natural_languages) == 1 else str(natural_languages).replace('[', '').replace(']', '')
+    potential_language = detected_languages if len(detected_languages) != 0 else natural_languages
+    potential_language = potential_language if len(potential_language) != 0 else 'None'
+
+    if ',' in potential_language:
+        if 'fr' in potential_language:
+            potential_language = 'fr'
+        elif 'en' in potential_language:
+            potential_language = 'en'
+        elif 'xh' in potential_language:
+            potential_language = 'en'
+    return potential_language
+
+
+def review_lines(all_rows: pd.DataFrame, key_field: str, entity_type: str, review_fields: list) -> list:
+    """The lines shown for one entity in the review loop.
+    :param all_rows: All the rows for the entity
+    :type all_rows: pandas.DataFrame
+    :param key_field: The entity key, `full_name` or `login`
+    :type key_field: str
+    :param entity_type: Repo or User
+    :type entity_type: str
+    :param review_fields: The (label, column) pairs to show
+    :type review_fields: list
+    :return: The lines"""
+    lines = [f"This {entity_type.lower()} {object_values(all_rows[key_field]).unique()} "]
+    lines += [f"{entity_type} {label}: {object_values(all_rows[column]).unique()}" for label, column in review_fields]
+    return lines
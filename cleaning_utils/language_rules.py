@@ -0,0 +1,100 @@
+from collections import namedtuple
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+
+ENGLISH_LANGUAGES = ['en', 'ny', 'ha', 'ig', 'lb', 'mg', 'sm', 'sn', 'st', 'tl', 'yo']
+
+# Column predicates used by the rules. Each one is evaluated at most once per run.
+PREDICATES = {
+    'detected_english': lambda df: df.detected_language.isin(ENGLISH_LANGUAGES),
+    'natural_equals_detected': lambda df: df.natural_language == df.detected_language,
+    'detected_zh': lambda df: df.detected_language.str.contains('zh', na=False),
+    'natural_zh': lambda df: df.natural_language == 'zh',
+    'detected_fr': lambda df: df.detected_language.str.contains('fr', na=False),
+    'natural_fr': lambda df: df.natural_language.str.contains('fr', na=False),
+    'natural_xh_zu': lambda df: df.natural_language == 'xh, zu',
+    'low_confidence': lambda df: df.detected_language_confidence < 0.5,
+    'missing_detected': lambda df: df.detected_language.isna(),
+    'short_description': lambda df: df.description.str.len() < 30,
+    'missing_description': lambda df: df.description.isna(),
+    'empty_repo': lambda df: df['size'] < 1,
+    'short_bio': lambda df: df.bio.str.len() < 30,
+    'missing_bio': lambda df: df.bio.isna(),
+}
+
+# name: label used in the report
+# predicates: names from PREDICATES that must all hold
+# value / value_from: the literal to assign, or the column to copy the value from
+# join_field: only apply to repo (`full_name`) or user (`login`) data, None for both
+# column: the column assigned to
+# overwrite: if False, only rows without a finalized language are assigned. If True, the rule fires for an entity
+#   when any of its matching rows is still unassigned and then assigns every matching row of that entity. Rules
+#   only look at the rows of one entity, so the table gives the same result on any split of the frame by entity.
+LanguageRule = namedtuple('LanguageRule', ['name', 'predicates', 'value', 'value_from', 'join_field', 'column', 'overwrite'])
+
+LANGUAGE_RULES = [
+    LanguageRule('english detected', ('detected_english',), None, 'detected_language', None, 'finalized_language', False),
+    LanguageRule('natural matches detected', ('natural_equals_detected',), None, 'detected_language', None, 'finalized_language', False),
+    LanguageRule('chinese', ('detected_zh', 'natural_zh'), None, 'detected_language', None, 'finalized_language', True),
+    LanguageRule('french', ('natural_fr', 'detected_fr'), 'fr', None, None, 'finalized_language', True),
+    LanguageRule('xhosa/zulu', ('natural_xh_zu',), None, 'detected_language', None, 'finalized_language', False),
+    LanguageRule('low confidence', ('low_confidence',), None, None, None, 'finalized_language', False),
+    LanguageRule('short description', ('short_description',), None, None, 'full_name', 'finalized_language', False),
+    LanguageRule('no description', ('missing_detected', 'missing_description'), None, None, 'full_name', 'finalized_language', False),
+    LanguageRule('empty repo', ('missing_detected', 'missing_description', 'empty_repo'), False, None, 'full_name', 'keep_resource', False),
+    LanguageRule('short bio', ('short_bio',), None, None, 'login', 'finalized_language', False),
+    LanguageRule('no bio', ('missing_detected', 'missing_bio'), None, None, 'login', 'finalized_language', False),
+]
+
+
+def apply_language_rules(search_df: pd.DataFrame, join_field: str, rules: list = LANGUAGE_RULES) -> tuple:
+    """Apply an ordered rule table to the search queries data. Predicates are cached and a single
+    "still unassigned" mask is updated incrementally instead of re-checking `finalized_language` after every rule.
+    Overwrite rules fire per entity, so the result for an entity doesn't depend on the other entities in the frame.
+    :param search_df: The search queries data
+    :type search_df: pandas.DataFrame
+    :param join_field: The field to join the search queries data to the repo data, `full_name` or `login`
+    :type join_field: str
+    :param rules: The ordered rule table
+    :type rules: list
+    :return: The search queries data with the rules applied and a report of how many rows each rule touched
+    :rtype: tuple"""
+    predicate_cache = {}
+
+    def predicate(name):
+        if name not in predicate_cache:
+            predicate_cache[name] = PREDICATES[name](search_df).fillna(False).to_numpy(dtype=bool)
+        return predicate_cache[name]
+
+    unassigned = search_df.finalized_language.isna().to_numpy().copy()
+    keys = search_df[join_field]
+    report = []
+    for rule in rules:
+        if rule.join_field is not None and rule.join_field != join_field:
+            continue
+        match = np.logical_and.reduce([predicate(name) for name in rule.predicates])
+        unassigned_match = match & unassigned
+        if rule.overwrite:
+            target = match & keys.isin(keys[unassigned_match]).to_numpy()
+        else:
+            target = unassigned_match
+        if target.any():
+            values = search_df[rule.value_from].to_numpy()[target] if rule.value_from is not None else rule.value
+            search_df.loc[target, rule.column] = values
+            if rule.column == 'finalized_language':
+                unassigned[target] = pd.isna(values) if rule.value_from is not None else pd.isna(rule.value)
+        report.append({'rule': rule.name, 'rows': int(target.sum())})
+    return search_df, pd.DataFrame(report)
+
+
+def rules_version(rules: list = LANGUAGE_RULES) -> str:
+    """Hash of a rule table and the source of the predicates it uses, so outputs cached by an older table can be told apart.
+    :param rules: The ordered rule table
+    :type rules: list
+    :return: A hex digest
+    :rtype: str"""
+    predicate_names = sorted({name for rule in rules for name in rule.predicates})
+    sources = [inspect.getsource(PREDICATES[name]).strip() for name in predicate_names]
+    return hashlib.sha256(repr((rules, ENGLISH_LANGUAGES, sources)).encode()).hexdigest()[:16]
@@ -0,0 +1,77 @@
+import ast
+import re
+import pandas as pd
+from cleaning_utils.storage import read_frame
+
+# Only strings that start like a Python literal are worth handing to ast.literal_eval
+LITERAL_PATTERN = re.compile(r"^\s*(?:[\[\(\{'\"\d\-+.]|True\s*$|False\s*$|None\s*$)")
+
+
+def safe_literal_eval(val):
+    """
+    Safely evaluate an expression node or a string containing a Python expression.
+    Returns the original value if an error occurs during evaluation.
+    """
+    try:
+        return ast.literal_eval(val)
+    except (ValueError, SyntaxError):
+        return val
+
+
+def parse_literal_column(series):
+    """
+    Parse the literal strings in a column. Each distinct string is evaluated once and
+    values that don't look like literals are skipped. Empty strings become None.
+    """
+    if series.dtype != object and not pd.api.types.is_string_dtype(series.dtype):
+        return series
+    series = series.astype(object)
+    is_string = series.map(lambda val: isinstance(val, str))
+    candidates = series[is_string]
+    looks_literal = candidates.str.match(LITERAL_PATTERN)
+    parsed = {val: safe_literal_eval(val) for val in pd.unique(candidates[looks_literal])}
+    series = series.copy()
+    literal_index = candidates[looks_literal].index
+    series.loc[literal_index] = candidates[looks_literal].map(parsed)
+    series[series.isin(['', ' '])] = None
+    return series
+
+
+class LazyLiteralFrame:
+    """
+    Wraps a raw dataframe and parses columns with `parse_literal_column` only when they are first accessed.
+    Parsed columns are memoized. Columns can be read with `frame[col]` or `frame.col`.
+    """
+
+    def __init__(self, df):
+        self._raw = df
+        self._parsed = {}
+
+    @property
+    def columns(self):
+        return self._raw.columns
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __contains__(self, col):
+        return col in self._raw.columns
+
+    def __getitem__(self, col):
+        if col not in self._parsed:
+            self._parsed[col] = parse_literal_column(self._raw[col])
+        return self._parsed[col]
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._raw.columns:
+            raise AttributeError(name)
+        return self[name]
+
+
+def load_literal_frame(file_path, columns=None):
+    """
+    Load a stored frame as a LazyLiteralFrame, reading only the given columns if provided.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    return LazyLiteralFrame(read_frame(file_path, columns=columns))
@@ -0,0 +1,86 @@
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz import fuzz, process, utils
+except ImportError:
+    fuzz = None
+    process = None
+    utils = None
+
+
+def blocking_keys(name: str) -> set:
+    """Get the blocking keys for a name: every lowercased token longer than one character.
+    :param name: The name
+    :type name: str
+    :return: The blocking keys"""
+    return {token for token in re.findall(r'\w+', str(name).lower()) if len(token) > 1}
+
+
+def _inverted_index(names: np.ndarray) -> dict:
+    """Map every blocking key to the positions of the names that have it."""
+    index = {}
+    for position, name in enumerate(names):
+        for key in blocking_keys(name):
+            index.setdefault(key, []).append(position)
+    return index
+
+
+def candidate_blocks(original_names: np.ndarray, committee_names: np.ndarray, max_block_size: int = 100):
+    """Yield the blocks of names that share a blocking key, as (original positions, committee positions).
+    Keys shared by more than `max_block_size` names on either side (common first names, "de", ...) are too
+    unselective to block on and are skipped, so the work grows with the number of names rather than its square.
+    :param original_names: The scraped names
+    :param committee_names: The committee member names
+    :param max_block_size: The most names a block can have on either side
+    :type max_block_size: int
+    :return: A generator of position arrays"""
+    original_index = _inverted_index(original_names)
+    committee_index = _inverted_index(committee_names)
+    for key, original_positions in original_index.items():
+        committee_positions = committee_index.get(key)
+        if committee_positions is None or len(original_positions) > max_block_size or len(committee_positions) > max_block_size:
+            continue
+        yield np.asarray(original_positions), np.asarray(committee_positions)
+
+
+def _score_block(left: list, right: list, score_cutoff: int, workers: int) -> np.ndarray:
+    """Score every pair of a block with token_set_ratio, using the same preprocessing as thefuzz.
+    Scores below the cutoff may come back as 0."""
+    if process is not None:
+        return process.cdist(left, right, scorer=fuzz.token_set_ratio, processor=utils.default_process, score_cutoff=score_cutoff, workers=workers)
+    from thefuzz import fuzz as thefuzz_fuzz
+    return np.array([[thefuzz_fuzz.token_set_ratio(a, b) for b in right] for a in left])
+
+
+def match_names(original_names, committee_names, score_cutoff: int = 90, workers: int = -1, max_block_size: int = 100) -> pd.DataFrame:
+    """Match scraped names to committee members with blocking and vectorized token_set_ratio scoring.
+    Produces the same `name`/`committee_member`/`score` frame as scoring every pair with
+    `fuzz.token_set_ratio` and keeping scores above the cutoff, for the pairs that share an uncommon token.
+    Only the hits of each block are kept, so memory stays proportional to the number of matches.
+    :param original_names: The scraped names
+    :param committee_names: The committee member names
+    :param score_cutoff: Pairs must score strictly above this
+    :type score_cutoff: int
+    :param workers: Number of threads used for scoring, -1 uses all cores
+    :type workers: int
+    :param max_block_size: The most names a block can have on either side
+    :type max_block_size: int
+    :return: The matches"""
+    original_names = np.asarray(pd.unique(pd.Series(original_names).dropna()), dtype=object)
+    committee_names = np.asarray(pd.unique(pd.Series(committee_names).dropna()), dtype=object)
+    hits = []
+    for original_positions, committee_positions in candidate_blocks(original_names, committee_names, max_block_size):
+        scores = _score_block(list(original_names[original_positions]), list(committee_names[committee_positions]), score_cutoff, workers)
+        # thefuzz rounds scores to integers, so round here as well to keep the same cutoff behaviour
+        scores = np.round(scores).astype(int)
+        rows, columns = np.nonzero(scores > score_cutoff)
+        if len(rows) > 0:
+            hits.append(np.column_stack([original_positions[rows], committee_positions[columns], scores[rows, columns]]))
+    if len(hits) == 0:
+        return pd.DataFrame(columns=['name', 'committee_member', 'score'])
+
+    # Names sharing several uncommon tokens are found once per block
+    hits = np.unique(np.concatenate(hits), axis=0)
+    return pd.DataFrame({'name': original_names[hits[:, 0]], 'committee_member': committee_names[hits[:, 1]], 'score': hits[:, 2]})
@@ -0,0 +1,166 @@
+"""
+Optional Polars engine for the batch part of `verify_results_exist`: the per-entity steps before language detection
+(`cleaning_utils.search_queries.prepare_entity_search_queries`) run as one lazy query plan, so the group fills,
+the sort and the dedupes are planned together, run on every core and don't copy the frame between steps.
+
+Language detection, the language rules and the review stay in pandas; the plan is collected and converted back to
+pandas before them. `check_engine_parity` compares both engines on the same input, e.g. on a join file:
+
+    python -m cleaning_utils.polars_engine ../data/derived_files/initial_search_queries_repo_join_subset_dh_dataset.csv full_name --dedupe-by-time
+"""
+import argparse
+import pandas as pd
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA
+from cleaning_utils.search_queries import DEFAULT_SEARCH_QUERY_TIME, normalize_search_query, prepare_entity_search_queries
+from cleaning_utils.storage import read_frame
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+POLARS_AVAILABLE = pl is not None
+
+ENGINES = ['pandas', 'polars']
+# The input is already in memory and the plan is mostly group-bys and joins, where the streaming engine was
+# about twice as slow as the in-memory one, so Polars picks the engine
+COLLECT_ENGINE = 'auto'
+FIRST_VALUE_FIELDS = ['detected_language', 'finalized_language', 'keep_resource']
+
+
+def require_polars():
+    if not POLARS_AVAILABLE:
+        raise ImportError("The polars engine needs polars: pip install polars")
+
+
+def consolidate_language_data(lf, key_field):
+    """
+    Lazy version of `cleaning_utils.consolidation.consolidate_language_data`. The filled values and the conflict
+    counts come from the same aggregation, which is joined back to the rows.
+
+    :return: The consolidated frame and the conflicts frame, both lazy
+    """
+    columns = lf.collect_schema().names()
+    lf = lf.filter(pl.col(key_field).is_not_null())
+    entities = lf.group_by(key_field).agg(
+        *[pl.col(field).first(ignore_nulls=True) for field in FIRST_VALUE_FIELDS],
+        pl.col('detected_language_confidence').max(),
+        detected_languages=pl.col('detected_language').drop_nulls().n_unique(),
+        finalized_languages=pl.col('finalized_language').drop_nulls().n_unique(),
+        keep_resources=pl.col('keep_resource').drop_nulls().n_unique(),
+    )
+    conflicts = entities.select(key_field, 'detected_languages', 'finalized_languages', 'keep_resources', missing_finalized_language=pl.col('finalized_languages') == 0)
+    conflicts = conflicts.filter((pl.col('detected_languages') > 1) | (pl.col('finalized_languages') > 1) | (pl.col('keep_resources') > 1) | pl.col('missing_finalized_language'))
+    filled_fields = FIRST_VALUE_FIELDS + ['detected_language_confidence']
+    lf = lf.drop(filled_fields).join(entities.select(key_field, *filled_fields), on=key_field, how='left', maintain_order='left')
+    return lf.select(columns), conflicts
+
+
+def parse_search_query_times(search_df, join_field):
+    """
+    The distinct search query times of the rows with a key, parsed the way `keep_latest_queries` parses them.
+    `pd.to_datetime` infers one format from the first value and coerces the values that don't match it, which
+    Polars doesn't do, so the distinct values are parsed with pandas once and mapped in the plan.
+
+    :return: A Polars frame of the raw and parsed times, or None if the times are already parsed
+    """
+    times = search_df.loc[search_df[join_field].notna(), 'search_query_time']
+    if pd.api.types.is_datetime64_any_dtype(times.dtype):
+        return None
+    times = pd.Series(times.astype(object).where(times.notna(), DEFAULT_SEARCH_QUERY_TIME).unique(), dtype=object)
+    return pl.DataFrame({'search_query_time': times.astype(str).tolist(), '__parsed_time': pd.to_datetime(times, errors='coerce')})
+
+
+def keep_latest_queries(lf, join_field, search_query_times):
+    """
+    Lazy version of `cleaning_utils.search_queries.keep_latest_queries`.
+
+    :param search_query_times: The frame from `parse_search_query_times`, None for times that are already parsed
+    """
+    if search_query_times is None:
+        lf = lf.with_columns(pl.col('search_query_time').fill_null(pd.Timestamp(DEFAULT_SEARCH_QUERY_TIME).to_pydatetime()))
+    else:
+        lf = lf.with_columns(pl.col('search_query_time').cast(pl.String).fill_null(DEFAULT_SEARCH_QUERY_TIME))
+        lf = lf.join(search_query_times.lazy(), on='search_query_time', how='left', maintain_order='left')
+        lf = lf.with_columns(pl.col('__parsed_time').alias('search_query_time')).drop('__parsed_time')
+    lf = lf.sort('search_query_time', descending=True, nulls_last=True, maintain_order=True)
+    return lf.unique(subset=[join_field, 'cleaned_search_query'], keep='first', maintain_order=True)
+
+
+def fix_entity_results(lf, join_field):
+    """
+    Lazy version of `cleaning_utils.search_queries.fix_entity_results`.
+    """
+    digital_humanities = pl.col('search_term_source').cast(pl.String) == "Digital Humanities"
+    fix_keys = lf.filter(pl.col('cleaned_search_query').str.contains('q="Humanities"', literal=True) & digital_humanities).select(join_field).unique()
+    # The last Digital Humanities query of an entity wins, like the dict the pandas version maps with
+    replacements = lf.filter(digital_humanities).join(fix_keys, on=join_field, how='semi').group_by(join_field).agg(
+        __replacement=pl.col('search_query').last(), __fix=pl.lit(True))
+    lf = lf.join(replacements, on=join_field, how='left', maintain_order='left')
+    lf = lf.with_columns(pl.when(pl.col('__fix')).then(pl.col('__replacement')).otherwise(pl.col('cleaned_search_query')).alias('cleaned_search_query'))
+    return lf.drop('__replacement', '__fix')
+
+
+def lazy_prepare_entity_search_queries(lf, join_field, dedupe_by_time, search_query_times=None):
+    """
+    The query plan of `prepare_with_polars`.
+
+    :return: The prepared frame and the conflicts frame, both lazy
+    """
+    lf, conflicts = consolidate_language_data(lf, join_field)
+    if dedupe_by_time:
+        lf = keep_latest_queries(lf, join_field, search_query_times)
+    return fix_entity_results(lf, join_field), conflicts
+
+
+def prepare_with_polars(search_df, join_field, dedupe_by_time):
+    """
+    Polars version of `cleaning_utils.search_queries.prepare_entity_search_queries`, with pandas frames in and out.
+    Both plans share their scan and are collected together.
+
+    :return: The prepared search queries data and the conflicts frame
+    """
+    require_polars()
+    search_query_times = parse_search_query_times(search_df, join_field) if dedupe_by_time else None
+    lf, conflicts = lazy_prepare_entity_search_queries(pl.from_pandas(search_df).lazy(), join_field, dedupe_by_time, search_query_times)
+    prepared_df, conflicts_df = pl.collect_all([lf, conflicts], engine=COLLECT_ENGINE)
+    return prepared_df.to_pandas(), conflicts_df.to_pandas()
+
+
+def _comparable(df):
+    df = df.reset_index(drop=True).astype(object)
+    return df.where(df.notna(), None)
+
+
+def check_engine_parity(search_df, join_field, dedupe_by_time):
+    """
+    Run the pandas and Polars engines on the same input and compare their output row by row.
+
+    :return: The Polars rows that differ from the pandas rows at the same position (empty when they match)
+    """
+    expected, expected_conflicts = prepare_entity_search_queries(search_df.copy(), join_field, dedupe_by_time)
+    actual, actual_conflicts = prepare_with_polars(search_df.copy(), join_field, dedupe_by_time)
+    if list(expected.columns) != list(actual.columns):
+        raise ValueError(f"The engines returned different columns: {list(expected.columns)} and {list(actual.columns)}")
+    if len(expected_conflicts) != len(actual_conflicts):
+        raise ValueError(f"The engines found {len(expected_conflicts)} and {len(actual_conflicts)} conflicting entities")
+    rows = max(len(expected), len(actual))
+    expected = _comparable(expected).reindex(range(rows))
+    actual = _comparable(actual).reindex(range(rows))
+    matches = (expected == actual) | (expected.isna() & actual.isna())
+    return actual[~matches.all(axis=1)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='A search queries join file')
+    parser.add_argument('key_field', choices=['full_name', 'login'])
+    parser.add_argument('--dedupe-by-time', action='store_true', help='Also compare keeping the latest row per query, as for existing results')
+    args = parser.parse_args()
+
+    search_df = read_frame(args.path, schema=SEARCH_QUERY_SCHEMA)
+    search_df['cleaned_search_query'] = normalize_search_query(search_df['search_query'])
+    mismatches = check_engine_parity(search_df, args.key_field, args.dedupe_by_time)
+    print(f"{len(search_df)} rows, {len(mismatches)} differ between the pandas and polars engines")
+    if len(mismatches) > 0:
+        print(mismatches.head(20).to_string())
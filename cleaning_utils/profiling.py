@@ -0,0 +1,278 @@
+"""
+Stage profiling and per-decision latency for the cleaning scripts.
+
+Profiling is off unless the CLEANING_PROFILE environment variable (or `enable`) names a JSON lines file:
+
+    CLEANING_PROFILE=../data/profile.jsonl python check_clean_search_results.py
+
+Every stage writes one `stage` line with its wall time, rows in and out and peak RSS, and every record of a
+review loop writes one `decision` line that splits its time into compute, save and reviewer think time.
+Summarize a session with:
+
+    python -m cleaning_utils.profiling ../data/profile.jsonl
+"""
+import argparse
+import functools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROFILE_ENVIRONMENT_VARIABLE = 'CLEANING_PROFILE'
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the process so far in MB, or None where `resource` isn't available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def count_rows(value):
+    """
+    Rows in a frame or series, or in a tuple of them. None for anything else.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (tuple, list)) and len(value) > 0 and all(isinstance(item, (pd.DataFrame, pd.Series)) for item in value):
+        return sum(len(item) for item in value)
+    return None
+
+
+class Profiler:
+    """
+    Writes stage and decision records to a JSON lines file. Does nothing when it has no path.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.session = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._stack = []
+        self._review = None
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def emit(self, event, **fields):
+        if not self.enabled:
+            return
+        record = {'event': event, 'session': self.session, 'host': socket.gethostname(), 'pid': os.getpid(), 'timestamp': time.time(), **fields}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+    @contextmanager
+    def stage(self, name, rows_in=None, **details):
+        """
+        Time a block. Set `rows_out` (or any other field) on the yielded dict to record it.
+
+        Peak RSS is the process high-water mark when the stage ends; `rss_growth_mb` is how much the stage raised it.
+        """
+        record = {'rows_in': rows_in, 'rows_out': None, **details}
+        if not self.enabled:
+            yield record
+            return
+        parent = self._stack[-1] if len(self._stack) > 0 else None
+        self._stack.append(name)
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield record
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall_seconds = time.perf_counter() - start
+            self._stack.pop()
+            rss_after = peak_rss_mb()
+            self.emit('stage', name=name, parent=parent, depth=len(self._stack), wall_seconds=round(wall_seconds, 6),
+                      peak_rss_mb=rss_after, rss_growth_mb=None if rss_after is None else round(rss_after - rss_before, 1),
+                      error=error, **record)
+
+    def profiled(self, name=None):
+        """
+        Decorator that runs a function as a stage. Rows in are counted on the first frame argument and rows out on the result.
+        """
+        def decorator(function):
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                rows_in = next((count_rows(arg) for arg in list(args) + list(kwargs.values()) if count_rows(arg) is not None), None)
+                with self.stage(stage_name, rows_in=rows_in) as record:
+                    result = function(*args, **kwargs)
+                    record['rows_out'] = count_rows(result)
+                return result
+            return wrapper
+        return decorator
+
+    def review(self, name, records, key=None):
+        """
+        Iterate over the records of an interactive review loop as a stage, writing a decision line per record.
+
+        Time spent in `think` and `save` blocks while handling a record is counted as such, everything else
+        (including waiting for the record to be prepared) as compute.
+
+        :param key: Optional function from an item to the key written with its decision line
+        """
+        if not self.enabled:
+            yield from records
+            return
+        with self.stage(name) as stage_record:
+            decisions = 0
+            for item in records:
+                start = time.perf_counter()
+                self._review = {'think': 0.0, 'save': 0.0}
+                try:
+                    yield item
+                finally:
+                    elapsed = time.perf_counter() - start
+                    timings, self._review = self._review, None
+                    if timings['think'] > 0:
+                        decisions += 1
+                    self.emit('decision', name=name, key=key(item) if key is not None else None,
+                              compute_seconds=round(elapsed - timings['think'] - timings['save'], 6),
+                              save_seconds=round(timings['save'], 6), think_seconds=round(timings['think'], 6))
+            stage_record['rows_in'] = stage_record['rows_out'] = decisions
+
+    @contextmanager
+    def _review_timer(self, kind):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._review is not None:
+                self._review[kind] += time.perf_counter() - start
+
+    def think(self):
+        """
+        Context manager for time spent waiting on the reviewer, e.g. around a prompt.
+        """
+        return self._review_timer('think')
+
+    def save(self):
+        """
+        Context manager for time spent recording a decision.
+        """
+        return self._review_timer('save')
+
+
+profiler = Profiler(os.environ.get(PROFILE_ENVIRONMENT_VARIABLE) or None)
+stage = profiler.stage
+profiled = profiler.profiled
+review = profiler.review
+think = profiler.think
+save = profiler.save
+
+
+def enable(path):
+    """
+    Start writing profile records to a JSON lines file.
+    """
+    profiler.path = path
+
+
+def load_profile(path, session=None):
+    """
+    Load the stage and decision records of a session, the last one in the file by default.
+
+    :return: (stages frame, decisions frame)
+    """
+    with open(path) as f:
+        records = pd.DataFrame([json.loads(line) for line in f if line.strip()])
+    session = session or records.session.iloc[-1]
+    records = records[records.session == session]
+    stages = records[records.event == 'stage'].dropna(axis=1, how='all')
+    decisions = records[records.event == 'decision'].dropna(axis=1, how='all')
+    return stages, decisions
+
+
+def summarize_stages(stages):
+    """
+    Calls, total and median wall time, rows and peak RSS per stage, slowest first.
+    """
+    for col in ['rows_in', 'rows_out', 'peak_rss_mb']:
+        if col not in stages.columns:
+            stages = stages.assign(**{col: None})
+    summary = stages.groupby('name', sort=False).agg(
+        calls=('wall_seconds', 'size'), total_seconds=('wall_seconds', 'sum'), median_seconds=('wall_seconds', 'median'),
+        rows_in=('rows_in', 'sum'), rows_out=('rows_out', 'sum'), peak_rss_mb=('peak_rss_mb', 'max'))
+    return summary.sort_values('total_seconds', ascending=False).reset_index()
+
+
+def summarize_decisions(decisions):
+    """
+    Per review loop: decisions made, and total and median compute, save and think time per decision.
+    Records without think time (skipped or resolved without a prompt) are left out.
+    """
+    decisions = decisions[decisions.think_seconds > 0]
+    summary = decisions.groupby('name', sort=False).agg(
+        decisions=('think_seconds', 'size'),
+        compute_seconds=('compute_seconds', 'sum'), median_compute_seconds=('compute_seconds', 'median'),
+        save_seconds=('save_seconds', 'sum'), median_save_seconds=('save_seconds', 'median'),
+        think_seconds=('think_seconds', 'sum'), median_think_seconds=('think_seconds', 'median'))
+    machine_seconds = summary.compute_seconds + summary.save_seconds
+    summary['think_share'] = summary.think_seconds / (machine_seconds + summary.think_seconds)
+    return summary.reset_index()
+
+
+def print_summary(stages, decisions, console):
+    from rich.table import Table
+
+    def number(value, digits=3):
+        return '-' if pd.isna(value) else f"{value:,.{digits}f}"
+
+    table = Table(title="Stages", show_header=True, header_style="bold magenta")
+    for column in ['Stage', 'Calls', 'Total s', 'Median s', 'Rows in', 'Rows out', 'Peak RSS MB']:
+        table.add_column(column, justify='left' if column == 'Stage' else 'right')
+    for row in summarize_stages(stages).itertuples():
+        table.add_row(row.name, str(row.calls), number(row.total_seconds), number(row.median_seconds),
+                      number(row.rows_in, 0), number(row.rows_out, 0), number(row.peak_rss_mb, 1))
+    console.print(table)
+
+    if len(decisions) == 0 or not (decisions.think_seconds > 0).any():
+        return
+    table = Table(title="Review loops, total (median per decision)", show_header=True, header_style="bold magenta")
+    for column in ['Loop', 'Decisions', 'Compute s', 'Save s', 'Think s', 'Think share']:
+        table.add_column(column, justify='left' if column == 'Loop' else 'right')
+    for row in summarize_decisions(decisions).itertuples():
+        table.add_row(row.name, str(row.decisions), f"{number(row.compute_seconds)} ({number(row.median_compute_seconds)})",
+                      f"{number(row.save_seconds)} ({number(row.median_save_seconds)})", f"{number(row.think_seconds)} ({number(row.median_think_seconds)})",
+                      f"{row.think_share:.0%}")
+    console.print(table)
+
+
+if __name__ == '__main__':
+    from rich.console import Console
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', help='The JSON lines profile file')
+    parser.add_argument('--session', default=None, help='The session to summarize, the last one by default')
+    args = parser.parse_args()
+
+    stages, decisions = load_profile(args.profile, args.session)
+    console = Console()
+    console.print(f"Session {stages.session.iloc[0] if len(stages) > 0 else args.session} on {', '.join(stages.host.unique()) if len(stages) > 0 else '-'}")
+    print_summary(stages, decisions, console)
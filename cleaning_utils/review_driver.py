@@ -0,0 +1,137 @@
+import atexit
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Runs write calls on a single background thread fed by a bounded queue, so saving never blocks a prompt
+    unless the queue is full.
+    """
+
+    def __init__(self, maxsize=1000):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # Don't lose queued writes when the session is interrupted
+        atexit.register(self._drain)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                write_function, args = item
+                if self._error is None:
+                    write_function(*args)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def submit(self, write_function, *args):
+        """
+        Queue a write. Raises the error of an earlier failed write, if any.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((write_function, args))
+
+    def flush(self):
+        """
+        Wait until every queued write has finished.
+        """
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def _drain(self):
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self._drain)
+
+
+class QueuedJournal:
+    """
+    Wraps a DecisionJournal so `record` is appended on a background writer thread.
+    Everything else is delegated to the wrapped journal.
+    """
+
+    def __init__(self, journal, maxsize=1000):
+        self.journal = journal
+        self.writer = BackgroundWriter(maxsize=maxsize)
+
+    def record(self, row_key, column, old_value, new_value):
+        self.writer.submit(self.journal.record, row_key, column, old_value, new_value)
+
+    def record_many(self, decisions, source=None):
+        self.writer.submit(self.journal.record_many, list(decisions), source)
+
+    def flush(self):
+        self.writer.flush()
+
+    def compact(self, df, output_path):
+        self.writer.close()
+        return self.journal.compact(df, output_path)
+
+    def close(self):
+        self.writer.close()
+        self.journal.close()
+
+    def __getattr__(self, name):
+        return getattr(self.journal, name)
+
+
+class ReviewDriver:
+    """
+    Iterates over review keys while the next `prefetch` records are prepared on a background thread.
+
+    `prepare_function` should do all the filtering and formatting for a record (e.g. build a rich Panel)
+    so the main thread only has to print it and ask the questions. It must not read data the main thread writes
+    to: `snapshot_function(key)` runs on the iterating thread when a record is scheduled and copies what the record
+    needs (e.g. the entity's rows), and `prepare_function` gets that copy instead of the key.
+    """
+
+    def __init__(self, keys, prepare_function, snapshot_function=None, prefetch=5):
+        """
+        :param keys: The review keys, in order
+        :param prepare_function: Builds a record from a snapshot, or from the key without a `snapshot_function`
+        :param snapshot_function: Copies the data a record is built from, on the iterating thread
+        :param prefetch: The number of records prepared ahead
+        """
+        self.keys = list(keys)
+        self.prepare_function = prepare_function
+        self.snapshot_function = snapshot_function
+        self.prefetch = prefetch
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = {}
+
+    def _schedule(self, position):
+        for upcoming in range(position, min(position + self.prefetch + 1, len(self.keys))):
+            if upcoming not in self._futures:
+                key = self.keys[upcoming]
+                data = self.snapshot_function(key) if self.snapshot_function is not None else key
+                self._futures[upcoming] = self._executor.submit(self.prepare_function, data)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        try:
+            for position, key in enumerate(self.keys):
+                self._schedule(position)
+                yield position, key, self._futures.pop(position).result()
+        finally:
+            for future in self._futures.values():
+                future.cancel()
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,104 @@
+import pandas as pd
+
+
+class ReviewSession:
+    """
+    Positional index over a dataframe grouped by an entity key (e.g. `full_name` or `login`).
+
+    The index is built once, so reading or updating all rows of one entity only touches that
+    entity's rows instead of scanning the whole frame with a boolean mask.
+    """
+
+    def __init__(self, df, key_field, journal=None):
+        """
+        :param df: The dataframe to review. It is reset to a RangeIndex so positions stay stable.
+        :param key_field: The entity key column
+        :param journal: Optional DecisionJournal that every write is recorded to
+        """
+        self.df = df.reset_index(drop=True)
+        self.key_field = key_field
+        self.journal = journal
+        self._positions = self.df.groupby(key_field, sort=False).indices
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def keys(self):
+        return list(self._positions.keys())
+
+    def positions(self, key):
+        """
+        Return the row positions for an entity.
+        """
+        return self._positions[key]
+
+    def rows(self, key):
+        """
+        Return all rows for an entity.
+        """
+        return self.df.iloc[self._positions[key]]
+
+    def get(self, key, column):
+        """
+        Return the column values for an entity.
+        """
+        return self.df.iloc[self._positions[key], self.df.columns.get_loc(column)]
+
+    def set(self, key, column, value, source=None):
+        """
+        Set a column for every row of an entity in place and record the decision in the journal.
+
+        :param source: What made the decision if not a reviewer, e.g. "bulk_accept", stored with the journal entry
+        """
+        positions = self._positions[key]
+        column_position = self.df.columns.get_loc(column)
+        old_value = self.df.iat[positions[0], column_position]
+        self.df.iloc[positions, column_position] = value
+        if self.journal is not None:
+            if source is None:
+                self.journal.record(key, column, old_value, value)
+            else:
+                self.journal.record_many([(key, column, old_value, value)], source=source)
+
+    def set_many(self, key, values, source=None):
+        """
+        Set several columns for an entity, e.g. an accepted suggestion, from a dict of column to value.
+        """
+        for column, value in values.items():
+            self.set(key, column, value, source)
+
+    def keys_where(self, mask):
+        """
+        Return the unique entity keys for the rows selected by a boolean mask, in order of appearance.
+        """
+        return pd.unique(self.df.loc[mask, self.key_field]).tolist()
+
+    def conflicting_keys(self, column):
+        """
+        Return the entity keys that have more than one distinct value in a column.
+        """
+        counts = self.df.drop_duplicates(subset=[self.key_field, column])[self.key_field].value_counts()
+        return counts[counts > 1].index.tolist()
+
+    def resolve_unambiguous(self, keys, column, source_column):
+        """
+        Resolve in one vectorized assignment every entity whose `source_column` has a single value
+        (missing counts as a value): `column` is set to that value for all of its rows.
+        Decisions are written to the journal in one batch, marked as made by `resolve_unambiguous`.
+
+        :return: The keys that still have more than one source value and need a reviewer
+        """
+        rows = self.df[self.df[self.key_field].isin(keys)]
+        source_counts = rows.groupby(self.key_field, sort=False)[source_column].nunique(dropna=False)
+        resolved_keys = source_counts[source_counts == 1].index
+        mask = self.df[self.key_field].isin(resolved_keys).to_numpy()
+        if mask.any():
+            first_rows = self.df[mask].drop_duplicates(subset=[self.key_field])
+            self.df.loc[mask, column] = self.df.loc[mask, source_column]
+            if self.journal is not None:
+                self.journal.record_many(zip(first_rows[self.key_field], [column] * len(first_rows), first_rows[column], first_rows[source_column]), source='resolve_unambiguous')
+        ambiguous_keys = set(source_counts[source_counts > 1].index)
+        return [key for key in keys if key in ambiguous_keys]
@@ -0,0 +1,122 @@
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+try:
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    STRING_DTYPE = pd.StringDtype()
+
+# Strings that stand for a missing value, e.g. from `str(None)` when a mixed column was written out
+NONE_SENTINELS = ['None', 'none', 'nan', 'NaN', 'null', '']
+BOOLEAN_STRINGS = {'True': True, 'true': True, 'False': False, 'false': False}
+
+# Low-cardinality columns that are only filtered on are categorical. The language columns get any value a
+# reviewer types in, so they are strings instead: setting a value that isn't a category raises.
+SEARCH_QUERY_SCHEMA = {
+    'search_term_source': 'category',
+    'search_term': 'category',
+    'type': 'category',
+    'classification': 'category',
+    'detected_language': STRING_DTYPE,
+    'natural_language': STRING_DTYPE,
+    'finalized_language': STRING_DTYPE,
+    'keep_resource': 'boolean',
+    'detected_language_confidence': 'float32',
+}
+
+# tw_category and serials_category are compared with each other, so they are given the same categories by `apply_schema`
+FEATURE_SCHEMA = {
+    'tw_category': 'category',
+    'serials_category': 'category',
+    'keep_feature': 'boolean',
+    'feature_type': STRING_DTYPE,
+}
+SHARED_CATEGORIES = [['tw_category', 'serials_category']]
+
+# name, committee_member and research_area are edited and compared during review, so they stay as they are
+PEOPLE_SCHEMA = {
+    'description': 'category',
+    'research_url': 'category',
+    'research_description': 'category',
+    'committee_title': 'category',
+}
+
+
+def normalize_sentinels(values):
+    """
+    Replace the "None" style sentinel strings in a column with missing values.
+    """
+    if values.dtype != object and not pd.api.types.is_string_dtype(values.dtype):
+        return values
+    return values.mask(values.isin(NONE_SENTINELS))
+
+
+def to_boolean(values):
+    """
+    Convert a column of True/False values, possibly stored as strings or mixed with None, to the nullable boolean dtype.
+    Columns with any other value are returned unchanged.
+    """
+    if values.dtype == 'boolean':
+        return values
+    values = normalize_sentinels(values)
+    mapping = {}
+    for value in pd.unique(values.dropna()):
+        if isinstance(value, str):
+            if value not in BOOLEAN_STRINGS:
+                return values
+            mapping[value] = BOOLEAN_STRINGS[value]
+        elif value in [True, False]:
+            mapping[value] = bool(value)
+        else:
+            return values
+    return values.map(mapping).astype('boolean')
+
+
+def convert_column(values, dtype):
+    """
+    Convert one column to a schema dtype, normalizing its sentinels first. Columns already of that dtype are left as is.
+    """
+    if dtype == 'category' or isinstance(dtype, CategoricalDtype):
+        if isinstance(values.dtype, CategoricalDtype) and (dtype == 'category' or values.dtype == dtype):
+            return values
+        return normalize_sentinels(values).astype(dtype)
+    if dtype == 'boolean':
+        return to_boolean(values)
+    if dtype in ['float32', 'float64']:
+        if values.dtype == dtype:
+            return values
+        return pd.to_numeric(normalize_sentinels(values), errors='coerce').astype(dtype)
+    if values.dtype == dtype:
+        return values
+    return normalize_sentinels(values).astype(dtype)
+
+
+def apply_schema(df, schema, shared_categories=()):
+    """
+    Convert the columns of a frame to compact dtypes, skipping columns it doesn't have. Can be applied more than once,
+    e.g. again after a concat turned categories back into objects.
+
+    :param schema: Dict of column name to dtype
+    :param shared_categories: Groups of categorical columns that are compared with each other and need the same categories
+    :return: A frame with the converted columns
+    """
+    df = df.copy(deep=False)
+    for column, dtype in schema.items():
+        if column in df.columns:
+            df[column] = convert_column(df[column], dtype)
+    for columns in shared_categories:
+        columns = [column for column in columns if column in df.columns]
+        if len(columns) > 1 and not all(isinstance(df[column].dtype, CategoricalDtype) and df[column].dtype == df[columns[0]].dtype for column in columns):
+            categories = pd.unique(pd.concat([df[column].astype(object) for column in columns]).dropna())
+            shared_dtype = CategoricalDtype(sorted(categories, key=str))
+            for column in columns:
+                df[column] = df[column].astype(object).astype(shared_dtype)
+    return df
+
+
+def object_values(values):
+    """
+    A column as plain Python objects with None for missing values, for printing the way object columns did.
+    """
+    values = values.astype(object)
+    return values.where(values.notna(), None)
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from urllib.parse import urljoin, urlparse
+import pandas as pd
+from lxml import html
+from cleaning_utils.name_matching import match_names
+from cleaning_utils.storage import write_frame
+from cleaning_utils.streaming import CsvAppender
+
+BASE_URL = "https://ischool.illinois.edu"
+RESEARCH_AREAS_PATH = "/research/areas"
+COMMITTEES_PATH = "/people/committees"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ResponseCache:
+    """
+    On-disk cache of response bodies with their ETag and Last-Modified headers, used to make conditional GETs.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def get(self, url):
+        """
+        Return the cached entry for a url ({url, etag, last_modified, body}) or None.
+        """
+        try:
+            with open(self._path(url) + '.json') as f:
+                entry = json.load(f)
+            with open(self._path(url) + '.html', encoding='utf-8') as f:
+                entry['body'] = f.read()
+        except FileNotFoundError:
+            return None
+        return entry
+
+    def put(self, url, body, etag=None, last_modified=None):
+        # The body is written first so an entry is never there without it
+        with open(self._path(url) + '.html', 'w', encoding='utf-8') as f:
+            f.write(body)
+        with open(self._path(url) + '.json', 'w') as f:
+            json.dump({'url': url, 'etag': etag, 'last_modified': last_modified}, f)
+
+
+class Fetcher:
+    """
+    Fetches pages concurrently with a limit on open requests per host, retries with exponential backoff,
+    and conditional GETs against a ResponseCache so unchanged pages aren't downloaded again.
+
+    Requests are made with urllib on worker threads, so no HTTP client library is needed.
+    """
+
+    def __init__(self, cache_directory, per_host_limit=4, retries=3, backoff=0.5, timeout=30):
+        self.cache = ResponseCache(cache_directory)
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'retried': 0}
+
+    def _get(self, url, cached):
+        """
+        Make one blocking GET. Returns (status, body, etag, last_modified).
+        """
+        request = urllib.request.Request(url, headers={'User-Agent': 'data-cleaning-cli'})
+        if cached is not None:
+            if cached.get('etag'):
+                request.add_header('If-None-Match', cached['etag'])
+            if cached.get('last_modified'):
+                request.add_header('If-Modified-Since', cached['last_modified'])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                charset = response.headers.get_content_charset() or 'utf-8'
+                return response.status, response.read().decode(charset, errors='replace'), response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, None, None, None
+            raise
+
+    async def fetch(self, url):
+        """
+        Return the body of a page, from the cache if the server says it hasn't changed.
+        """
+        cached = self.cache.get(url)
+        async with self._host_limits[urlparse(url).netloc]:
+            for attempt in range(self.retries + 1):
+                try:
+                    status, body, etag, last_modified = await asyncio.to_thread(self._get, url, cached)
+                    break
+                except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                    retryable = not isinstance(e, urllib.error.HTTPError) or e.code in RETRY_STATUSES
+                    if not retryable or attempt == self.retries:
+                        raise
+                    self.stats['retried'] += 1
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        if status == 304:
+            self.stats['not_modified'] += 1
+            return cached['body']
+        self.stats['downloaded'] += 1
+        self.cache.put(url, body, etag, last_modified)
+        return body
+
+    async def fetch_all(self, urls):
+        return await asyncio.gather(*[self.fetch(url) for url in urls])
+
+
+def _text(element, xpath):
+    found = element.xpath(xpath)
+    return found[0].text_content() if len(found) > 0 else None
+
+
+def _class_xpath(tag, class_name):
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+def parse_research_areas(page, base_url=BASE_URL):
+    """
+    Parse the research areas page into research_area, research_description and research_area_url records.
+    """
+    records = []
+    for term in html.document_fromstring(page).xpath(_class_xpath('li', 'taxonomy-term')):
+        link = term.xpath(_class_xpath('a', 'taxonomy-term__link'))[0]
+        records.append({
+            'research_area': link.text_content(),
+            'research_description': _text(term, _class_xpath('div', 'taxonomy-term__description')),
+            'research_area_url': urljoin(base_url, link.get('href')),
+        })
+    return records
+
+
+def parse_people(page, research_area, base_url=BASE_URL):
+    """
+    Parse a research area page into one record per person.
+
+    :param research_area: The research area record the page belongs to
+    """
+    records = []
+    for person in html.document_fromstring(page).xpath(_class_xpath('li', 'personnel-list__person-item')):
+        records.append({
+            'name': _text(person, _class_xpath('div', 'personnel-list__person-name')),
+            'description': _text(person, _class_xpath('div', 'personnel-list__person-role')),
+            'url': urljoin(base_url, person.xpath(_class_xpath('a', 'personnel-list__person-link'))[0].get('href')),
+            'research_area': research_area['research_area'],
+            'research_url': research_area['research_area_url'],
+            'research_description': research_area['research_description'],
+        })
+    return records
+
+
+def parse_committees(page):
+    """
+    Parse the committees page into committee_title, committee_member records. Paragraphs without a title are the
+    Executive Committee.
+    """
+    records = []
+    container = html.document_fromstring(page).xpath(_class_xpath('div', 'text-plus-image__noimage'))
+    for paragraph in container[0].xpath('.//p') if len(container) > 0 else []:
+        title = _text(paragraph, './/strong') or ''
+        for member in paragraph.text_content().replace(title, '').split(','):
+            cleaned_member = member.strip().replace('(ex officio)', '').replace('(Chair)', '').replace('ex officio)', '').replace('(Chair', '')
+            for name in cleaned_member.splitlines():
+                if len(name) > 1 and 'chair' not in name.lower():
+                    records.append({'committee_title': title or "Executive Committee", 'committee_member': name})
+    committee_df = pd.DataFrame(records, columns=['committee_title', 'committee_member'])
+    committee_df['name'] = committee_df.committee_member
+    return committee_df
+
+
+async def scrape_research_areas(fetcher, base_url=BASE_URL):
+    return pd.DataFrame(parse_research_areas(await fetcher.fetch(base_url + RESEARCH_AREAS_PATH), base_url))
+
+
+async def scrape_people(fetcher, research_areas, base_url=BASE_URL, sink=None):
+    """
+    Fetch every research area page concurrently. Each page's records are passed to `sink` as soon as the page
+    is parsed, and the full frame is returned in research area order.
+
+    :param sink: Optional function called with a frame of records per page, e.g. `CsvAppender.append`
+    """
+    async def scrape_area(research_area):
+        records = pd.DataFrame(parse_people(await fetcher.fetch(research_area['research_area_url']), research_area, base_url))
+        if sink is not None and len(records) > 0:
+            sink(records)
+        return records
+
+    pages = await asyncio.gather(*[scrape_area(research_area) for research_area in research_areas.to_dict('records')])
+    return pd.concat(pages, ignore_index=True) if len(pages) > 0 else pd.DataFrame()
+
+
+async def scrape_committees(fetcher, base_url=BASE_URL):
+    return parse_committees(await fetcher.fetch(base_url + COMMITTEES_PATH))
+
+
+def combine_people_and_committees(people_df, committee_df, score_cutoff=90):
+    """
+    Match committee members to people by name and join them, as in the iSchool people notebook.
+    """
+    matches_df = match_names(people_df.name.unique(), committee_df.committee_member.unique(), score_cutoff=score_cutoff)
+    merged_df = pd.merge(matches_df, committee_df[['committee_member', 'committee_title']], on=['committee_member'], how='outer')
+    merged_df.loc[merged_df.name.isna(), 'name'] = merged_df.committee_member
+    return pd.merge(people_df, merged_df, on=['name'], how='outer')
+
+
+async def scrape_ischool_people(output_path, cache_directory, per_host_limit=4, base_url=BASE_URL):
+    """
+    Scrape the iSchool people, research areas and committees into the frame `load_data` reads.
+    People records are streamed to a `.people.csv` file next to the output while pages come in, and the
+    combined frame is written once the committees are matched.
+
+    :param base_url: The site to scrape, e.g. a local server in place of the iSchool site
+    :return: The combined frame and the fetcher stats
+    """
+    fetcher = Fetcher(cache_directory, per_host_limit=per_host_limit)
+    people_store = CsvAppender(os.path.splitext(output_path)[0] + '.people.csv')
+    research_areas, committee_df = await asyncio.gather(scrape_research_areas(fetcher, base_url), scrape_committees(fetcher, base_url))
+    people_df = await scrape_people(fetcher, research_areas, base_url, sink=people_store.append)
+    all_df = combine_people_and_committees(people_df, committee_df)
+    write_frame(all_df, output_path)
+    return all_df, fetcher.stats
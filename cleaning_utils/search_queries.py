@@ -0,0 +1,71 @@
+import re
+import pandas as pd
+from cleaning_utils.consolidation import consolidate_language_data
+
+QUOTE_PATTERN = re.compile(r'%22|"')
+# Rows without a search query time are treated as coming from the first collection
+DEFAULT_SEARCH_QUERY_TIME = "2022-10-10"
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a single search query: drop quotes (encoded or not), decode colons and strip the page parameter.
+    Same result as `.replace('%22', '"').replace('"', '').replace('%3A', ':').split('&page')[0]`.
+    :param query: The search query
+    :type query: str
+    :return: The cleaned search query"""
+    return QUOTE_PATTERN.sub('', query).replace('%3A', ':').partition('&page')[0]
+
+
+def normalize_search_query(search_queries: pd.Series) -> pd.Series:
+    """Normalize a column of search queries. Queries repeat heavily across rows, so each distinct
+    query is only normalized once. Missing queries stay missing.
+    :param search_queries: The `search_query` column
+    :type search_queries: pandas.Series
+    :return: The `cleaned_search_query` column"""
+    unique_queries = search_queries.dropna().unique()
+    normalized = {query: normalize_query(query) for query in unique_queries if isinstance(query, str)}
+    return search_queries.map(normalized)
+
+
+def fix_entity_results(search_df: pd.DataFrame, join_field: str) -> pd.DataFrame:
+    """Use the Digital Humanities search query for every entity that also came back for the bare "Humanities" query.
+    :param search_df: The search queries data for repos or users
+    :type search_df: pandas.DataFrame
+    :param join_field: The entity key, `full_name` or `login`
+    :type join_field: str
+    :return: The fixed search queries data"""
+    fix_queries = search_df[(search_df.cleaned_search_query.str.contains('q="Humanities"')) & (search_df.search_term_source == "Digital Humanities")]
+    if len(fix_queries) > 0:
+        fix_mask = search_df[join_field].isin(fix_queries[join_field])
+        replace_queries = search_df[fix_mask & (search_df.search_term_source == "Digital Humanities")][[join_field, 'search_query']]
+        search_df.loc[fix_mask, 'cleaned_search_query'] = search_df.loc[fix_mask, join_field].map(replace_queries.set_index(join_field).to_dict()['search_query'])
+    return search_df
+
+
+def keep_latest_queries(search_df: pd.DataFrame, join_field: str) -> pd.DataFrame:
+    """Keep only the latest row for every entity and search query.
+    :param search_df: The search queries data for repos or users
+    :type search_df: pandas.DataFrame
+    :param join_field: The entity key, `full_name` or `login`
+    :type join_field: str
+    :return: The deduplicated search queries data, latest first"""
+    search_df.loc[search_df.search_query_time.isna(), 'search_query_time'] = DEFAULT_SEARCH_QUERY_TIME
+    search_df['search_query_time'] = pd.to_datetime(search_df['search_query_time'], errors='coerce')
+    return search_df.sort_values(by=['search_query_time'], ascending=False, kind='stable').drop_duplicates(subset=[join_field, 'cleaned_search_query'], keep='first')
+
+
+def prepare_entity_search_queries(search_df: pd.DataFrame, join_field: str, dedupe_by_time: bool) -> tuple:
+    """The per-entity steps that run before language detection: consolidate the language fields, keep the latest
+    row per query and fix the results. `cleaning_utils.polars_engine` has a lazy Polars version of the same steps.
+    :param search_df: The search queries data for repos or users
+    :type search_df: pandas.DataFrame
+    :param join_field: The entity key, `full_name` or `login`
+    :type join_field: str
+    :param dedupe_by_time: Whether to keep only the latest row per entity and query
+    :type dedupe_by_time: bool
+    :return: The prepared search queries data and the conflicts frame of `consolidate_language_data`
+    :rtype: tuple"""
+    search_df, conflicts = consolidate_language_data(search_df, join_field)
+    if dedupe_by_time:
+        search_df = keep_latest_queries(search_df, join_field)
+    return fix_entity_results(search_df, join_field), conflicts
@@ -0,0 +1,162 @@
+"""
+Split a review queue between several reviewers and merge their decisions back.
+
+Each reviewer runs a script with `--shard i --shards n --reviewer name`. They only get the keys of their shard,
+and their decisions go to their own journal next to the output, so nobody rewrites the shared output file.
+The shard journals are then merged into the canonical journal:
+
+    python -m cleaning_utils.sharding OUTPUT.journal.jsonl OUTPUT.alice.journal.jsonl OUTPUT.bob.journal.jsonl --policy flag
+
+and the next unsharded run replays and compacts it as usual.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pandas as pd
+from cleaning_utils.journal import DecisionJournal
+
+POLICIES = ['last-writer-wins', 'flag']
+
+
+def shard_of(key, shards):
+    """
+    Stable shard of a key: the same on every machine and run, unlike Python's `hash`.
+    """
+    digest = hashlib.sha1(str(key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+class ReviewShard:
+    """
+    The part of a review queue one reviewer works through. With a single shard, everything stays as before.
+    """
+
+    def __init__(self, shard=0, shards=1, reviewer=None):
+        if not 0 <= shard < shards:
+            raise ValueError(f"Shard {shard} is not between 0 and {shards - 1}")
+        self.shard = shard
+        self.shards = shards
+        self.reviewer = reviewer or f"shard{shard}"
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.shard, args.shards, args.reviewer)
+
+    @property
+    def enabled(self):
+        return self.shards > 1
+
+    def select(self, keys):
+        """
+        Keep the keys that belong to this shard, in order.
+        """
+        if not self.enabled:
+            return list(keys)
+        return [key for key in keys if shard_of(key, self.shards) == self.shard]
+
+    def journal_path(self, output_path):
+        """
+        The journal this reviewer writes to: the canonical one, or a per-reviewer one when sharded.
+        """
+        if not self.enabled:
+            return output_path + ".journal.jsonl"
+        return f"{output_path}.{self.reviewer}.journal.jsonl"
+
+    def replay_merged(self, df, output_path, key_field, column):
+        """
+        When sharded, replay the decisions already merged into the canonical journal (read only).
+
+        :return: The dataframe and the keys that already have a merged decision for `column`
+        """
+        if not self.enabled:
+            return df, set()
+        merged_journal = DecisionJournal(output_path + ".journal.jsonl", key_field=key_field, lock=False)
+        return merged_journal.replay(df), merged_journal.reviewed_keys(column)
+
+    def decision_history(self, journal, output_path):
+        """
+        Every decision this reviewer can learn from: their own journal's history and, when sharded, the history of
+        the canonical journal the shards are merged into.
+        """
+        history = journal.history()
+        if not self.enabled:
+            return history
+        return DecisionJournal(output_path + ".journal.jsonl", lock=False).history() + history
+
+
+def add_shard_arguments(parser):
+    parser.add_argument('--shard', type=int, default=0, help='The shard of the review queue to work on, from 0')
+    parser.add_argument('--shards', type=int, default=1, help='The number of reviewers splitting the queue')
+    parser.add_argument('--reviewer', default=None, help='Name used for this reviewer\'s decision file')
+    return parser
+
+
+JOURNAL_SUFFIX = '.journal.jsonl'
+
+
+def _reviewer_name(journal_path, shard_journal_path):
+    """
+    The reviewer of a shard journal named like `ReviewShard.journal_path`: what's between the output file name and
+    the journal suffix, so reviewer names with dots are kept whole. Other files are named by their file name.
+    """
+    prefix = os.path.basename(journal_path)[:-len(JOURNAL_SUFFIX)] + '.'
+    name = os.path.basename(shard_journal_path)
+    if journal_path.endswith(JOURNAL_SUFFIX) and name.startswith(prefix) and name.endswith(JOURNAL_SUFFIX) and len(name) > len(prefix) + len(JOURNAL_SUFFIX):
+        return name[len(prefix):-len(JOURNAL_SUFFIX)]
+    return name
+
+
+def merge_shard_journals(journal_path, shard_journal_paths, policy='last-writer-wins'):
+    """
+    Merge reviewer journals into the canonical journal.
+
+    A key/column decided differently by several reviewers is a conflict. With `last-writer-wins` the latest decision
+    is kept; with `flag` none is merged, so the key comes up again in the next unsharded session.
+    Merged shard journals are renamed with a `.merged` suffix so they aren't merged twice.
+
+    :return: (number of merged decisions, frame of conflicting decisions)
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown merge policy {policy}, expected one of {POLICIES}")
+    decisions = []
+    for path in shard_journal_paths:
+        reviewer = _reviewer_name(journal_path, path)
+        for entry in DecisionJournal(path).entries():
+            decisions.append({**entry, 'reviewer': reviewer, 'value_key': json.dumps(entry['new_value'], sort_keys=True, default=str)})
+    if len(decisions) == 0:
+        return 0, pd.DataFrame(columns=['row_key', 'column', 'reviewer', 'new_value', 'timestamp'])
+
+    decisions_df = pd.DataFrame(decisions)
+    decisions_df['key'] = decisions_df.row_key.map(lambda key: json.dumps(key, default=str))
+    # A reviewer's own later decision replaces their earlier one
+    latest = decisions_df.sort_values('timestamp', kind='stable').drop_duplicates(subset=['key', 'column', 'reviewer'], keep='last')
+    values = latest.groupby(['key', 'column']).value_key.transform('nunique')
+    conflicts = latest[values > 1]
+    if policy == 'flag':
+        merged = latest[values == 1].drop_duplicates(subset=['key', 'column'], keep='last')
+    else:
+        merged = latest.drop_duplicates(subset=['key', 'column'], keep='last')
+
+    entries = merged.sort_values('timestamp', kind='stable')[['row_key', 'column', 'old_value', 'new_value', 'timestamp']].to_dict('records')
+    journal = DecisionJournal(journal_path)
+    journal.append_entries(entries)
+    journal.close()
+    for path in shard_journal_paths:
+        os.replace(path, path + '.merged')
+    return len(entries), conflicts[['row_key', 'column', 'reviewer', 'new_value', 'timestamp']].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('journal', help='The canonical journal, e.g. OUTPUT.journal.jsonl')
+    parser.add_argument('shard_journals', nargs='+', help='The reviewer journals to merge into it')
+    parser.add_argument('--policy', choices=POLICIES, default='last-writer-wins')
+    parser.add_argument('--conflicts', default=None, help='Write the conflicting decisions to this CSV')
+    args = parser.parse_args()
+
+    merged_count, conflicts = merge_shard_journals(args.journal, args.shard_journals, args.policy)
+    print(f"Merged {merged_count} decisions from {len(args.shard_journals)} reviewers, {conflicts[['row_key', 'column']].drop_duplicates().shape[0]} conflicting")
+    if args.conflicts and len(conflicts) > 0:
+        conflicts.to_csv(args.conflicts, index=False)
+        print(f"Conflicts written to {args.conflicts}")
@@ -0,0 +1,256 @@
+import os
+import pandas as pd
+from cleaning_utils.profiling import stage
+from cleaning_utils.schema import apply_schema
+
+try:
+    import pyarrow
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+# The fastest format available, for intermediate files no other tool reads
+DEFAULT_FORMAT = 'parquet' if pyarrow is not None else 'csv'
+# Set to parquet or feather to store the frames written to CSV paths in that format instead, next to the CSV
+STORAGE_FORMAT_VARIABLE = 'CLEANING_STORAGE_FORMAT'
+
+
+def file_format(path):
+    """
+    Get the storage format of a path from its extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for name, format_extension in FORMAT_EXTENSIONS.items():
+        if extension == format_extension:
+            return name
+    return 'csv'
+
+
+def storage_path(path, format=None):
+    """
+    Swap the extension of a path for the one of the given storage format (the default format if None).
+    """
+    format = format or DEFAULT_FORMAT
+    return os.path.splitext(path)[0] + FORMAT_EXTENSIONS[format]
+
+
+class AmbiguousFrameError(ValueError):
+    """
+    Raised when a CSV path has Parquet or Feather copies next to it and nothing says which one to read.
+    """
+
+
+def resolve_path(path):
+    """
+    Find the file to read for a path. Parquet and Feather paths are read as given. A CSV path is read in the
+    format set by the `CLEANING_STORAGE_FORMAT` environment variable, so the copy `write_frame` stores next to it
+    is read back. Without it, the path is read in whichever format it exists in, and if it exists in several,
+    `AmbiguousFrameError` is raised rather than guessing which one holds the current data.
+    Returns None if no file exists.
+    """
+    if file_format(path) != 'csv':
+        return path if os.path.exists(path) else None
+    format = os.environ.get(STORAGE_FORMAT_VARIABLE)
+    if format and os.path.exists(storage_path(path, format)):
+        return storage_path(path, format)
+    candidates = [path]
+    if pyarrow is not None:
+        candidates += [storage_path(path, format) for format in ['parquet', 'feather']]
+    candidates = [candidate for candidate in candidates if os.path.exists(candidate)]
+    if len(candidates) == 0:
+        return None
+    if len(candidates) > 1:
+        raise AmbiguousFrameError(f"{', '.join(candidates)} all exist. Set {STORAGE_FORMAT_VARIABLE} to the format to read, or remove the stale copies.")
+    return candidates[0]
+
+
+def frame_exists(path):
+    """
+    Check whether a frame is stored at the path in any supported format.
+    """
+    return resolve_path(path) is not None
+
+
+def _filters_to_expression(filters):
+    """
+    Convert (column, op, value) filters into a single pyarrow dataset expression.
+    """
+    expression = None
+    for column, op, value in filters:
+        field = ds.field(column)
+        if op == 'is_null':
+            condition = field.is_null()
+        elif op == 'not_null':
+            condition = field.is_valid()
+        elif op == 'in':
+            condition = field.isin(value)
+        elif op == 'not in':
+            condition = ~field.isin(value)
+        elif op == '==':
+            condition = field == value
+        elif op == '!=':
+            condition = field != value
+        elif op == '<':
+            condition = field < value
+        elif op == '<=':
+            condition = field <= value
+        elif op == '>':
+            condition = field > value
+        elif op == '>=':
+            condition = field >= value
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _filters_to_mask(df, filters):
+    """
+    Evaluate (column, op, value) filters against a loaded dataframe.
+    """
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        values = df[column]
+        if op == 'is_null':
+            mask &= values.isna()
+        elif op == 'not_null':
+            mask &= values.notna()
+        elif op == 'in':
+            mask &= values.isin(value)
+        elif op == 'not in':
+            mask &= ~values.isin(value)
+        elif op == '==':
+            mask &= values == value
+        elif op == '!=':
+            mask &= values != value
+        elif op == '<':
+            mask &= values < value
+        elif op == '<=':
+            mask &= values <= value
+        elif op == '>':
+            mask &= values > value
+        elif op == '>=':
+            mask &= values >= value
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return mask.fillna(False).astype(bool)
+
+
+def read_frame(path, columns=None, filters=None, memory_map=False, schema=None):
+    """
+    Read a frame from Parquet, Feather or CSV.
+
+    :param path: The path to read. For a CSV path, the Parquet or Feather copy next to it may be read instead, see `resolve_path`.
+    :param columns: Only read these columns
+    :param filters: A list of (column, op, value) tuples that rows must all match. Ops are ==, !=, <, <=, >, >=,
+        in, not in, is_null and not_null. They are pushed down to the reader for Parquet and Feather.
+    :param memory_map: Memory-map Feather files instead of reading them into memory
+    :param schema: Optional dict of column to compact dtype, applied with `apply_schema` after the filters
+    """
+    if schema is not None:
+        return apply_schema(read_frame(path, columns, filters, memory_map), schema)
+    resolved_path = resolve_path(path)
+    if resolved_path is None:
+        raise FileNotFoundError(path)
+    format = file_format(resolved_path)
+    filter_columns = [column for column, _, _ in filters or []]
+
+    if format == 'parquet':
+        expression = _filters_to_expression(filters) if filters else None
+        return pd.read_parquet(resolved_path, columns=columns, filters=expression)
+    if format == 'feather':
+        read_columns = None if columns is None else list(dict.fromkeys(columns + filter_columns))
+        table = feather.read_table(resolved_path, columns=read_columns, memory_map=memory_map)
+        if filters:
+            table = table.filter(_filters_to_expression(filters))
+        df = table.to_pandas()
+        return df if columns is None else df[columns]
+
+    read_columns = None if columns is None else list(dict.fromkeys(columns + filter_columns))
+    df = pd.read_csv(resolved_path, usecols=read_columns)
+    if filters:
+        df = df[_filters_to_mask(df, filters)].reset_index(drop=True)
+    return df if columns is None else df[columns]
+
+
+def iter_frame_chunks(path, chunksize, columns=None, filters=None, schema=None):
+    """
+    Read a frame in chunks of at most `chunksize` rows, so files larger than memory can be streamed.
+    Takes the same `columns`, `filters` and `schema` as `read_frame`; they are applied to each chunk.
+    """
+    resolved_path = resolve_path(path)
+    if resolved_path is None:
+        raise FileNotFoundError(path)
+    format = file_format(resolved_path)
+    filter_columns = [column for column, _, _ in filters or []]
+    read_columns = None if columns is None else list(dict.fromkeys(columns + filter_columns))
+
+    if format == 'parquet':
+        batches = pyarrow.parquet.ParquetFile(resolved_path).iter_batches(batch_size=chunksize, columns=read_columns)
+        chunks = (batch.to_pandas() for batch in batches)
+    elif format == 'feather':
+        batches = feather.read_table(resolved_path, columns=read_columns, memory_map=True).to_batches(max_chunksize=chunksize)
+        chunks = (batch.to_pandas() for batch in batches)
+    else:
+        chunks = pd.read_csv(resolved_path, usecols=read_columns, chunksize=chunksize)
+
+    for chunk in chunks:
+        if filters:
+            chunk = chunk[_filters_to_mask(chunk, filters)].reset_index(drop=True)
+        chunk = chunk if columns is None else chunk[columns]
+        yield chunk if schema is None else apply_schema(chunk, schema)
+
+
+def _arrow_safe(df):
+    """
+    Convert object columns that mix Python types (e.g. True and 'None') to strings so Arrow can store them.
+    """
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pyarrow.array(df[column], from_pandas=True)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            df[column] = df[column].map(lambda value: value if pd.isna(value) else str(value), na_action='ignore')
+    return df
+
+
+def write_frame(df, path, format=None):
+    """
+    Write a frame in the format of its path's extension. Parquet or Feather copies of CSV paths are opt-in, with
+    `format` or the `CLEANING_STORAGE_FORMAT` environment variable, and are written next to the CSV path.
+
+    :return: The path that was written
+    """
+    with stage('write_frame', rows_in=len(df), path=path) as record:
+        if format is None:
+            format = os.environ.get(STORAGE_FORMAT_VARIABLE) if file_format(path) == 'csv' else None
+            format = format or file_format(path)
+        output_path = storage_path(path, format)
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if format in ['parquet', 'feather']:
+            df = df.reset_index(drop=True)
+            try:
+                table = pyarrow.Table.from_pandas(df, preserve_index=False)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                table = pyarrow.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+            if format == 'parquet':
+                pyarrow.parquet.write_table(table, output_path)
+            else:
+                feather.write_feather(table, output_path)
+        else:
+            df.to_csv(output_path, index=False)
+        record['rows_out'], record['format'] = len(df), format
+    return output_path
+
+
+def export_csv(path, csv_path=None):
+    """
+    Export a stored frame to CSV for tools that can't read Parquet or Feather.
+    """
+    csv_path = csv_path or storage_path(path, 'csv')
+    return write_frame(read_frame(path), csv_path, format='csv')
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from cleaning_utils.storage import DEFAULT_FORMAT, FORMAT_EXTENSIONS, read_frame, write_frame
+from cleaning_utils.profiling import stage
+
+
+class HashPartitioner:
+    """
+    Spills chunks to disk partitioned by a hash of the entity key, so every row of an entity ends up in the
+    same partition and each partition can be processed on its own in bounded memory.
+
+    Pieces are numbered in the order they are added, so reading a partition back keeps the original
+    relative order of its rows.
+    """
+
+    def __init__(self, key_field, partitions=64, directory=None):
+        """
+        :param key_field: The entity key column, e.g. `full_name` or `login`
+        :param partitions: The number of partitions. Each one should fit in memory.
+        :param directory: Where the partitions are spilled, a temporary directory by default
+        """
+        self.key_field = key_field
+        self.partitions = partitions
+        self.directory = directory or tempfile.mkdtemp(prefix='partitions-')
+        self._pieces = 0
+
+    def partition_ids(self, keys):
+        """
+        Return the partition of every key. Stable across runs and processes, unlike Python's `hash`.
+        """
+        return pd.util.hash_array(keys.astype(str).to_numpy(dtype=object)) % np.uint64(self.partitions)
+
+    def _partition_directory(self, partition):
+        return os.path.join(self.directory, f"partition-{partition:04d}")
+
+    def add(self, chunk):
+        """
+        Spill a chunk, in the fastest storage format available. Rows without a key are dropped, as every per-entity stage drops them.
+        """
+        chunk = chunk[chunk[self.key_field].notna()]
+        for partition, rows in chunk.groupby(self.partition_ids(chunk[self.key_field]), sort=False):
+            write_frame(rows, os.path.join(self._partition_directory(int(partition)), f"piece-{self._pieces:08d}{FORMAT_EXTENSIONS[DEFAULT_FORMAT]}"))
+            self._pieces += 1
+
+    def __iter__(self):
+        """
+        Yield every non-empty partition as a single frame.
+        """
+        for partition in range(self.partitions):
+            directory = self._partition_directory(partition)
+            if not os.path.isdir(directory):
+                continue
+            pieces = sorted(os.listdir(directory))
+            yield pd.concat([read_frame(os.path.join(directory, piece)) for piece in pieces], ignore_index=True)
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CsvAppender:
+    """
+    Writes a CSV one frame at a time. The header comes from the first frame and later frames are aligned to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = None
+        self.rows = 0
+
+    def append(self, df):
+        with stage('csv_append', rows_in=len(df), path=self.path) as record:
+            if self.columns is None:
+                self.columns = df.columns.tolist()
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                df.to_csv(self.path, index=False)
+            else:
+                df.reindex(columns=self.columns).to_csv(self.path, mode='a', header=False, index=False)
+            record['rows_out'] = len(df)
+        self.rows += len(df)
+
+
+def stream_entities(chunks, key_field, stage_function, output_path, partitions=64, directory=None):
+    """
+    Run a per-entity stage over data larger than memory: chunks are hash-partitioned on disk by entity key,
+    then each partition is run through the stage and appended to the output. Gives the same rows as running the
+    stage on the whole frame at once, as long as the stage treats entities independently.
+
+    :param chunks: An iterable of input frames, in the order they would be concatenated
+    :param key_field: The entity key column
+    :param stage_function: Function from an input frame to an output frame
+    :param output_path: The CSV the output is written to
+    :param partitions: The number of on-disk partitions
+    :param directory: Where the partitions are spilled, a temporary directory by default
+    :return: The number of rows written
+    """
+    partitioner = HashPartitioner(key_field, partitions=partitions, directory=directory)
+    try:
+        for chunk in chunks:
+            partitioner.add(chunk)
+        output = CsvAppender(output_path)
+        for partition in partitioner:
+            output.append(stage_function(partition))
+        return output.rows
+    finally:
+        partitioner.cleanup()
+
+
+def frames_match(left, right):
+    """
+    Check that two frames hold the same rows regardless of row and column order, e.g. the streamed and in-memory output
+    read back from their CSVs.
+    """
+    if sorted(left.columns) != sorted(right.columns):
+        return False
+    columns = left.columns.tolist()
+    left = left.astype(str).sort_values(columns).reset_index(drop=True)
+    right = right[columns].astype(str).sort_values(columns).reset_index(drop=True)
+    return left.equals(right)
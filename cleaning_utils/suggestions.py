@@ -0,0 +1,264 @@
+"""
+Suggest review answers from the decisions already made, so repeated patterns don't have to be answered again.
+
+Every entity (or feature column) gets a signature: the values of a few evidence columns, e.g. its detected and
+natural languages and its search term source. A suggestion comes from the decisions on the same signature first,
+and from a naive Bayes model over the signature values when the signature hasn't been decided before. Pending
+records with the same signature form a cluster, and a cluster whose exact-signature suggestion is confident enough
+can be accepted in one prompt.
+"""
+import math
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+from cleaning_utils.journal import _to_json_value
+from cleaning_utils.profiling import think, save
+
+LANGUAGE_SIGNATURE = ['detected_language', 'natural_language', 'search_term_source']
+LANGUAGE_TARGETS = ['finalized_language', 'keep_resource']
+FEATURE_SIGNATURE = ['tw_category', 'serials_category', 'tw_unique_values_bucket', 'serials_unique_values_bucket']
+# A cluster is offered for bulk accept when its suggestion has at least this confidence for every target
+BULK_CONFIDENCE = 0.9
+# Suggestions below this confidence aren't pre-filled
+PREFILL_CONFIDENCE = 0.6
+# The journal source of bulk-accepted values, which are the suggester's own output and aren't learned from
+BULK_ACCEPT_SOURCE = 'bulk_accept'
+
+
+def signature_frame(df, key_field, columns):
+    """
+    One row per key with, for every column, its distinct non-missing values sorted and joined with "|".
+    """
+    signatures = pd.DataFrame(index=pd.Index(pd.unique(df[key_field].dropna()), name=key_field))
+    for column in columns:
+        values = df[[key_field, column]].dropna().drop_duplicates()
+        values[column] = values[column].astype(str).astype(object)
+        values = values.sort_values([key_field, column])
+        # Joined one rank at a time instead of per key, as an entity only has a few distinct values
+        rank = values.groupby(key_field, sort=False).cumcount()
+        joined = None
+        for position in range(int(rank.max()) + 1 if len(rank) > 0 else 0):
+            ranked = values[rank == position].set_index(key_field)[column]
+            joined = ranked if joined is None else joined + ('|' + ranked).reindex(joined.index).fillna('')
+        signatures[column] = (joined if joined is not None else pd.Series(dtype=object)).reindex(signatures.index).fillna('')
+    return signatures
+
+
+class SuggestionModel:
+    """
+    Predicts one target from a signature: the most frequent decision for that exact signature, with a naive Bayes
+    fallback over the individual signature values. Counts are kept as dicts so decisions can be added one at a time.
+    """
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.exact = defaultdict(Counter)
+        self.class_counts = Counter()
+        self.value_counts = defaultdict(Counter)
+        self.feature_values = defaultdict(set)
+
+    def fit(self, signatures, targets):
+        """
+        :param signatures: Frame of signature columns indexed by key
+        :param targets: Decided values indexed by key. Missing values are ignored.
+        """
+        data = signatures.join(targets.rename('__target'), how='inner')
+        data = data[data['__target'].notna()]
+        for row in data.itertuples(index=False):
+            self.observe(tuple(row[:-1]), _to_json_value(row[-1]))
+        return self
+
+    def observe(self, signature, value):
+        self.exact[signature][value] += 1
+        self.class_counts[value] += 1
+        for position, feature in enumerate(signature):
+            self.value_counts[(position, feature)][value] += 1
+            self.feature_values[position].add(feature)
+
+    def predict(self, signature):
+        """
+        :return: (value, confidence, support, source), where source is "exact", "model", or None without any decisions.
+            Exact confidence is the rule of succession, (majority + 1) / (decisions + 2), so a few unanimous
+            decisions aren't trusted as much as many.
+        """
+        decided = self.exact.get(signature)
+        if decided:
+            value, count = decided.most_common(1)[0]
+            total = sum(decided.values())
+            return value, (count + 1) / (total + 2), total, 'exact'
+        if len(self.class_counts) == 0:
+            return None, 0.0, 0, None
+        total = sum(self.class_counts.values())
+        scores = {}
+        for value, class_count in self.class_counts.items():
+            score = math.log((class_count + self.alpha) / (total + self.alpha * len(self.class_counts)))
+            for position, feature in enumerate(signature):
+                count = self.value_counts[(position, feature)][value]
+                score += math.log((count + self.alpha) / (class_count + self.alpha * (len(self.feature_values[position]) + 1)))
+            scores[value] = score
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / normalizer, 0, 'model'
+
+
+class ReviewSuggester:
+    """
+    Suggestions for every target of a review (e.g. finalized_language and keep_resource) by key.
+    """
+
+    def __init__(self, signatures, targets):
+        """
+        :param signatures: Frame of signature columns indexed by key, for decided and pending keys
+        :param targets: Frame of decided values indexed by key, one column per target
+        """
+        self.signatures = signatures
+        self.targets = list(targets.columns)
+        self.models = {target: SuggestionModel().fit(signatures, targets[target]) for target in self.targets}
+
+    def signature(self, key):
+        return tuple(self.signatures.loc[key]) if key in self.signatures.index else None
+
+    def suggest(self, key):
+        """
+        :return: A dict of target to (value, confidence, support, source), or None for an unknown key
+        """
+        signature = self.signature(key)
+        if signature is None:
+            return None
+        return {target: model.predict(signature) for target, model in self.models.items()}
+
+    def observe(self, key, values, source=None):
+        """
+        Learn from a decision made during the session. Decisions with a `source` weren't made by a reviewer and are
+        ignored, as in `journal_decisions`.
+        """
+        signature = self.signature(key)
+        if signature is not None and source is None:
+            for target, value in values.items():
+                if target in self.models and not pd.isna(value):
+                    self.models[target].observe(signature, _to_json_value(value))
+
+    def clusters(self, keys, confidence=BULK_CONFIDENCE):
+        """
+        Group pending keys by signature and keep the groups whose exact-signature suggestion reaches `confidence`
+        for every target, largest first.
+
+        :return: A list of (signature dict, keys, suggestion dict) tuples
+        """
+        pending = self.signatures.loc[[key for key in keys if key in self.signatures.index]]
+        clusters = []
+        for signature, group in pending.groupby(list(pending.columns), sort=False):
+            signature = signature if isinstance(signature, tuple) else (signature,)
+            suggestion = {target: model.predict(signature) for target, model in self.models.items()}
+            if all(source == 'exact' and score >= confidence for _, score, _, source in suggestion.values()):
+                clusters.append((dict(zip(pending.columns, signature)), group.index.tolist(), suggestion))
+        return sorted(clusters, key=lambda cluster: len(cluster[1]), reverse=True)
+
+
+def journal_decisions(entries, targets):
+    """
+    The latest reviewer decision for every key and target in a list of journal entries, e.g.
+    `DecisionJournal.history()`. Entries with a `source` (e.g. bulk accepts) weren't made by a reviewer and are left out.
+
+    :return: A frame of decided values indexed by key, one column per target, missing where a target wasn't decided
+    """
+    decisions = pd.DataFrame([entry for entry in entries if entry.get('source') is None and entry['column'] in targets],
+                             columns=['row_key', 'column', 'new_value'])
+    decided = decisions.drop_duplicates(subset=['row_key', 'column'], keep='last').pivot(index='row_key', columns='column', values='new_value')
+    return decided.reindex(columns=targets).astype(object)
+
+
+def language_suggester(df, key_field, entries):
+    """
+    Learn finalized_language and keep_resource from the reviewers' decisions in the journal entries. Values the
+    language rules filled in aren't decisions, so the frame is only used for the signatures.
+
+    :param entries: Journal entries, e.g. `DecisionJournal.history()`
+    """
+    signatures = signature_frame(df, key_field, LANGUAGE_SIGNATURE)
+    return ReviewSuggester(signatures, journal_decisions(entries, LANGUAGE_TARGETS))
+
+
+def feature_choice(df):
+    """
+    The reviewer's feature_type as the choice made in `get_feature_type`: tw, serials, or the category picked.
+    """
+    feature_type = df.feature_type.astype(object)
+    choice = feature_type.where(feature_type.notna(), None)
+    choice = choice.mask(feature_type == df.serials_category.astype(object), 'serials')
+    return choice.mask(feature_type == df.tw_category.astype(object), 'tw')
+
+
+def feature_suggester(df, entries=()):
+    """
+    Learn keep_feature and the tw/serials choice from the columns already classified. Columns are compared by their
+    two categories and the order of magnitude of their unique value counts.
+
+    :param df: The combined column distribution, with keep_feature and feature_type
+    :param entries: Journal entries, e.g. `DecisionJournal.history()`. Columns whose latest decision has a `source`
+        were bulk accepted rather than classified by a reviewer, and are left out.
+    """
+    features = df[['column_name', 'tw_category', 'serials_category']].copy()
+    for corpus in ['tw', 'serials']:
+        features[f'{corpus}_unique_values_bucket'] = np.floor(np.log10(df[f'{corpus}_unique_values'].astype(float).clip(lower=1))).astype('Int64')
+    signatures = signature_frame(features, 'column_name', FEATURE_SIGNATURE)
+    latest = {entry['row_key']: entry.get('source') for entry in entries if entry['column'] == 'feature_type'}
+    bulk_accepted = [key for key, source in latest.items() if source is not None]
+    decided = df[(df.tw_category.astype(object) != df.serials_category.astype(object)) & df.keep_feature.notna() & ~df.column_name.isin(bulk_accepted)]
+    targets = pd.DataFrame({'keep_feature': decided.keep_feature.astype(object), 'feature_choice': feature_choice(decided)})
+    return ReviewSuggester(signatures, targets.set_index(decided.column_name))
+
+
+def chosen_feature_type(choice, tw_category, serials_category):
+    """
+    The feature_type for a tw/serials choice from `feature_suggester`.
+    """
+    return {'tw': tw_category, 'serials': serials_category}.get(choice, choice)
+
+
+def prefill(suggestion, target, confidence=PREFILL_CONFIDENCE):
+    """
+    The suggested value of a target if it is confident enough to pre-fill the prompt, otherwise None.
+    """
+    if suggestion is None:
+        return None
+    value, score, _, source = suggestion[target]
+    return value if source is not None and score >= confidence else None
+
+
+def describe_suggestion(value, confidence, support, source):
+    """
+    A short description of a suggestion for a prompt, e.g. "fr, 92% from 11 decisions".
+    """
+    if source == 'exact':
+        return f"{value}, {confidence:.0%} from {support} decision{'s' if support != 1 else ''}"
+    return f"{value}, {confidence:.0%} from similar decisions"
+
+
+def bulk_accept(suggester, keys, accept, console, label, confidence=BULK_CONFIDENCE):
+    """
+    Offer every high-confidence cluster of pending keys for acceptance in one prompt.
+
+    :param accept: Called with (key, {target: value}, source) for every accepted key, where source is
+        `BULK_ACCEPT_SOURCE`. It should be journaled and passed to `ReviewSuggester.observe` as the source, so
+        accepted values aren't learned from.
+    :param console: A rich Console, used to print the cluster and ask
+    :param label: What the keys are, e.g. "repos"
+    :return: The keys that still need an individual review, in their original order
+    """
+    accepted = set()
+    for signature, cluster_keys, suggestion in suggester.clusters(keys, confidence):
+        console.print(f"{len(cluster_keys)} {label} with " + ", ".join(f"{column}: {value or 'None'}" for column, value in signature.items()))
+        console.print("  e.g. " + ", ".join(map(str, cluster_keys[:5])))
+        console.print("  Suggested " + "; ".join(f"{target}: {describe_suggestion(*values)}" for target, values in suggestion.items()))
+        with think():
+            answer = console.input(f"Accept for all {len(cluster_keys)} {label}? (y/n/q to stop) ")
+        if answer == 'q':
+            break
+        if answer == 'y':
+            values = {target: value for target, (value, _, _, _) in suggestion.items()}
+            with save():
+                for key in cluster_keys:
+                    accept(key, values, BULK_ACCEPT_SOURCE)
+            accepted.update(cluster_keys)
+    return [key for key in keys if key not in accepted]
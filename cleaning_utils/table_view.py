@@ -0,0 +1,67 @@
+import pandas as pd
+from rich.table import Table
+from cleaning_utils.profiling import think
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def format_cells(df):
+    """
+    Format every cell as a string, one vectorized `astype(str)` per column instead of `str()` per cell.
+    """
+    return pd.DataFrame({col: df[col].astype(str) for col in df.columns}, index=df.index)
+
+
+def window_table(df, start=0, size=DEFAULT_PAGE_SIZE, column_style="dim", header_style="bold magenta", caption=None):
+    """
+    Build a rich Table from only the rows in [start, start + size), so the cost doesn't depend on the frame length.
+    """
+    table = Table(show_header=True, header_style=header_style, caption=caption)
+    for col in df.columns:
+        table.add_column(str(col), style=column_style)
+    for row in format_cells(df.iloc[start:start + size]).itertuples(index=False):
+        table.add_row(*row)
+    return table
+
+
+def top_counts(value_counts, top=DEFAULT_PAGE_SIZE):
+    """
+    Keep the `top` most frequent values of a value_counts Series and sum the rest into a single "other" row.
+
+    :return: A frame with Value and Count columns
+    """
+    counts = pd.DataFrame({'Value': value_counts.index[:top].astype(str), 'Count': value_counts.to_numpy()[:top]})
+    if len(value_counts) > top:
+        other = pd.DataFrame({'Value': [f"other ({len(value_counts) - top} values)"], 'Count': [value_counts.iloc[top:].sum()]})
+        counts = pd.concat([counts, other], ignore_index=True)
+    return counts
+
+
+class TablePager:
+    """
+    Page through a frame in a console, rendering one window at a time. Keys: n (next), p (previous), q or enter (quit).
+    """
+
+    def __init__(self, df, console, page_size=DEFAULT_PAGE_SIZE, **table_options):
+        self.df = df
+        self.console = console
+        self.page_size = page_size
+        self.table_options = table_options
+        self.pages = max((len(df) + page_size - 1) // page_size, 1)
+
+    def render(self, page):
+        start = page * self.page_size
+        caption = f"Rows {start + 1}-{min(start + self.page_size, len(self.df))} of {len(self.df)}, page {page + 1} of {self.pages}"
+        return window_table(self.df, start, self.page_size, caption=caption, **self.table_options)
+
+    def show(self, page=0):
+        while True:
+            self.console.print(self.render(page))
+            with think():
+                key = self.console.input("[n]ext, [p]revious, [q]uit: ").strip().lower()
+            if key == 'n':
+                page = min(page + 1, self.pages - 1)
+            elif key == 'p':
+                page = max(page - 1, 0)
+            elif key in ['q', '']:
+                return
@@ -1,44 +1,74 @@
 import pandas as pd
 from rich.console import Console
 from rich.prompt import Prompt, Confirm
-from rich.table import Table
+from cleaning_utils.journal import DecisionJournal
+from cleaning_utils.storage import read_frame
+from cleaning_utils.table_view import window_table
+from cleaning_utils.review_driver import ReviewDriver, QueuedJournal
+from cleaning_utils.change_tracking import file_hash
+from cleaning_utils.graph_export import update_graph_exports
+from cleaning_utils.profiling import profiled, review, think, save
+from cleaning_utils.schema import PEOPLE_SCHEMA
 
+@profiled()
 def load_data(file_path):
-    """ Load data from a CSV file """
+    """ Load data from a Parquet, Feather or CSV file, with the repeated research area and committee columns as categories """
     try:
-        return pd.read_csv(file_path)
+        return read_frame(file_path, schema=PEOPLE_SCHEMA)
     except Exception as e:
         console.print(f"[red]Error loading file: {e}[/red]")
         return None
 
 def display_data(df, console, rows=5):
     """ Display the first few rows of the dataframe in a table format """
-    table = Table(show_header=True, header_style="bold magenta")
-    for col in df.columns:
-        table.add_column(col, style="dim")
-    for _, row in df.head(rows).iterrows():
-        table.add_row(*[str(val) for val in row])
-    console.print(table)
-
-def clean_data(df, console, output_path):
+    console.print(window_table(df, size=rows))
+
+def prepare_record(row):
+    """ Prepare the row and messages for a record ahead of its prompt, from a copy of the row taken on the main thread """
+    return {
+        'row': row,
+        'mismatch': row['name'] != row['committee_member'],
+        'mismatch_message': f"Name: {row['name']}, Committee Member: {row['committee_member']}, url {row['url']}",
+    }
+
+def clean_data(df, console, journal):
     """ Confirm if 'name' and 'committee_member' are the same """
-    for index, row in df.iterrows():
-        if row['name'] != row['committee_member']:
+    reviewed_names = journal.reviewed_keys('name')
+    reviewed_areas = journal.reviewed_keys('research_area')
+    # Only mismatched names are asked about, so a matching name never gets a journal record and isn't waited for
+    mismatched = set(df.index[df['name'] != df['committee_member']])
+    pending = [index for index in df.index if index not in reviewed_areas or (index in mismatched and index not in reviewed_names)]
+    # With CLEANING_PROFILE set, every record's compute, save and think time is logged, see cleaning_utils/profiling.py
+    for _, index, record in review('people_review', ReviewDriver(pending, prepare_record, lambda index: df.loc[index].copy()), key=lambda item: item[1]):
+        row = record['row']
+        if record['mismatch'] and index not in reviewed_names:
             console.print("*****************")
             console.print(f"Number {index} of {len(df)}")
             console.print(f"[yellow]Name and Committee Member do not match for record {index}[/yellow]")
-            console.print(f"Name: {row['name']}, Committee Member: {row['committee_member']}, url {row['url']}")
-            if Confirm.ask("Do you want to correct this?"):
-                corrected_name = Prompt.ask("Enter the correct name")
-                df.at[index, 'name'] = corrected_name
-                df.at[index, 'committee_member'] = corrected_name
-                df.to_csv(output_path, index=False)
-
-        console.print(f"Current Research Area for {row['name']}: {row['research_area']}, url {row['research_url']}")
-        if Confirm.ask("Do you want to add more research areas?"):
-            additional_areas = Prompt.ask("Enter additional research areas, separated by commas")
-            df.at[index, 'research_area'] += ", " + additional_areas
-            df.to_csv(output_path, index=False)
+            console.print(record['mismatch_message'])
+            corrected_name = row['name']
+            with think():
+                correct = Confirm.ask("Do you want to correct this?")
+                if correct:
+                    corrected_name = Prompt.ask("Enter the correct name")
+            with save():
+                if correct:
+                    df.at[index, 'name'] = corrected_name
+                    df.at[index, 'committee_member'] = corrected_name
+                    journal.record(index, 'committee_member', row['committee_member'], corrected_name)
+                journal.record(index, 'name', row['name'], corrected_name)
+
+        if index in reviewed_areas:
+            continue
+        console.print(f"Current Research Area for {df.at[index, 'name']}: {row['research_area']}, url {row['research_url']}")
+        additional_areas = None
+        with think():
+            if Confirm.ask("Do you want to add more research areas?"):
+                additional_areas = Prompt.ask("Enter additional research areas, separated by commas")
+        with save():
+            if additional_areas is not None:
+                df.at[index, 'research_area'] += ", " + additional_areas
+            journal.record(index, 'research_area', row['research_area'], df.at[index, 'research_area'])
     return df
 
 # Main Execution
@@ -51,6 +81,15 @@ if __name__ == '__main__':
 
     if df is not None:
         console.print("[green]Data loaded successfully[/green]")
+        loaded_df, loaded_hash = df.copy(), file_hash(file_path)
+        journal = QueuedJournal(DecisionJournal(file_path + ".journal.jsonl"))
+        df = journal.replay(df)
         display_data(df, console)
 
-        df = clean_data(df, console, file_path)
+        df = clean_data(df, console, journal)
+        journal.compact(df, file_path)
+
+        # Patch the graph exports with this session's corrections instead of rebuilding them. Missing research areas
+        # and committees form a "nan" group as in the notebook; missing_group=None leaves them out instead.
+        patched_rows = update_graph_exports(loaded_df, df, file_path, loaded_hash, "../data/graph", "../data/ischool_people_research_areas.gexf", "../data/ischool_people_committees_updated.gexf")
+        console.print("[green]Graph exports rebuilt[/green]" if patched_rows is None else f"[green]Graph exports patched with {patched_rows} changed rows[/green]")
@@ -1,17 +1,40 @@
 from rich import print
 from rich.console import Console
+from rich.panel import Panel
+from rich.text import Text
 import pandas as pd
 import warnings
 warnings.filterwarnings('ignore')
 from tqdm import tqdm
 import os
+import argparse
+import functools
 from typing import Optional, List
 import sys
 sys.path.append('..')
 from data_generation_scripts.utils import *
 from data_generation_scripts.generate_user_metadata import check_total_results
 from data_generation_scripts.generate_translations import check_detect_language
-
+from cleaning_utils.journal import DecisionJournal
+from cleaning_utils.review_session import ReviewSession
+from cleaning_utils.consolidation import consolidate_language_data, summarize_conflicts
+from cleaning_utils.language_detection import detect_languages
+from cleaning_utils.storage import read_frame, frame_exists, iter_frame_chunks
+from cleaning_utils.search_queries import normalize_search_query, fix_entity_results, prepare_entity_search_queries
+from cleaning_utils.polars_engine import prepare_with_polars
+from cleaning_utils.language_rules import apply_language_rules, rules_version
+from cleaning_utils.review_driver import ReviewDriver, QueuedJournal
+from cleaning_utils.change_tracking import incremental_apply
+from cleaning_utils.streaming import stream_entities
+from cleaning_utils.sharding import ReviewShard, add_shard_arguments
+from cleaning_utils.profiling import profiled, review, think, save
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA, apply_schema, object_values
+from cleaning_utils.language_review import REPO_REVIEW_FIELDS, USER_REVIEW_FIELDS, get_potential_language, review_lines
+from cleaning_utils.suggestions import ReviewSuggester, language_suggester, bulk_accept, prefill, describe_suggestion
+
+language_detection_cache_path = "../data/derived_files/language_detection_cache.sqlite"
+
+@profiled()
 def get_languages(search_df: pd.DataFrame, search_type: str) -> pd.DataFrame:
     """Get the languages for the search queries data.
     :param search_df: The search queries data for repos
@@ -19,53 +42,24 @@ def get_languages(search_df: pd.DataFrame, search_type: str) -> pd.DataFrame:
     :param search_type: The type of search queries data
     :type search_type: str
     :return: The search queries data with the languages added"""
-    tqdm.pandas(desc='Detecting language')
-    if 'repo' in search_type:
-        search_df.description = search_df.description.fillna('')
-    else:
-        search_df.bio = search_df.bio.fillna('')
-    search_df = search_df.progress_apply(check_detect_language, axis=1, is_repo=True)
+    text_field = 'description' if 'repo' in search_type else 'bio'
+    search_df[text_field] = search_df[text_field].fillna('')
+    search_df = detect_languages(search_df, text_field, check_detect_language, language_detection_cache_path, is_repo=True)
     return search_df
 
+@profiled()
 def clean_languages(search_df: pd.DataFrame, join_field: str) -> pd.DataFrame:
-    """Clean the languages for the search queries data.
+    """Clean the languages for the search queries data using the rule table in `cleaning_utils.language_rules`.
     :param search_df: The search queries data for repos
     :type search_df: pandas.DataFrame
     :param join_field: The field to join the search queries data to the repo data
     :type join_field: str
     :return: The search queries data with the languages cleaned"""
-    english_langs = 'en, ny, ha, ig, lb, mg, sm, sn, st, tl, yo'
-    english_langs = english_langs.split(', ')
-    search_df.loc[(search_df.detected_language.isin(
-        english_langs)) & (search_df.finalized_language.isna()), 'finalized_language'] = search_df.detected_language
-    search_df.loc[(search_df.natural_language == search_df.detected_language) & (search_df.finalized_language.isna()),
-                  'finalized_language'] = search_df.detected_language
-    needs_language = search_df[(search_df.detected_language.str.contains('zh', na=False)) & (search_df.natural_language == 'zh') & (search_df.finalized_language.isna())]
-    if len(needs_language) > 0:
-        search_df.loc[(search_df.detected_language.str.contains('zh', na=False)) & (search_df.natural_language == 'zh'), 'finalized_language'] = search_df.loc[(search_df.detected_language.str.contains('zh', na=False)) & (search_df.natural_language == 'zh'), 'detected_language']
-    needs_language =  search_df[(search_df.natural_language.str.contains('fr')) & (search_df.detected_language.str.contains('fr')) & (search_df.finalized_language.isna())]
-    if len(needs_language) > 0:
-        search_df.loc[(search_df.natural_language.str.contains('fr')) & (search_df.detected_language.str.contains('fr')), 'finalized_language'] = 'fr'
-    needs_language = search_df[(search_df.natural_language == 'xh, zu') & (search_df.finalized_language.isna())]
-    if len(needs_language) > 0:
-        search_df.loc[(search_df.natural_language == 'xh, zu') & (search_df.finalized_language.isna()), 'finalized_language'] = search_df.loc[(search_df.natural_language == 'xh, zu') & (search_df.detected_language.notna()), 'detected_language']
-    search_df.loc[(search_df.finalized_language.isna()) & (
-        search_df.detected_language_confidence < 0.5), 'finalized_language'] = None
-    if join_field == 'full_name':
-
-        search_df.loc[(search_df.finalized_language.isna()) & (
-        search_df.description.str.len() < 30), 'finalized_language'] = None
-        search_df.loc[(search_df.detected_language.isna()) & (
-            search_df.description.isna()) & (search_df.finalized_language.isna()), 'finalized_language'] = None
-        search_df.loc[(search_df.detected_language.isna()) & (
-            search_df.description.isna()) & (search_df['size'] < 1) & (search_df.finalized_language.isna()), 'keep_resource'] = False
-    if join_field == 'login':
-        search_df.loc[(search_df.finalized_language.isna()) & (
-            search_df.bio.str.len() < 30), 'finalized_language'] = None
-        search_df.loc[(search_df.detected_language.isna()) & (
-            search_df.bio.isna() & (search_df.finalized_language.isna())), 'finalized_language'] = None
+    search_df, rule_report = apply_language_rules(search_df, join_field)
+    print(f"Language rules applied: {', '.join(f'{rule}: {rows}' for rule, rows in zip(rule_report.rule, rule_report.rows))}")
     return search_df
 
+@profiled()
 def clean_search_queries_data(search_df: object, join_field: str, search_type: str) -> object:
     """Clean the search queries data and try to determine as much as possible the exact language using automated language detection and natural language processing.
     :param search_df: The search queries data
@@ -82,15 +76,12 @@ def clean_search_queries_data(search_df: object, join_field: str, search_type: s
     
     if 'keep_resource' not in search_df.columns:
         search_df['keep_resource'] = True
-    else:
-        search_df.loc[search_df.keep_resource == 'None'] = None
-    
 
     if 'finalized_language' not in search_df.columns:
         search_df['finalized_language'] = None
-    else:
-        search_df.loc[search_df.finalized_language == 'None'] = None
-    
+
+    # Frames loaded with the schema already have their 'None' sentinels normalized and are left as they are
+    search_df = apply_schema(search_df, SEARCH_QUERY_SCHEMA)
     if 'detected_language' not in search_df.columns:
         search_df = get_languages(search_df, search_type)
         search_df = clean_languages(search_df, join_field)
@@ -105,7 +96,8 @@ def clean_search_queries_data(search_df: object, join_field: str, search_type: s
     return search_df
 
 def fill_missing_language_data(rows: pd.DataFrame, is_repo: bool) -> pd.DataFrame:
-    """Fill in the missing language data for the search queries data.
+    """Fill in the missing language data for the search queries data. Kept as the per-group reference for
+    `consolidate_language_data`, which is what `verify_results_exist` uses.
     :param rows: The search queries data
     :type rows: pandas.DataFrame
     :param is_repo: Whether the search queries data is for repos or users
@@ -137,6 +129,7 @@ def fill_missing_language_data(rows: pd.DataFrame, is_repo: bool) -> pd.DataFram
  
     return rows
 
+@profiled()
 def fix_results(search_queries_repo_df: pd.DataFrame, search_queries_user_df: pd.DataFrame) -> pd.DataFrame:
     """Fix the results of the search queries to ensure that the results are correct.
     :param search_queries_repo_df: The search queries data for repos
@@ -144,85 +137,207 @@ def fix_results(search_queries_repo_df: pd.DataFrame, search_queries_user_df: pd
     :param search_queries_user_df: The search queries data for users
     :type search_queries_user_df: pandas.DataFrame
     :return: The fixed search queries data"""
-
-    fix_repo_queries = search_queries_repo_df[(search_queries_repo_df.cleaned_search_query.str.contains('q="Humanities"')) & (search_queries_repo_df.search_term_source == "Digital Humanities")]
-    fix_user_queries = search_queries_user_df[(search_queries_user_df.cleaned_search_query.str.contains('q="Humanities"')) & (search_queries_user_df.search_term_source == "Digital Humanities")]
-    if len(fix_repo_queries) > 0:
-        replace_repo_queries = search_queries_repo_df[(search_queries_repo_df.full_name.isin(fix_repo_queries.full_name)) & (search_queries_repo_df.search_term_source == "Digital Humanities")][['full_name', 'search_query']]
-        search_queries_repo_df.loc[search_queries_repo_df.full_name.isin(fix_repo_queries.full_name), 'cleaned_search_query'] = search_queries_repo_df.loc[search_queries_repo_df.full_name.isin(fix_repo_queries.full_name), 'full_name'].map(replace_repo_queries.set_index('full_name').to_dict()['search_query'])
-        
-    if len(fix_user_queries) > 0:
-        replace_user_queries = search_queries_user_df[(search_queries_user_df.full_name.isin(fix_user_queries.login)) & (search_queries_user_df.search_term_source == "Digital Humanities")][['login', 'search_query']]
-        search_queries_user_df.loc[search_queries_user_df.login.isin(fix_user_queries.login), 'cleaned_search_query'] = search_queries_user_df.loc[search_queries_user_df.login.isin(fix_user_queries.login), 'login'].map(replace_user_queries.set_index('login').to_dict()['search_query'])
-    return search_queries_repo_df, search_queries_user_df
-
-def verify_results_exist(initial_search_queries_repo_file_path: str, exisiting_search_queries_repo_file_path: str, initial_search_queries_user_file_path: str, existing_search_queries_user_file_path: str, subset_terms: List) -> pd.DataFrame:
+    return fix_entity_results(search_queries_repo_df, 'full_name'), fix_entity_results(search_queries_user_df, 'login')
+
+def clean_entity_search_queries(search_df: pd.DataFrame, join_field: str, search_type: str, dedupe_by_time: bool, engine: str = 'pandas') -> pd.DataFrame:
+    """Run every per-entity cleaning step on the combined search queries data: consolidate the language fields,
+    keep the latest row per query, fix the results and clean the languages. Every step, the overwriting language
+    rules included, only looks at the rows of one entity, so this can run on just the entities that changed since the last run. With the polars engine the steps before
+    language detection run as a lazy Polars plan (see cleaning_utils/polars_engine.py), the rest stays in pandas.
+    :param search_df: The search queries data for repos or users
+    :type search_df: pandas.DataFrame
+    :param join_field: The entity key, `full_name` or `login`
+    :type join_field: str
+    :param search_type: repo or user
+    :type search_type: str
+    :param dedupe_by_time: Whether to keep only the latest row per entity and query
+    :type dedupe_by_time: bool
+    :param engine: pandas or polars
+    :type engine: str
+    :return: The cleaned search queries data"""
+    prepare_function = prepare_with_polars if engine == 'polars' else prepare_entity_search_queries
+    search_df, conflicts = prepare_function(search_df, join_field, dedupe_by_time)
+    print(summarize_conflicts(conflicts, 'Repo' if join_field == 'full_name' else 'User'))
+    return clean_search_queries_data(search_df, join_field, search_type)
+
+def clean_entities(search_df: pd.DataFrame, join_field: str, search_type: str, dedupe_by_time: bool, stage_output_path: Optional[str], engine: str = 'pandas') -> pd.DataFrame:
+    """Clean the search queries data, only recomputing the entities whose rows changed since the last run if a stage output path is given.
+    :param search_df: The search queries data for repos or users
+    :type search_df: pandas.DataFrame
+    :param join_field: The entity key, `full_name` or `login`
+    :type join_field: str
+    :param search_type: repo or user
+    :type search_type: str
+    :param dedupe_by_time: Whether to keep only the latest row per entity and query
+    :type dedupe_by_time: bool
+    :param stage_output_path: Where the cleaned data and its key hashes are kept between runs, or None to clean everything
+    :type stage_output_path: str
+    :param engine: pandas or polars
+    :type engine: str
+    :return: The cleaned search queries data"""
+    stage_function = functools.partial(clean_entity_search_queries, join_field=join_field, search_type=search_type, dedupe_by_time=dedupe_by_time, engine=engine)
+    if stage_output_path is None:
+        return stage_function(search_df)
+    # A change to any of these changes every entity's output, so the cached output is only reused if they match
+    parameters = {'search_type': search_type, 'dedupe_by_time': dedupe_by_time, 'engine': engine, 'language_rules': rules_version()}
+    return incremental_apply(search_df[search_df[join_field].notna()], join_field, stage_function, stage_output_path, parameters=parameters)
+
+@profiled()
+def verify_results_exist(initial_search_queries_repo_file_path: str, exisiting_search_queries_repo_file_path: str, initial_search_queries_user_file_path: str, existing_search_queries_user_file_path: str, subset_terms: List, repo_stage_output_path: Optional[str] = None, user_stage_output_path: Optional[str] = None, engine: str = 'pandas') -> pd.DataFrame:
     repo_join_output_path = "search_queries_repo_join_dataset.csv"
     user_join_output_path = "search_queries_user_join_dataset.csv"
     join_unique_field = 'search_query'
     repo_filter_fields = ['full_name', 'cleaned_search_query']
     user_filter_fields = ['login', 'cleaned_search_query']
-    if (os.path.exists(existing_search_queries_user_file_path)) and (os.path.exists(exisiting_search_queries_repo_file_path)):
-        search_queries_user_df = pd.read_csv(existing_search_queries_user_file_path)
-        search_queries_repo_df = pd.read_csv(exisiting_search_queries_repo_file_path)
+    if (frame_exists(existing_search_queries_user_file_path)) and (frame_exists(exisiting_search_queries_repo_file_path)):
+        search_queries_user_df = read_frame(existing_search_queries_user_file_path, schema=SEARCH_QUERY_SCHEMA)
+        search_queries_repo_df = read_frame(exisiting_search_queries_repo_file_path, schema=SEARCH_QUERY_SCHEMA)
         
-        search_queries_user_df['cleaned_search_query'] = search_queries_user_df['search_query'].str.replace('%22', '"').str.replace('"', '').str.replace('%3A', ':').str.split('&page').str[0]
-        search_queries_repo_df['cleaned_search_query'] = search_queries_repo_df['search_query'].str.replace('%22', '"').str.replace('"', '').str.replace('%3A', ':').str.split('&page').str[0]
+        search_queries_user_df['cleaned_search_query'] = normalize_search_query(search_queries_user_df['search_query'])
+        search_queries_repo_df['cleaned_search_query'] = normalize_search_query(search_queries_repo_df['search_query'])
         
         updated_search_queries_repo_df = check_for_joins_in_older_queries(repo_join_output_path, search_queries_repo_df, join_unique_field, repo_filter_fields, subset_terms)
         updated_search_queries_user_df = check_for_joins_in_older_queries(user_join_output_path, search_queries_user_df, join_unique_field, user_filter_fields, subset_terms)
 
-        initial_search_queries_repo_df = pd.read_csv(initial_search_queries_repo_file_path)
-        initial_search_queries_user_df  = pd.read_csv(initial_search_queries_user_file_path)
-
-        initial_search_queries_user_df['cleaned_search_query'] = initial_search_queries_user_df['search_query'].str.replace('%22', '"').str.replace('"', '').str.replace('%3A', ':').str.split('&page').str[0]
-        initial_search_queries_repo_df['cleaned_search_query'] = initial_search_queries_repo_df['search_query'].str.replace('%22', '"').str.replace('"', '').str.replace('%3A', ':').str.split('&page').str[0]
-
-        initial_search_queries_repo_df = initial_search_queries_repo_df[initial_search_queries_repo_df.search_term_source.isin(subset_terms)]
-        initial_search_queries_user_df = initial_search_queries_user_df[initial_search_queries_user_df.search_term_source.isin(subset_terms)]
-
-        
-        search_queries_repo_df = pd.concat([updated_search_queries_repo_df, initial_search_queries_repo_df])
-        search_queries_user_df = pd.concat([updated_search_queries_user_df, initial_search_queries_user_df])
-
-        tqdm.pandas(desc="Fill missing language data")
-        cleaned_search_queries_repo_df = search_queries_repo_df.groupby(['full_name']).progress_apply(fill_missing_language_data, is_repo=True)
-        cleaned_search_queries_user_df = search_queries_user_df.groupby(['login']).progress_apply(fill_missing_language_data, is_repo=False)
+        initial_search_queries_repo_df = read_frame(initial_search_queries_repo_file_path, filters=[('search_term_source', 'in', subset_terms)], schema=SEARCH_QUERY_SCHEMA)
+        initial_search_queries_user_df  = read_frame(initial_search_queries_user_file_path, filters=[('search_term_source', 'in', subset_terms)], schema=SEARCH_QUERY_SCHEMA)
 
+        initial_search_queries_user_df['cleaned_search_query'] = normalize_search_query(initial_search_queries_user_df['search_query'])
+        initial_search_queries_repo_df['cleaned_search_query'] = normalize_search_query(initial_search_queries_repo_df['search_query'])
 
-        cleaned_search_queries_repo_df.loc[cleaned_search_queries_repo_df.search_query_time.isna(), 'search_query_time'] = "2022-10-10"
-        cleaned_search_queries_repo_df['search_query_time'] = pd.to_datetime(cleaned_search_queries_repo_df['search_query_time'], errors='coerce')
-        cleaned_search_queries_repo_df = cleaned_search_queries_repo_df.sort_values(by=['search_query_time'], ascending=False).drop_duplicates(subset=['full_name', 'cleaned_search_query'], keep='first')
-
-        cleaned_search_queries_user_df.loc[cleaned_search_queries_user_df.search_query_time.isna(), 'search_query_time'] = "2022-10-10"
-        cleaned_search_queries_user_df['search_query_time'] = pd.to_datetime(cleaned_search_queries_user_df['search_query_time'], errors='coerce')
-        cleaned_search_queries_user_df = cleaned_search_queries_user_df.sort_values(by=['search_query_time'], ascending=False).drop_duplicates(subset=['login','cleaned_search_query'], keep='first')
-
-        cleaned_search_queries_repo_df, cleaned_search_queries_user_df = fix_results(cleaned_search_queries_repo_df, cleaned_search_queries_user_df)
-        search_queries_repo_df = clean_search_queries_data(cleaned_search_queries_repo_df, 'full_name', 'repo')
-        search_queries_user_df = clean_search_queries_data(cleaned_search_queries_user_df, 'login', 'user')
+        # Concatenating categoricals with different categories gives objects, so the schema is applied again
+        search_queries_repo_df = apply_schema(pd.concat([updated_search_queries_repo_df, initial_search_queries_repo_df]), SEARCH_QUERY_SCHEMA)
+        search_queries_user_df = apply_schema(pd.concat([updated_search_queries_user_df, initial_search_queries_user_df]), SEARCH_QUERY_SCHEMA)
+        dedupe_by_time = True
     else:
-        initial_search_queries_repo_df = pd.read_csv(initial_search_queries_repo_file_path)
-        initial_search_queries_user_df  = pd.read_csv(initial_search_queries_user_df)
+        initial_search_queries_repo_df = read_frame(initial_search_queries_repo_file_path, schema=SEARCH_QUERY_SCHEMA)
+        initial_search_queries_user_df  = read_frame(initial_search_queries_user_file_path, schema=SEARCH_QUERY_SCHEMA)
 
-        initial_search_queries_user_df['cleaned_search_query'] = initial_search_queries_user_df['search_query'].str.replace('%22', '"').str.replace('"', '').str.replace('%3A', ':').str.split('&page').str[0]
-        initial_search_queries_repo_df['cleaned_search_query'] = initial_search_queries_repo_df['search_query'].str.replace('%22', '"').str.replace('"', '').str.replace('%3A', ':').str.split('&page').str[0]
+        initial_search_queries_user_df['cleaned_search_query'] = normalize_search_query(initial_search_queries_user_df['search_query'])
+        initial_search_queries_repo_df['cleaned_search_query'] = normalize_search_query(initial_search_queries_repo_df['search_query'])
         
         search_queries_repo_df = check_for_joins_in_older_queries(repo_join_output_path, initial_search_queries_repo_df, join_unique_field, repo_filter_fields, subset_terms)
         search_queries_user_df = check_for_joins_in_older_queries(user_join_output_path, initial_search_queries_user_df, join_unique_field, user_filter_fields, subset_terms)
+        dedupe_by_time = False
 
-        tqdm.pandas(desc="Fill missing language data")
-        search_queries_repo_df = search_queries_repo_df.groupby(['full_name']).progress_apply(fill_missing_language_data, is_repo=True)
-        search_queries_user_df = search_queries_user_df.groupby(['login']).progress_apply(fill_missing_language_data, is_repo=False)
-        
-        search_queries_repo_df, search_queries_user_df = fix_results(search_queries_repo_df, search_queries_user_df)
-        search_queries_repo_df = clean_search_queries_data(search_queries_repo_df, 'full_name', 'repo')
-        search_queries_user_df = clean_search_queries_data(search_queries_user_df, 'login', 'user')
-    search_queries_repo_df = search_queries_repo_df.drop_duplicates(subset=['full_name', 'cleaned_search_query'])
-    search_queries_user_df = search_queries_user_df.drop_duplicates(subset=['login', 'cleaned_search_query'])
+    search_queries_repo_df = clean_entities(search_queries_repo_df, 'full_name', 'repo', dedupe_by_time, repo_stage_output_path, engine)
+    search_queries_user_df = clean_entities(search_queries_user_df, 'login', 'user', dedupe_by_time, user_stage_output_path, engine)
+    search_queries_repo_df = apply_schema(search_queries_repo_df.drop_duplicates(subset=['full_name', 'cleaned_search_query']), SEARCH_QUERY_SCHEMA)
+    search_queries_user_df = apply_schema(search_queries_user_df.drop_duplicates(subset=['login', 'cleaned_search_query']), SEARCH_QUERY_SCHEMA)
     return search_queries_repo_df, search_queries_user_df
 
+@profiled()
+def stream_verify_results(initial_search_queries_repo_file_path: str, exisiting_search_queries_repo_file_path: str, initial_search_queries_user_file_path: str, existing_search_queries_user_file_path: str, subset_terms: List, repo_output_path: str, user_output_path: str, chunksize: int = 100000, partitions: int = 64) -> tuple:
+    """Streaming version of `verify_results_exist` for join files larger than memory. Inputs are read in chunks and
+    normalized per chunk, spilled to disk partitioned by entity key, and each partition is cleaned and appended to the output CSV.
+    `check_for_joins_in_older_queries` runs per partition too, so like every other step it sees all the rows of an
+    entity at once, as it does in `verify_results_exist`. Every step, the overwriting language rules included, only looks
+    at the rows of one entity, so this writes the same rows, with the same dtypes, as `verify_results_exist`.
+    :param repo_output_path: The CSV the cleaned repo search queries are written to
+    :type repo_output_path: str
+    :param user_output_path: The CSV the cleaned user search queries are written to
+    :type user_output_path: str
+    :param chunksize: The number of rows read at a time
+    :type chunksize: int
+    :param partitions: The number of on-disk partitions. Each partition has to fit in memory.
+    :type partitions: int
+    :return: The number of repo and user rows written
+    :rtype: tuple"""
+    join_unique_field = 'search_query'
+    existing_results = (frame_exists(existing_search_queries_user_file_path)) and (frame_exists(exisiting_search_queries_repo_file_path))
+
+    def normalized_chunks(file_path, check_joins, filters=None):
+        for chunk in iter_frame_chunks(file_path, chunksize, filters=filters, schema=SEARCH_QUERY_SCHEMA):
+            chunk['cleaned_search_query'] = normalize_search_query(chunk['search_query'])
+            # Marks the rows that go through check_for_joins_in_older_queries once their partition is complete
+            chunk['__check_joins'] = check_joins
+            yield chunk
+
+    def entity_chunks(initial_file_path, existing_file_path):
+        if existing_results:
+            yield from normalized_chunks(existing_file_path, True)
+            yield from normalized_chunks(initial_file_path, False, filters=[('search_term_source', 'in', subset_terms)])
+        else:
+            yield from normalized_chunks(initial_file_path, True)
+
+    def stage(join_field, search_type, join_output_path, filter_fields):
+        def clean_partition(df):
+            check_joins = df.pop('__check_joins').astype(bool)
+            checked_df = check_for_joins_in_older_queries(join_output_path, df[check_joins], join_unique_field, filter_fields, subset_terms)
+            df = apply_schema(pd.concat([checked_df, df[~check_joins]]), SEARCH_QUERY_SCHEMA)
+            df = clean_entity_search_queries(df, join_field, search_type, existing_results).drop_duplicates(subset=[join_field, 'cleaned_search_query'])
+            # The language steps give float64 confidences and object languages, as in verify_results_exist before its final schema
+            return apply_schema(df, SEARCH_QUERY_SCHEMA)
+        return clean_partition
+
+    repo_rows = stream_entities(entity_chunks(initial_search_queries_repo_file_path, exisiting_search_queries_repo_file_path), 'full_name', stage('full_name', 'repo', "search_queries_repo_join_dataset.csv", ['full_name', 'cleaned_search_query']), repo_output_path, partitions=partitions)
+    user_rows = stream_entities(entity_chunks(initial_search_queries_user_file_path, existing_search_queries_user_file_path), 'login', stage('login', 'user', "search_queries_user_join_dataset.csv", ['login', 'cleaned_search_query']), user_output_path, partitions=partitions)
+    return repo_rows, user_rows
+
+def prepare_review_record(all_rows: pd.DataFrame, key_field: str, entity_type: str, review_fields: List) -> dict:
+    """Prepare everything shown for one entity in the review loop, so it can be built ahead of time on the review driver's thread.
+    :param all_rows: A copy of the entity's rows, taken on the main thread so the review's writes can't race with it
+    :type all_rows: pandas.DataFrame
+    :param key_field: The entity key, `full_name` or `login`
+    :type key_field: str
+    :param entity_type: Repo or User
+    :type entity_type: str
+    :param review_fields: The (label, column) pairs to show
+    :type review_fields: list
+    :return: A dict with the rich panel to print and the potential language"""
+    lines = review_lines(all_rows, key_field, entity_type, review_fields)
+    return {'panel': Panel(Text('\n'.join(lines))), 'potential_language': get_potential_language(all_rows)}
+
+def record_decision(session: ReviewSession, suggester: ReviewSuggester, key: str, values: dict, source: Optional[str] = None):
+    """Set and journal the answers for an entity and pass them to the suggester. Bulk accepts and reviewed entities both go through here,
+    and answers with a source aren't learned from.
+    :param session: The review session, journaling to the entity's journal
+    :type session: ReviewSession
+    :param suggester: The suggester of this review
+    :type suggester: ReviewSuggester
+    :param key: The entity
+    :type key: str
+    :param values: keep_resource and finalized_language
+    :type values: dict
+    :param source: What made the decision if not a reviewer, e.g. `BULK_ACCEPT_SOURCE`
+    :type source: str"""
+    session.set_many(key, values, source)
+    suggester.observe(key, values, source)
+
+def ask_with_suggestion(console: Console, record: dict, suggestion: Optional[dict], entity: str) -> tuple:
+    """Ask whether an entity stays in the dataset and for its finalized language, pre-filled with the suggestion
+    learned from earlier decisions when it is confident enough. Pressing enter accepts the pre-filled answers.
+    :param console: The rich console
+    :type console: Console
+    :param record: The prepared review record
+    :type record: dict
+    :param suggestion: The suggestion for the entity, from `ReviewSuggester.suggest`
+    :type suggestion: dict
+    :param entity: repo or user
+    :type entity: str
+    :return: keep_resource and finalized_language"""
+    suggested_keep = prefill(suggestion, 'keep_resource')
+    with think():
+        answer = console.input("stay in the dataset? (y/n{})".format(", suggested n" if suggested_keep is False else ""))
+    keep_resource = not (answer == 'n' or (answer == '' and suggested_keep is False))
+
+    potential_language = record['potential_language']
+    suggested_language = prefill(suggestion, 'finalized_language')
+    if suggested_language is not None:
+        potential_language = suggested_language
+        console.print(f"Suggested from earlier decisions: {describe_suggestion(*suggestion['finalized_language'])}")
+    with think():
+        language_answers = console.input(
+            f"Is the finalized language: [bold blue] {potential_language} [/] of this {entity} correct? ")
+    finalized_language = potential_language
+    if language_answers == 'n':
+        with think():
+            finalized_language = console.input("What is the correct language? ")
+    return keep_resource, finalized_language
+
 
+# Several reviewers can split the queue with --shard/--shards/--reviewer, see cleaning_utils/sharding.py
+shard = ReviewShard.from_args(add_shard_arguments(argparse.ArgumentParser()).parse_args())
 subset_terms = ["Digital Humanities"]
 console = Console()
 initial_repo_output_path = "../data/repo_data/"
@@ -237,203 +352,155 @@ initial_user_join_output_path = "../data/join_files/search_queries_user_join_dat
 user_join_output_path = "../data/derived_files/updated_search_queries_user_join_subset_dh_dataset.csv"
 
 
-# search_queries_repo_df, search_queries_user_df = verify_results_exist(initial_repo_join_output_path, repo_join_output_path, initial_user_join_output_path, user_join_output_path, subset_terms)
+# Cleaned entities are materialized here so a rerun only recomputes the repos and users whose rows changed
+repo_stage_output_path = "../data/derived_files/cleaned_search_queries_repo_stage.parquet"
+user_stage_output_path = "../data/derived_files/cleaned_search_queries_user_stage.parquet"
+# search_queries_repo_df, search_queries_user_df = verify_results_exist(initial_repo_join_output_path, repo_join_output_path, initial_user_join_output_path, user_join_output_path, subset_terms, repo_stage_output_path, user_stage_output_path)
+# With polars installed, engine='polars' runs the steps before language detection as a lazy Polars plan. It gives the
+# same rows, which `cleaning_utils.polars_engine.check_engine_parity` checks on a sample of the join files.
 
 # search_queries_repo_df.to_csv("../data/derived_files/initial_search_queries_repo_join_subset_dh_dataset.csv", index=False)
 # search_queries_user_df.to_csv("../data/derived_files/initial_search_queries_user_join_subset_dh_dataset.csv", index=False)
+# For join files that don't fit in memory, stream them instead. This writes the same CSVs:
+# stream_verify_results(initial_repo_join_output_path, repo_join_output_path, initial_user_join_output_path, user_join_output_path, subset_terms, "../data/derived_files/initial_search_queries_repo_join_subset_dh_dataset.csv", "../data/derived_files/initial_search_queries_user_join_subset_dh_dataset.csv")
 
-search_queries_repo_df = pd.read_csv("../data/derived_files/initial_search_queries_repo_join_subset_dh_dataset.csv")
-search_queries_user_df = pd.read_csv("../data/derived_files/initial_search_queries_user_join_subset_dh_dataset.csv")
+initial_repo_subset_path = "../data/derived_files/initial_search_queries_repo_join_subset_dh_dataset.csv"
+initial_user_subset_path = "../data/derived_files/initial_search_queries_user_join_subset_dh_dataset.csv"
+unfinalized_filter = [('finalized_language', 'is_null', None)]
+
+if frame_exists(repo_join_output_path):
+    # Only the unfinalized rows of the initial subset are needed to find what still needs checking
+    search_queries_repo_df = read_frame(initial_repo_subset_path, columns=['full_name', 'finalized_language', 'keep_resource'], filters=unfinalized_filter)
+else:
+    search_queries_repo_df = read_frame(initial_repo_subset_path)
 
 needs_checking = search_queries_repo_df[(search_queries_repo_df.finalized_language.isna()) & ((search_queries_repo_df.keep_resource.isna()) | (search_queries_repo_df.keep_resource == True))]
 
-if os.path.exists(repo_join_output_path):
-    existing_search_queries_repo_df = pd.read_csv(repo_join_output_path)
+if frame_exists(repo_join_output_path):
+    existing_search_queries_repo_df = read_frame(repo_join_output_path)
     needs_checking = existing_search_queries_repo_df[(existing_search_queries_repo_df.full_name.isin(needs_checking.full_name)) & (existing_search_queries_repo_df.finalized_language.isna())]
     if len(needs_checking) > 0:
         search_queries_repo_df = pd.concat([existing_search_queries_repo_df, needs_checking])
     else:
         search_queries_repo_df = existing_search_queries_repo_df
 
+search_queries_repo_df = search_queries_repo_df.reset_index(drop=True)
+search_queries_repo_df, merged_repos = shard.replay_merged(search_queries_repo_df, repo_join_output_path, 'full_name', 'finalized_language')
+repo_journal = QueuedJournal(DecisionJournal(shard.journal_path(repo_join_output_path), key_field='full_name'))
+search_queries_repo_df = repo_journal.replay(search_queries_repo_df)
+reviewed_repos = repo_journal.reviewed_keys('finalized_language') | merged_repos
+
 needs_checking_repos = search_queries_repo_df[(search_queries_repo_df['finalized_language'].isna())].full_name.unique().tolist()
+needs_checking_repos = shard.select([repo for repo in needs_checking_repos if repo not in reviewed_repos])
 search_queries_repo_df.loc[search_queries_repo_df.detected_language.isna(), 'detected_language'] = None
 search_queries_repo_df.loc[search_queries_repo_df.natural_language.isna(), 'natural_language'] = None
-search_queries_repo_df = search_queries_repo_df.reset_index(drop=True)
+repo_session = ReviewSession(search_queries_repo_df, 'full_name', journal=repo_journal)
 
-for index, repo in enumerate(needs_checking_repos):
-    all_rows = search_queries_repo_df[(search_queries_repo_df['full_name'] == repo)]
+# Clusters of repos whose answers the earlier reviewer decisions (from the journals) agree on are accepted at once, the rest are pre-filled
+repo_suggestions = language_suggester(search_queries_repo_df, 'full_name', shard.decision_history(repo_journal, repo_join_output_path))
+needs_checking_repos = bulk_accept(repo_suggestions, needs_checking_repos, functools.partial(record_decision, repo_session, repo_suggestions), console, 'repos')
+repo_review = ReviewDriver(needs_checking_repos, lambda rows: prepare_review_record(rows, repo_session.key_field, 'Repo', REPO_REVIEW_FIELDS), lambda repo: repo_session.rows(repo).copy())
+for index, repo, record in review('repo_review', repo_review, key=lambda item: item[1]):
     print(f"On {index} out of {len(needs_checking_repos)}")
-    print(f"This repo {all_rows.full_name.unique()} ")
-    print(f"Repo URL: {all_rows.html_url.unique()}")
-    print(f"Repo Description: {all_rows.description.unique()}")
-    print(f"Repo Natural Language: {all_rows.natural_language.unique()}")
-    print(f"Repo Detected Language: {all_rows.detected_language.unique()}")
-    print(f"Repo Search Query: {all_rows.search_query.unique()}")
-    print(f"Repo Search Query Term: {all_rows.search_term.unique()}")
-    print(f"Repo Search Query Source Term: {all_rows.search_term_source.unique()}")
-    # Input answer
-    keep_resource = True
-    answer = console.input("stay in the dataset? (y/n)")
-    if answer == 'n':
-        keep_resource = False
-
-    detected_languages = all_rows[all_rows.detected_language.notna()].detected_language.unique().tolist()
-    natural_languages = all_rows[all_rows.natural_language.notna()].natural_language.unique().tolist()
-
-    detected_languages = detected_languages[0] if len(detected_languages) == 1 else str(detected_languages).replace('[', '').replace(']', '')
-    natural_languages = natural_languages[0] if len(natural_languages) == 1 else str(natural_languages).replace('[', '').replace(']', '')
-    potential_language = detected_languages if len(detected_languages) != 0 else natural_languages
-    potential_language = potential_language if len(potential_language) != 0 else 'None'
-
-    if ',' in potential_language:
-        if 'fr' in potential_language:
-            potential_language = 'fr'
-        elif 'en' in potential_language:
-            potential_language = 'en'
-        elif 'xh' in potential_language:
-            potential_language = 'en'
-
-    language_answers = console.input(
-        f"Is the finalized language: [bold blue] {potential_language} [/] of this repo correct? ")
-    finalized_language = None
-    if language_answers != 'n':
-        finalized_language = potential_language
-    if language_answers == 'n':
-        final_language = console.input("What is the correct language? ")
-        finalized_language = final_language
-    search_queries_repo_df.loc[(search_queries_repo_df.full_name == repo), 'keep_resource'] = keep_resource
-    search_queries_repo_df.loc[(search_queries_repo_df.full_name == repo), 'finalized_language'] = finalized_language
-    search_queries_repo_df.to_csv(repo_join_output_path, index=False)
+    console.print(record['panel'])
+    keep_resource, finalized_language = ask_with_suggestion(console, record, repo_suggestions.suggest(repo), 'repo')
+    with save():
+        record_decision(repo_session, repo_suggestions, repo, {'keep_resource': keep_resource, 'finalized_language': finalized_language})
     print(u'\u2500' * 10)
 
-subset_search_df = search_queries_repo_df.drop_duplicates(
-    subset=['full_name', 'finalized_language'])
-double_check = subset_search_df.full_name.value_counts().reset_index().rename(
-    columns={'index': 'full_name', 'full_name': 'count'}).sort_values('count', ascending=False)
-double_check = double_check[double_check['count'] > 1]
-for index, row in tqdm(double_check.iterrows(), total=len(double_check), desc="Double Checking Repos"):
-    needs_updating = search_queries_repo_df[search_queries_repo_df.full_name == row.full_name]
-    unique_detected_languages = needs_updating.detected_language.unique().tolist()
-    if len(unique_detected_languages) > 1:
-        print(f"Repo {row.full_name}")
-        print(f"Repo URL: {needs_updating.html_url.unique()}")
-        print(f"Repo Description: {needs_updating.description.unique()}")
-        print(f"Repo Natural Language: {needs_updating.natural_language.tolist()}")
-        print(f"Repo Detected Language: {needs_updating.detected_language.tolist()}")
-        print(f"Repo Search Query: {needs_updating.search_query.unique()}")
-        print(f"Repo Search Query Term: {needs_updating.search_term.unique()}")
-        print(f"Repo Search Query Source Term: {needs_updating.search_term_source.unique()}")
-        print(f"Repo Finalized Language: {needs_updating.finalized_language.tolist()}")
+double_check = shard.select(repo_session.conflicting_keys('finalized_language'))
+# Repos with a single detected language are resolved in one batch, only real conflicts are prompted
+double_check = repo_session.resolve_unambiguous(double_check, 'finalized_language', 'detected_language')
+for repo in review('repo_double_check', tqdm(double_check, total=len(double_check), desc="Double Checking Repos"), key=lambda repo: repo):
+    needs_updating = repo_session.rows(repo)
+    print(f"Repo {repo}")
+    print(f"Repo URL: {needs_updating.html_url.unique()}")
+    print(f"Repo Description: {needs_updating.description.unique()}")
+    print(f"Repo Natural Language: {object_values(needs_updating.natural_language).tolist()}")
+    print(f"Repo Detected Language: {object_values(needs_updating.detected_language).tolist()}")
+    print(f"Repo Search Query: {needs_updating.search_query.unique()}")
+    print(f"Repo Search Query Term: {object_values(needs_updating.search_term).unique()}")
+    print(f"Repo Search Query Source Term: {object_values(needs_updating.search_term_source).unique()}")
+    print(f"Repo Finalized Language: {object_values(needs_updating.finalized_language).tolist()}")
+    with think():
         final_language = console.input("What is the correct language? ")
-        search_queries_repo_df.loc[(search_queries_repo_df.full_name == row.full_name), 'finalized_language'] = final_language
-        search_queries_repo_df.to_csv(repo_join_output_path, index=False)
-        print(u'\u2500' * 10)
-    else:
-        search_queries_repo_df.loc[(search_queries_repo_df.full_name == row.full_name), 'finalized_language'] = unique_detected_languages[0]
-        search_queries_repo_df.to_csv(repo_join_output_path, index=False)
+    with save():
+        repo_session.set(repo, 'finalized_language', final_language)
+    print(u'\u2500' * 10)
+
+search_queries_repo_df = repo_session.df
+if shard.enabled:
+    # Each reviewer keeps their own journal until the shards are merged
+    repo_journal.close()
+else:
+    repo_journal.compact(search_queries_repo_df, repo_join_output_path)
 
 # CHECK USER
 
+if frame_exists(user_join_output_path):
+    search_queries_user_df = read_frame(initial_user_subset_path, columns=['login', 'finalized_language', 'keep_resource'], filters=unfinalized_filter)
+else:
+    search_queries_user_df = read_frame(initial_user_subset_path)
+
 needs_checking = search_queries_user_df[(search_queries_user_df.finalized_language.isna()) & ((search_queries_user_df.keep_resource.isna()) | (search_queries_user_df.keep_resource == True))]
 
-if os.path.exists(user_join_output_path):
-    existing_search_queries_user_df = pd.read_csv(user_join_output_path)
+if frame_exists(user_join_output_path):
+    existing_search_queries_user_df = read_frame(user_join_output_path)
     needs_checking = existing_search_queries_user_df[(existing_search_queries_user_df.login.isin(needs_checking.login)) & (existing_search_queries_user_df.finalized_language.isna())]
     if len(needs_checking) > 0:
         search_queries_user_df = pd.concat([existing_search_queries_user_df, needs_checking])
     else:
         search_queries_user_df = existing_search_queries_user_df
 
+search_queries_user_df = search_queries_user_df.reset_index(drop=True)
+search_queries_user_df, merged_users = shard.replay_merged(search_queries_user_df, user_join_output_path, 'login', 'finalized_language')
+user_journal = QueuedJournal(DecisionJournal(shard.journal_path(user_join_output_path), key_field='login'))
+search_queries_user_df = user_journal.replay(search_queries_user_df)
+reviewed_users = user_journal.reviewed_keys('finalized_language') | merged_users
+
 needs_checking_users = search_queries_user_df[(search_queries_user_df['finalized_language'].isna())].login.unique().tolist()
+needs_checking_users = shard.select([user for user in needs_checking_users if user not in reviewed_users])
 search_queries_user_df.loc[search_queries_user_df.detected_language.isna(), 'detected_language'] = None
 search_queries_user_df.loc[search_queries_user_df.natural_language.isna(), 'natural_language'] = None
-search_queries_user_df = search_queries_user_df.reset_index(drop=True)
+user_session = ReviewSession(search_queries_user_df, 'login', journal=user_journal)
 
 
-for index, user in enumerate(needs_checking_users):
-    all_rows = search_queries_user_df[(
-        search_queries_user_df['login'] == user)]
+# Clusters of users whose answers the earlier reviewer decisions (from the journals) agree on are accepted at once, the rest are pre-filled
+user_suggestions = language_suggester(search_queries_user_df, 'login', shard.decision_history(user_journal, user_join_output_path))
+needs_checking_users = bulk_accept(user_suggestions, needs_checking_users, functools.partial(record_decision, user_session, user_suggestions), console, 'users')
+user_review = ReviewDriver(needs_checking_users, lambda rows: prepare_review_record(rows, user_session.key_field, 'User', USER_REVIEW_FIELDS), lambda user: user_session.rows(user).copy())
+for index, user, record in review('user_review', user_review, key=lambda item: item[1]):
     print(f"On {index} out of {len(needs_checking_users)}")
-    print(f"This user {all_rows.login.unique()} ")
-    print(f"User URL: {all_rows.html_url.unique()}")
-    print(f"User Type: {all_rows.type.unique()}")
-    print(f"User Bio: {all_rows.bio.unique()}")
-    print(f"User Location: {all_rows.location.unique()}")
-    print(f"User Natural Language: {all_rows.natural_language.unique()}")
-    print(f"User Detected Language: {all_rows.detected_language.unique()}")
-    print(f"User Search Query: {all_rows.search_query.unique()}")
-    print(f"User Search Query Term: {all_rows.search_term.unique()}")
-    print(
-        f"User Search Query Source Term: {all_rows.search_term_source.unique()}")
-    # Input answer
-    answer = console.input("stay in the dataset? (y/n)")
-    keep_resource = True
-    if answer == 'n':
-        keep_resource = False
-
-    detected_languages = all_rows[all_rows.detected_language.notna(
-    )].detected_language.unique().tolist()
-    natural_languages = all_rows[all_rows.natural_language.notna(
-    )].natural_language.unique().tolist()
-    detected_languages = detected_languages[0] if len(detected_languages) == 1 else str(detected_languages).replace('[', '').replace(']', '')
-    natural_languages = natural_languages[0] if len(natural_languages) == 1 else str(
-        natural_languages).replace('[', '').replace(']', '')
-    potential_language = detected_languages if len(
-        detected_languages) != 0 else natural_languages
-    potential_language = potential_language if len(
-        potential_language) != 0 else 'None'
-    if ',' in potential_language:
-        if 'fr' in potential_language:
-            potential_language = 'fr'
-        elif 'en' in potential_language:
-            potential_language = 'en'
-        elif 'xh' in potential_language:
-            potential_language = 'en'
-
-    language_answers = console.input(
-        f"Is the finalized language: [bold blue] {potential_language} [/] of this user correct? ")
-    finalized_language = None
-    if language_answers != 'n':
-        finalized_language = potential_language
-    if language_answers == 'n':
-        final_language = console.input("What is the correct language? ")
-        finalized_language = final_language
-    search_queries_user_df.loc[(
-        search_queries_user_df.login == user), 'keep_resource'] = keep_resource
-    search_queries_user_df.loc[(search_queries_user_df.login == user), 'finalized_language'] = finalized_language
-    search_queries_user_df.to_csv(user_join_output_path, index=False)
+    console.print(record['panel'])
+    keep_resource, finalized_language = ask_with_suggestion(console, record, user_suggestions.suggest(user), 'user')
+    with save():
+        record_decision(user_session, user_suggestions, user, {'keep_resource': keep_resource, 'finalized_language': finalized_language})
     print(u'\u2500' * 10)
 
-subset_search_df = search_queries_user_df.drop_duplicates(
-    subset=['login', 'finalized_language'])
-double_check = subset_search_df.login.value_counts().reset_index().rename(
-    columns={'index': 'login', 'login': 'count'}).sort_values('count', ascending=False)
-double_check = double_check[double_check['count'] > 1]
-for index, row in tqdm(double_check.iterrows(), total=len(double_check), desc="Double Checking Repos"):
-    needs_updating = search_queries_user_df[search_queries_user_df.login == row.login]
-    unique_detected_languages = needs_updating.detected_language.unique().tolist()
-    if len(unique_detected_languages) > 1:
-        print(f"User {row.login}")
-        print(f"User URL: {needs_updating.html_url.unique()}")
-        print(f"User Bio: {needs_updating.bio.unique()}")
-        print(f"User Natural Language: {needs_updating.natural_language.tolist()}")
-        print(
-            f"User Detected Language: {needs_updating.detected_language.tolist()}")
-        print(f"User Search Query: {needs_updating.search_query.unique()}")
-        print(f"User Search Query Term: {needs_updating.search_term.unique()}")
-        print(
-            f"User Search Query Source Term: {needs_updating.search_term_source.unique()}")
-        print(
-            f"User Finalized Language: {needs_updating.finalized_language.tolist()}")
+double_check = shard.select(user_session.conflicting_keys('finalized_language'))
+double_check = user_session.resolve_unambiguous(double_check, 'finalized_language', 'detected_language')
+for user in review('user_double_check', tqdm(double_check, total=len(double_check), desc="Double Checking Users"), key=lambda user: user):
+    needs_updating = user_session.rows(user)
+    print(f"User {user}")
+    print(f"User URL: {needs_updating.html_url.unique()}")
+    print(f"User Bio: {needs_updating.bio.unique()}")
+    print(f"User Natural Language: {object_values(needs_updating.natural_language).tolist()}")
+    print(
+        f"User Detected Language: {object_values(needs_updating.detected_language).tolist()}")
+    print(f"User Search Query: {needs_updating.search_query.unique()}")
+    print(f"User Search Query Term: {object_values(needs_updating.search_term).unique()}")
+    print(
+        f"User Search Query Source Term: {object_values(needs_updating.search_term_source).unique()}")
+    print(
+        f"User Finalized Language: {object_values(needs_updating.finalized_language).tolist()}")
+    with think():
         final_language = console.input("What is the correct language? ")
-        search_queries_user_df.loc[(search_queries_user_df.login ==
-                                    row.login), 'finalized_language'] = final_language
-        search_queries_user_df.to_csv(user_join_output_path, index=False)
-        print(u'\u2500' * 10)
-    else:
-        search_queries_user_df.loc[(search_queries_user_df.login ==
-                                    row.login), 'finalized_language'] = unique_detected_languages[0]
-        search_queries_user_df.to_csv(user_join_output_path, index=False)
+    with save():
+        user_session.set(user, 'finalized_language', final_language)
+    print(u'\u2500' * 10)
 
-search_queries_repo_df.to_csv(repo_join_output_path, index=False)
-search_queries_user_df.to_csv(user_join_output_path, index=False)
\ No newline at end of file
+search_queries_user_df = user_session.df
+if shard.enabled:
+    user_journal.close()
+else:
+    user_journal.compact(search_queries_user_df, user_join_output_path)
\ No newline at end of file
@@ -1,19 +1,24 @@
 import pandas as pd
 from rich.console import Console
-from rich.table import Table
 import numpy as np
 import os
-import ast
-
-def safe_literal_eval(val):
-    """
-    Safely evaluate an expression node or a string containing a Python expression.
-    Returns the original value if an error occurs during evaluation.
-    """
-    try:
-        return ast.literal_eval(val)
-    except (ValueError, SyntaxError):
-        return val
+import sys
+import argparse
+sys.path.append('..')
+from cleaning_utils.journal import DecisionJournal
+from cleaning_utils.literal_columns import safe_literal_eval, load_literal_frame
+from cleaning_utils.category_counts import CategoryCountCache
+from cleaning_utils.storage import read_frame, write_frame, frame_exists
+from cleaning_utils.table_view import window_table, top_counts, TablePager
+from cleaning_utils.sharding import ReviewShard, add_shard_arguments
+from cleaning_utils.change_tracking import inputs_changed, save_input_hashes, key_hashes, unchanged_keys
+from cleaning_utils.profiling import profiled, review, think, save
+from cleaning_utils.schema import FEATURE_SCHEMA, SHARED_CATEGORIES, apply_schema
+from cleaning_utils.suggestions import feature_suggester, bulk_accept, prefill, describe_suggestion, chosen_feature_type
+
+PREFETCH_COLUMNS = 3
+TOP_VALUES = 20
+DECISION_COLUMNS = ['keep_feature', 'feature_type']
 
 def rename_columns(df, prefix):
     """
@@ -24,15 +29,20 @@ def rename_columns(df, prefix):
     df.columns = ['column_name'] + [prefix + col for col in cols]
     return df
 
+@profiled()
 def load_and_prepare_data(output_path, tw_path, sampled_path):
     """
-    Load, merge, and prepare datasets.
+    Load, merge, and prepare datasets. The merged output is reused until the tw or serials inputs change.
+    When they do, the merge is rebuilt and review decisions are kept for every column whose merged row is unchanged.
+    The categories and decisions are loaded with the compact dtypes of `FEATURE_SCHEMA`.
     """
-    if os.path.exists(output_path):
-        return pd.read_csv(output_path)
+    manifest_path = os.path.splitext(output_path)[0] + ".inputs.json"
+    changed, input_hashes = inputs_changed(manifest_path, [tw_path, sampled_path])
+    if frame_exists(output_path) and not changed:
+        return apply_schema(read_frame(output_path), FEATURE_SCHEMA, SHARED_CATEGORIES)
     
-    tw_df = pd.read_csv(tw_path)
-    sampled_df = pd.read_csv(sampled_path)
+    tw_df = read_frame(tw_path)
+    sampled_df = read_frame(sampled_path)
 
     # Rename columns to avoid conflicts after merging
     tw_df = rename_columns(tw_df, 'tw_')
@@ -40,18 +50,63 @@ def load_and_prepare_data(output_path, tw_path, sampled_path):
 
     combined_df = pd.merge(tw_df, sampled_df, on='column_name', how='outer')
     subset_combined_column_distribution_df = combined_df[(combined_df.tw_unique_values.notna()) & (combined_df.serials_unique_values.notna())]
-    subset_combined_column_distribution_df.to_csv(output_path, index=False)
+    if frame_exists(output_path):
+        subset_combined_column_distribution_df = carry_over_decisions(subset_combined_column_distribution_df, read_frame(output_path))
+    subset_combined_column_distribution_df = apply_schema(subset_combined_column_distribution_df, FEATURE_SCHEMA, SHARED_CATEGORIES)
+    write_frame(subset_combined_column_distribution_df, output_path)
+    save_input_hashes(manifest_path, input_hashes)
     return subset_combined_column_distribution_df
 
-def get_feature_type(row, console, categories):
+def carry_over_decisions(merged_df, previous_df):
     """
-    Get the feature type based on user input.
+    Copy the review decisions of the previous output onto the rebuilt merge for the columns whose merged data didn't change.
+    """
+    decision_columns = [col for col in DECISION_COLUMNS if col in previous_df.columns]
+    if len(decision_columns) == 0:
+        return merged_df
+    merged_columns = [col for col in merged_df.columns if col in previous_df.columns]
+    merged_hashes = key_hashes(merged_df[merged_columns], 'column_name')
+    previous_hashes = key_hashes(previous_df[merged_columns], 'column_name')
+    unchanged_columns = unchanged_keys(previous_hashes, merged_hashes)
+    print("Inputs changed: keeping decisions for {} of {} columns".format(len(unchanged_columns), len(merged_hashes)))
+
+    decisions = previous_df[previous_df.column_name.isin(unchanged_columns)].drop_duplicates(subset=['column_name']).set_index('column_name')[decision_columns]
+    merged_df = merged_df.copy()
+    for col in decision_columns:
+        merged_df[col] = merged_df.column_name.map(decisions[col])
+    return merged_df
+
+def load_column_mapping(mapping_path):
     """
-    input = console.input("Which category to use? (tw/serials) (default: {}, otherwise {}). OR press enter to ".format(row.tw_category, row.serials_category))
+    Load the MARC column mapping as a dict of cleaned column name to actual column name.
+    """
+    mapped_df = read_frame(mapping_path).drop_duplicates(subset=['cleaned_column_name'], keep='first')
+    return dict(zip(mapped_df.cleaned_column_name, mapped_df.column_name))
+
+def report_unmapped_columns(mismatch_df, column_mapping, console):
+    """
+    Report every mismatched column without a mapping in a single pass and return only the mapped ones.
+    """
+    is_mapped = mismatch_df.column_name.isin(column_mapping.keys())
+    unmapped_columns = mismatch_df[~is_mapped].column_name.tolist()
+    if len(unmapped_columns) > 0:
+        console.print("[red]{} columns have no MARC mapping and will be skipped: {}[/red]".format(len(unmapped_columns), ", ".join(map(str, unmapped_columns))))
+    return mismatch_df[is_mapped]
+
+def get_feature_type(row, console, categories, suggestion=None):
+    """
+    Get the feature type based on user input. With a `suggestion` from earlier decisions, the user can press a to accept it.
+    """
+    suggested_choice = prefill(suggestion, 'feature_choice')
+    accept = " a: suggested {}.".format(describe_suggestion(*suggestion['feature_choice'])) if suggested_choice is not None else ""
+    with think():
+        input = console.input("Which category to use? (tw/serials) (default: {}, otherwise {}).{} OR press enter to ".format(row.tw_category, row.serials_category, accept))
     if input == "tw":
         return row.tw_category
     elif input == "serials":
         return row.serials_category
+    elif input == "a" and suggested_choice is not None:
+        return chosen_feature_type(suggested_choice, row.tw_category, row.serials_category)
     elif input == "":
         return choose_from_categories(console, categories)
     return None
@@ -60,49 +115,92 @@ def choose_from_categories(console, categories):
     """
     Allow the user to choose from predefined categories.
     """
-    input = console.input("Select the correct feature type: {}. Press 1, 2, or 3 for the corresponding category. ".format(", ".join(categories)))
+    with think():
+        input = console.input("Select the correct feature type: {}. Press 1, 2, or 3 for the corresponding category. ".format(", ".join(categories)))
     return categories[int(input) - 1] if input in ["1", "2", "3"] else None
 
-def user_input_for_classification(row, console, categories):
-    """
-    Obtain user input for feature classification.
-    """
-    keep_feature = console.input("Is this a feature? (y/n) ") == "y"
+def user_input_for_classification(row, console, categories, view_values=None, suggestion=None):
+    """
+    Obtain user input for feature classification. If `view_values` is given, the user can press v to page through all values first.
+    With a `suggestion` from earlier decisions, pressing enter keeps the suggested answer.
+    """
+    suggested_keep = prefill(suggestion, 'keep_feature')
+    question = "Is this a feature? (y/n{}{}) ".format(", v to page through all values" if view_values is not None else "",
+                                                     ", enter for the suggested {}".format("y" if suggested_keep else "n") if suggested_keep is not None else "")
+    with think():
+        answer = console.input(question)
+    while answer == "v" and view_values is not None:
+        view_values()
+        with think():
+            answer = console.input(question)
+    keep_feature = answer == "y" or (answer == "" and suggested_keep is True)
     feature_type = None
     if keep_feature:
-        feature_type = get_feature_type(row, console, categories)
+        feature_type = get_feature_type(row, console, categories, suggestion)
     return keep_feature, feature_type
 
-def print_category_counts(df, classification, col, category, console):
+def print_category_counts(category_counts, classification, col, category, console, top=TOP_VALUES):
     """
-    Print value counts for a specific classification and category in a console table.
+    Print the top value counts for a specific classification and category in a console table, with the rest summed into an "other" row.
     """
-    table = Table(show_header=True, header_style="bold magenta")
-    table.add_column("Value", style="dim", width=12)
-    table.add_column("Count", justify="right")
-
-    for value, count in df[df.classification == classification][col].value_counts().items():
-        table.add_row(str(value), str(count))
-
+    value_counts, not_null = category_counts.get(classification, col)
     console.print("\n{} corpus, not null: {} and category: {}".format(
-        classification, df[df.classification == classification][col].notna().sum(), category))
-    console.print(table)
-
-def classify_features(mismatch_df, full_df, mapped_df, console, categories, output_path, subset_combined_column_distribution_df):
-    """
-    Classify features based on user input.
-    """
-    for index, row in mismatch_df.iterrows():
+        classification, not_null, category))
+    console.print(window_table(top_counts(value_counts, top), size=top + 1, column_style=None))
+
+def page_category_counts(category_counts, classifications, col, console):
+    """
+    Page through the value counts of every corpus side by side.
+    """
+    counts = pd.concat([category_counts.get(classification, col)[0] for classification in classifications], axis=1, keys=classifications).fillna(0).astype(int)
+    counts = counts.loc[counts.sum(axis=1).sort_values(ascending=False).index].rename_axis('value').reset_index()
+    TablePager(counts, console).show()
+
+def classify_features(mismatch_df, full_df, column_mapping, console, categories, journal, subset_combined_column_distribution_df):
+    """
+    Classify features based on user input. Decisions are appended to the journal instead of rewriting the output file.
+    `subset_combined_column_distribution_df` is expected to be indexed by column name.
+    """
+    def record_decision(column_name, keep_feature, feature_type, source=None):
+        # Bulk accepts and reviewed columns both go through here, and the suggester ignores decisions with a source
+        row = subset_combined_column_distribution_df.loc[column_name]
+        journal.record_many([(column_name, 'keep_feature', row.keep_feature, keep_feature), (column_name, 'feature_type', row.feature_type, feature_type)], source=source)
+        subset_combined_column_distribution_df.at[column_name, 'keep_feature'] = keep_feature
+        subset_combined_column_distribution_df.at[column_name, 'feature_type'] = feature_type
+        feature_choice = 'tw' if feature_type == row.tw_category else 'serials' if feature_type == row.serials_category else feature_type
+        suggester.observe(column_name, {'keep_feature': keep_feature, 'feature_choice': feature_choice}, source)
+
+    def accept_suggestion(column_name, values, source):
+        row = subset_combined_column_distribution_df.loc[column_name]
+        feature_type = chosen_feature_type(values['feature_choice'], row.tw_category, row.serials_category) if values['keep_feature'] else None
+        record_decision(column_name, values['keep_feature'], feature_type, source)
+
+    reviewed_columns = journal.reviewed_keys('feature_type')
+    # Columns like the ones already classified the same way are accepted in clusters, the rest get pre-filled answers.
+    # Columns bulk accepted in earlier sessions aren't learned from.
+    suggester = feature_suggester(subset_combined_column_distribution_df, journal.history())
+    pending_columns = [column for column in mismatch_df.column_name if column not in reviewed_columns]
+    reviewed_columns = reviewed_columns | (set(pending_columns) - set(bulk_accept(suggester, pending_columns, accept_suggestion, console, 'columns')))
+    category_counts = CategoryCountCache(full_df, ['third_world_serials', 'sampled_serials'])
+    # Only the columns still to be reviewed are prefetched
+    pending_columns = [column for column in pending_columns if column not in reviewed_columns]
+    pending_positions = {column: position for position, column in enumerate(pending_columns)}
+    for index, row in review('feature_review', mismatch_df.iterrows(), key=lambda item: item[1].column_name):
+        if row.column_name in reviewed_columns:
+            continue
         console.print("\nColumn: {} number {} out of {}".format(row.column_name, index, len(mismatch_df)))
-        actual_col = mapped_df[mapped_df.cleaned_column_name == row.column_name].column_name.values[0]
-        print_category_counts(full_df, 'third_world_serials', actual_col, row.tw_category, console)
-        print_category_counts(full_df, 'sampled_serials', actual_col, row.serials_category, console)
-        
-        keep_feature, feature_type = user_input_for_classification(row, console, categories)
-        subset_combined_column_distribution_df.loc[subset_combined_column_distribution_df.column_name == row.column_name, 'keep_feature'] = keep_feature
-        subset_combined_column_distribution_df.loc[subset_combined_column_distribution_df.column_name == row.column_name, 'feature_type'] = feature_type
+        actual_col = column_mapping[row.column_name]
+        position = pending_positions[row.column_name]
+        upcoming_columns = pending_columns[position + 1:position + 1 + PREFETCH_COLUMNS]
+        category_counts.prefetch([column_mapping[col] for col in upcoming_columns])
+        print_category_counts(category_counts, 'third_world_serials', actual_col, row.tw_category, console)
+        print_category_counts(category_counts, 'sampled_serials', actual_col, row.serials_category, console)
         
-        subset_combined_column_distribution_df.to_csv(output_path, index=False)
+        view_values = lambda: page_category_counts(category_counts, ['third_world_serials', 'sampled_serials'], actual_col, console)
+        keep_feature, feature_type = user_input_for_classification(row, console, categories, view_values, suggester.suggest(row.column_name))
+        with save():
+            record_decision(row.column_name, keep_feature, feature_type)
+    category_counts.close()
 
 
 
@@ -112,6 +210,8 @@ def classify_features(mismatch_df, full_df, mapped_df, console, categories, outp
 
 # Main Execution
 if __name__ == '__main__':
+    # Several reviewers can split the columns with --shard/--shards/--reviewer, see cleaning_utils/sharding.py
+    shard = ReviewShard.from_args(add_shard_arguments(argparse.ArgumentParser()).parse_args())
     console = Console()
     output_path = "../datasets/combined_column_distribution.csv"
     tw_path = "../datasets/tw_column_distribution.csv"
@@ -120,13 +220,13 @@ if __name__ == '__main__':
 
     mismatch_df = subset_combined_column_distribution_df[subset_combined_column_distribution_df.tw_category != subset_combined_column_distribution_df.serials_category][['column_name', 'tw_category', 'serials_category']]
 
-    full_df = pd.read_csv("../datasets/combined_classified_serials_dataset.csv")
-    full_df = full_df.applymap(safe_literal_eval)
+    column_mapping = load_column_mapping("../datasets/marc_column_mapping.csv")
+    mismatch_df = report_unmapped_columns(mismatch_df, column_mapping, console)
+    mismatch_df = mismatch_df[mismatch_df.column_name.isin(shard.select(mismatch_df.column_name))]
 
-    # Then replace empty strings with None
-    full_df = full_df.replace('', None)
-    full_df = full_df.replace(' ', None)
-    mapped_df = pd.read_csv("../datasets/marc_column_mapping.csv")
+    # Only read the columns this session will show, and parse their literals lazily on first access
+    session_columns = [column_mapping[col] for col in mismatch_df.column_name]
+    full_df = load_literal_frame("../datasets/combined_classified_serials_dataset.csv", columns=['classification'] + session_columns)
 
     categories = ["well suited for categorical", "could be categorical", "too many for categorical"]
 
@@ -136,4 +236,15 @@ if __name__ == '__main__':
     if 'feature_type' not in subset_combined_column_distribution_df.columns:
         subset_combined_column_distribution_df['feature_type'] = None
 
-    classify_features(mismatch_df, full_df, mapped_df, console, categories, output_path, subset_combined_column_distribution_df)
\ No newline at end of file
+    subset_combined_column_distribution_df, merged_columns = shard.replay_merged(subset_combined_column_distribution_df, output_path, 'column_name', 'feature_type')
+    mismatch_df = mismatch_df[~mismatch_df.column_name.isin(merged_columns)]
+    journal = DecisionJournal(shard.journal_path(output_path), key_field='column_name')
+    subset_combined_column_distribution_df = journal.replay(subset_combined_column_distribution_df)
+    subset_combined_column_distribution_df = subset_combined_column_distribution_df.set_index('column_name', drop=False).rename_axis(None)
+
+    classify_features(mismatch_df, full_df, column_mapping, console, categories, journal, subset_combined_column_distribution_df)
+    if shard.enabled:
+        # Each reviewer keeps their own journal until the shards are merged
+        journal.close()
+    else:
+        journal.compact(subset_combined_column_distribution_df, output_path)
\ No newline at end of file
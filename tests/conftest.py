@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# cleaning_utils is imported from the repository root and the synthetic data from the benchmarks folder
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
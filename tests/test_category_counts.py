@@ -0,0 +1,16 @@
+import pandas as pd
+import pytest
+from cleaning_utils.category_counts import CategoryCountCache
+
+
+def test_a_failed_prefetch_is_raised_when_its_counts_are_requested():
+    cache = CategoryCountCache(pd.DataFrame({'classification': ['tw', 'serials'], 'x': [1, 2]}), ['tw', 'serials'])
+    cache.prefetch(['missing', 'x'])
+
+    with pytest.raises(KeyError):
+        cache.get('tw', 'missing')
+    # It is computed again rather than kept failed
+    with pytest.raises(KeyError):
+        cache.get('tw', 'missing')
+    assert cache.get('tw', 'x')[1] == 1
+    cache.close()
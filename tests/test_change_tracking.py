@@ -0,0 +1,21 @@
+import pandas as pd
+from cleaning_utils.change_tracking import incremental_apply
+
+
+def test_changed_parameters_recompute_every_key(tmp_path):
+    df = pd.DataFrame({'full_name': ['a', 'b'], 'size': [1, 2]})
+    output_path = str(tmp_path / 'stage.csv')
+    calls = []
+
+    def stage(suffix):
+        def stage_function(stage_df):
+            calls.append(sorted(stage_df.full_name))
+            return stage_df.assign(label=stage_df.full_name + suffix)
+        return stage_function
+
+    incremental_apply(df, 'full_name', stage('-1'), output_path, parameters={'version': 1})
+    incremental_apply(df.assign(size=[1, 3]), 'full_name', stage('-1'), output_path, parameters={'version': 1})
+    output = incremental_apply(df.assign(size=[1, 3]), 'full_name', stage('-2'), output_path, parameters={'version': 2})
+
+    assert calls == [['a', 'b'], ['b'], ['a', 'b']]
+    assert sorted(output.label) == ['a-2', 'b-2']
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+from synthetic_data import search_query_join
+from cleaning_utils.consolidation import LANGUAGE_FIELDS, check_consolidation_parity, consolidate_language_data
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA, apply_schema
+
+
+def fill_missing_language_data(rows, is_repo):
+    """
+    `fill_missing_language_data` from check_clean_search_results.py without its prints. The script imports
+    data_generation_scripts at module level, so it can't be imported here.
+    """
+    detected_language = rows[rows.detected_language.notnull()].detected_language.unique()
+    rows.detected_language = detected_language[0] if len(detected_language) > 0 else None
+    detected_language_confidence = rows[rows.detected_language_confidence.notnull()].detected_language_confidence.unique()
+    if len(detected_language_confidence) > 1:
+        detected_language_confidence = [rows[rows.detected_language_confidence.notnull()].detected_language_confidence.max()]
+    rows.detected_language_confidence = detected_language_confidence[0] if len(detected_language_confidence) > 0 else None
+    finalized_language = rows[rows.finalized_language.notna()].finalized_language.unique()
+    if len(finalized_language) > 1:
+        finalized_language = [lang for lang in finalized_language if lang != None]
+    rows.finalized_language = finalized_language[0] if len(finalized_language) > 0 else None
+    keep_resource = rows[rows.keep_resource.notna()].keep_resource.unique()
+    rows.keep_resource = keep_resource[0] if len(keep_resource) > 0 else None
+    return rows
+
+
+def comparable(df):
+    df = df.sort_index()[LANGUAGE_FIELDS].astype(object)
+    return df.where(df.notna(), None)
+
+
+@pytest.mark.parametrize('key_field', ['full_name', 'login'])
+@pytest.mark.parametrize('schema', [None, SEARCH_QUERY_SCHEMA])
+def test_consolidation_matches_fill_missing_language_data(key_field, schema):
+    search_df = search_query_join(1200, key_field, seed=7)
+    # Some rows without a key, which both versions drop
+    search_df.loc[search_df.index % 97 == 0, key_field] = None
+    if schema is not None:
+        search_df = apply_schema(search_df, schema)
+    keyed_df = search_df[search_df[key_field].notna()]
+
+    expected = keyed_df.groupby(keyed_df[key_field].rename(None), group_keys=False).apply(fill_missing_language_data, is_repo=key_field == 'full_name')
+    actual, _ = consolidate_language_data(search_df, key_field)
+
+    pd.testing.assert_frame_equal(comparable(actual), comparable(expected))
+    assert check_consolidation_parity(keyed_df, key_field, fill_missing_language_data, is_repo=key_field == 'full_name').empty
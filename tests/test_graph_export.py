@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from synthetic_data import ischool_people
+from cleaning_utils.graph_export import PeopleGraph
+
+
+def sorted_edges(edges):
+    return edges.sort_values(['source', 'target']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('missing_group', [None, 'nan'])
+def test_patched_graph_matches_rebuilt_graph(missing_group):
+    before = ischool_people(400, seed=2)
+    graph = PeopleGraph.from_frame(before, missing_group)
+    graph.projected_edges()
+
+    after = before.copy()
+    rows = np.random.default_rng(2).choice(len(before), 30, replace=False)
+    after.loc[rows[:10], 'committee_title'] = None
+    after.loc[rows[10:20], 'research_area'] = 'Digital Humanities'
+    after.loc[rows[20:], 'name'] = after.loc[rows[20:], 'name'] + ' Jr'
+    assert graph.patch(before, after) == 30
+
+    rebuilt = PeopleGraph.from_frame(after, missing_group)
+    pd.testing.assert_frame_equal(sorted_edges(graph.edges), sorted_edges(rebuilt.edges))
+    pd.testing.assert_frame_equal(sorted_edges(graph.projected), sorted_edges(rebuilt.projected_edges()))
+
+
+def test_people_without_groups_are_isolated_nodes():
+    df = pd.DataFrame({'name': ['A', 'B', 'C'], 'description': None, 'url': None, 'research_area': ['Data Curation', 'Data Curation', None],
+                       'research_description': None, 'research_url': None, 'committee_title': None})
+    graph = PeopleGraph.from_frame(df, missing_group=None)
+    assert set(graph.nodes[graph.nodes.bipartite == 0].id) == {'A', 'B', 'C'}
+    assert graph.projected_edges()[['source', 'target', 'weight']].values.tolist() == [['A', 'B', 1]]
+
+    # By default missing groups are a "nan" node without attributes, as in the notebook's NetworkX graph
+    notebook_graph = PeopleGraph.from_frame(df)
+    assert notebook_graph.nodes.id.tolist().count('nan') == 1
+    assert notebook_graph.nodes[notebook_graph.nodes.id == 'nan'].drop(columns='id').isna().all(axis=None)
+    assert sorted_edges(notebook_graph.projected_edges()).values.tolist() == [['A', 'B', 2], ['A', 'C', 1], ['B', 'C', 1]]
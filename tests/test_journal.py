@@ -0,0 +1,45 @@
+import pytest
+from synthetic_data import search_query_join
+from cleaning_utils.daemon import WarmReview
+from cleaning_utils.journal import DecisionJournal, JournalLockedError
+from cleaning_utils.storage import write_frame
+
+
+@pytest.fixture
+def join_path(tmp_path):
+    return write_frame(search_query_join(200, seed=4), str(tmp_path / 'join.csv'))
+
+
+def test_a_second_writer_is_refused_while_a_journal_is_open(tmp_path):
+    path = str(tmp_path / 'out.csv.journal.jsonl')
+    journal = DecisionJournal(path, key_field='full_name')
+    journal.record('entity/1', 'finalized_language', None, 'en')
+
+    with pytest.raises(JournalLockedError):
+        DecisionJournal(path, key_field='full_name').record('entity/1', 'finalized_language', None, 'fr')
+    # Reading is still allowed
+    assert len(DecisionJournal(path, lock=False).entries()) == 1
+
+    journal.close()
+    DecisionJournal(path, key_field='full_name').record('entity/2', 'finalized_language', None, 'fr')
+    assert len(DecisionJournal(path, lock=False).entries()) == 2
+
+
+def test_the_daemon_keeps_its_journal_locked_until_the_file_is_closed(join_path):
+    warm = WarmReview(join_path, 'repos')
+    script_journal = DecisionJournal(join_path + '.journal.jsonl', key_field='full_name')
+    with pytest.raises(JournalLockedError):
+        script_journal.replay(warm.session.df.copy())
+
+    key = warm.session.keys()[0]
+    warm.decide('review', key, {'finalized_language': 'en'})
+    warm.save()
+    # Saving compacts and removes the journal, but the lock stays with the daemon
+    with pytest.raises(JournalLockedError):
+        script_journal.record(key, 'finalized_language', 'en', 'fr')
+    warm.decide('review', warm.session.keys()[1], {'finalized_language': 'fr'})
+    warm.close()
+
+    script_journal.record(key, 'finalized_language', 'en', 'fr')
+    script_journal.close()
+    assert [entry['new_value'] for entry in DecisionJournal(join_path + '.journal.jsonl', lock=False).entries()] == ['fr', 'fr']
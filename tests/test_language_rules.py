@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+from cleaning_utils.language_rules import LANGUAGE_RULES, apply_language_rules
+
+# A row that no rule matches: languages that differ, a confident detection, and a long description and bio
+NEUTRAL = {'detected_language': 'de', 'natural_language': 'es', 'finalized_language': None, 'detected_language_confidence': 0.9,
+           'description': 'x' * 40, 'bio': 'x' * 40, 'size': 5, 'keep_resource': True}
+
+
+def rule_frame(join_field, **values):
+    """The rule's row for entity a, next to a neutral row for entity b"""
+    return pd.DataFrame([{join_field: 'a', **NEUTRAL, **values}, {join_field: 'b', **NEUTRAL}])
+
+
+@pytest.mark.parametrize('join_field, values, column, expected, fired', [
+    ('full_name', {'detected_language': 'en'}, 'finalized_language', 'en', {'english detected': 1}),
+    ('full_name', {'detected_language': 'es'}, 'finalized_language', 'es', {'natural matches detected': 1}),
+    ('full_name', {'detected_language': 'zh-cn', 'natural_language': 'zh'}, 'finalized_language', 'zh-cn', {'chinese': 1}),
+    ('full_name', {'detected_language': 'fr', 'natural_language': 'fr, en'}, 'finalized_language', 'fr', {'french': 1}),
+    ('login', {'detected_language': 'zu', 'natural_language': 'xh, zu'}, 'finalized_language', 'zu', {'xhosa/zulu': 1}),
+    ('full_name', {'detected_language_confidence': 0.2}, 'finalized_language', None, {'low confidence': 1}),
+    ('full_name', {'description': 'short'}, 'finalized_language', None, {'short description': 1}),
+    ('full_name', {'detected_language': None, 'description': None}, 'finalized_language', None, {'no description': 1}),
+    ('full_name', {'detected_language': None, 'description': None, 'size': 0}, 'keep_resource', False, {'no description': 1, 'empty repo': 1}),
+    ('login', {'bio': 'short'}, 'finalized_language', None, {'short bio': 1}),
+    ('login', {'detected_language': None, 'bio': None}, 'finalized_language', None, {'no bio': 1}),
+])
+def test_each_rule_assigns_its_column(join_field, values, column, expected, fired):
+    df, report = apply_language_rules(rule_frame(join_field, **values), join_field)
+
+    assert df[column].tolist() == [expected, NEUTRAL[column]]
+    # Rules for the other join field are skipped and left out of the report
+    assert report.rule.tolist() == [rule.name for rule in LANGUAGE_RULES if rule.join_field in (None, join_field)]
+    assert report[report.rows > 0].set_index('rule').rows.to_dict() == fired
+
+
+def test_overwrite_rules_reassign_every_matching_row_of_an_unassigned_entity():
+    df = pd.DataFrame([
+        {'full_name': 'a', **NEUTRAL, 'detected_language': 'zh-cn', 'natural_language': 'zh', 'finalized_language': 'en'},
+        {'full_name': 'a', **NEUTRAL, 'detected_language': 'zh-tw', 'natural_language': 'zh'},
+        # Entity b was fully reviewed, so it keeps its language
+        {'full_name': 'b', **NEUTRAL, 'detected_language': 'zh-cn', 'natural_language': 'zh', 'finalized_language': 'en'},
+    ])
+    df, report = apply_language_rules(df, 'full_name')
+
+    assert df.finalized_language.tolist() == ['zh-cn', 'zh-tw', 'en']
+    assert report.set_index('rule').rows['chinese'] == 2
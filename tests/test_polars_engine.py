@@ -0,0 +1,30 @@
+import pytest
+from synthetic_data import search_query_join
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA, apply_schema
+from cleaning_utils.search_queries import normalize_search_query
+
+pytest.importorskip('polars')
+from cleaning_utils.polars_engine import check_engine_parity
+
+
+def search_queries(key_field, schema):
+    search_df = search_query_join(3000, key_field, seed=5)
+    search_df.loc[search_df.index % 53 == 0, key_field] = None
+    search_df.loc[search_df.index % 7 == 0, 'search_query_time'] = None
+    search_df['cleaned_search_query'] = normalize_search_query(search_df['search_query'])
+    # Normalizing drops the quotes, so the rows `fix_entity_results` fixes are made by hand
+    fix_rows = (search_df.index % 11 == 0) & (search_df.search_term_source == 'Digital Humanities')
+    search_df.loc[fix_rows, 'cleaned_search_query'] = 'https://api.github.com/search/repositories?q="Humanities"'
+    return search_df if schema is None else apply_schema(search_df, schema)
+
+
+@pytest.mark.parametrize('key_field', ['full_name', 'login'])
+@pytest.mark.parametrize('dedupe_by_time', [False, True])
+@pytest.mark.parametrize('schema', [None, SEARCH_QUERY_SCHEMA])
+def test_engines_give_the_same_rows(key_field, dedupe_by_time, schema):
+    search_df = search_queries(key_field, schema)
+    assert search_df[key_field].isna().any()
+    assert search_df.search_query_time.isna().any()
+    assert search_df.cleaned_search_query.str.contains('q="Humanities"', regex=False).any()
+
+    assert check_engine_parity(search_df, key_field, dedupe_by_time).empty
@@ -0,0 +1,19 @@
+import threading
+import pandas as pd
+from cleaning_utils.review_driver import ReviewDriver
+
+
+def test_records_are_prepared_from_snapshots_taken_on_the_iterating_thread():
+    df = pd.DataFrame({'value': range(10)})
+    snapshot_threads = set()
+
+    def snapshot(index):
+        snapshot_threads.add(threading.get_ident())
+        return df.loc[index].copy()
+
+    for _, index, record in ReviewDriver(list(df.index), lambda row: int(row.value), snapshot, prefetch=3):
+        assert record == index
+        # The review writes to the current record's row on the main thread
+        df.loc[index, 'value'] = -1
+
+    assert snapshot_threads == {threading.get_ident()}
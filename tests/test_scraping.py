@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from cleaning_utils.scraping import scrape_ischool_people
+from cleaning_utils.storage import read_frame, resolve_path
+
+# Served as /research/areas, /people/committees and /areas/digital-humanities, in the markup the parsers expect
+FIXTURE_PAGES = {
+    'research/areas': """<html><body><ul>
+        <li class="taxonomy-term"><a class="taxonomy-term__link" href="/areas/digital-humanities">Digital Humanities</a>
+        <div class="taxonomy-term__description">Computational methods in the humanities</div></li>
+    </ul></body></html>""",
+    'people/committees': """<html><body><div class="text-plus-image__noimage">
+        <p><strong>Faculty Affairs</strong> Ted Underwood (Chair), Maria Garcia</p>
+    </div></body></html>""",
+    'areas/digital-humanities': """<html><body><ul>
+        <li class="personnel-list__person-item"><a class="personnel-list__person-link" href="/people/jana-diesner">
+            <div class="personnel-list__person-name">Jana Diesner</div><div class="personnel-list__person-role">Professor</div></a></li>
+        <li class="personnel-list__person-item"><a class="personnel-list__person-link" href="/people/ted-underwood">
+            <div class="personnel-list__person-name">Ted Underwood</div><div class="personnel-list__person-role">Professor</div></a></li>
+    </ul></body></html>""",
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    directory = tmp_path / 'site'
+    for path, page in FIXTURE_PAGES.items():
+        os.makedirs(directory / os.path.dirname(path), exist_ok=True)
+        (directory / path).write_text(page, encoding='utf-8')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_rescrape_only_downloads_changed_pages(site, tmp_path):
+    output_path = str(tmp_path / 'out.csv')
+    cache_directory = str(tmp_path / 'cache')
+
+    all_df, stats = asyncio.run(scrape_ischool_people(output_path, cache_directory, base_url=site))
+    assert stats == {'downloaded': 3, 'not_modified': 0, 'retried': 0}
+    rows = all_df.sort_values('name')[['name', 'description', 'research_area', 'committee_title']].astype(object)
+    assert rows.where(rows.notna(), None).values.tolist() == [
+        ['Jana Diesner', 'Professor', 'Digital Humanities', None],
+        ['Maria Garcia', None, None, 'Faculty Affairs'],
+        ['Ted Underwood', 'Professor', 'Digital Humanities', 'Faculty Affairs'],
+    ]
+    assert all_df.url.dropna().tolist() == [f"{site}/people/jana-diesner", f"{site}/people/ted-underwood"]
+
+    rescraped_df, stats = asyncio.run(scrape_ischool_people(output_path, cache_directory, base_url=site))
+    assert stats == {'downloaded': 0, 'not_modified': 3, 'retried': 0}
+    assert rescraped_df.equals(all_df)
+
+    # The output is written where it was asked for, next to the streamed people records
+    assert resolve_path(output_path) == output_path
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'out.csv', 'out.people.csv', 'site']
+    assert len(read_frame(output_path)) == 3
+    assert len(read_frame(str(tmp_path / 'out.people.csv'))) == 2
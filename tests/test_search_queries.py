@@ -0,0 +1,32 @@
+import random
+import pandas as pd
+from cleaning_utils.search_queries import normalize_query, normalize_search_query
+
+# Pieces that overlap the patterns the old chain replaces, so partial and adjacent matches come up often
+QUERY_PIECES = ['%22', '"', '%3A', '%3a', '&page', '&page=2', '%2', '%', '2', '3A', ':', '&', 'page', '=', 'q=', '+',
+                'Digital', 'Humanities', 'é', '数字', ' ', 'https://api.github.com/search/repositories?']
+
+
+def old_normalize_query(query):
+    return query.replace('%22', '"').replace('"', '').replace('%3A', ':').split('&page')[0]
+
+
+def random_queries(count, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(QUERY_PIECES) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+
+def test_normalize_search_query_matches_the_old_chain():
+    queries = random_queries(20000, seed=10)
+    # Repeated queries go through the cache of distinct values
+    queries += queries[:500]
+    normalized = normalize_search_query(pd.Series(queries, dtype=object))
+    for query, value in zip(queries, normalized):
+        assert value.encode() == old_normalize_query(query).encode(), query
+        assert normalize_query(query).encode() == old_normalize_query(query).encode(), query
+
+
+def test_normalize_search_query_keeps_missing_queries():
+    normalized = normalize_search_query(pd.Series(['q=%22a%22&page=2', None], dtype=object))
+    assert normalized[0] == 'q=a'
+    assert pd.isna(normalized[1])
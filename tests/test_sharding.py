@@ -0,0 +1,17 @@
+from cleaning_utils.journal import DecisionJournal
+from cleaning_utils.sharding import ReviewShard, merge_shard_journals
+
+
+def test_conflicts_name_reviewers_with_dots(tmp_path):
+    output_path = str(tmp_path / 'search_queries.v2.csv')
+    shard_paths = []
+    for shard, reviewer, language in [(0, 'jane.doe', 'fr'), (1, 'john.doe', 'en')]:
+        path = ReviewShard(shard, 2, reviewer).journal_path(output_path)
+        journal = DecisionJournal(path, key_field='full_name')
+        journal.record('entity/1', 'finalized_language', None, language)
+        journal.close()
+        shard_paths.append(path)
+
+    merged, conflicts = merge_shard_journals(output_path + '.journal.jsonl', shard_paths, policy='flag')
+    assert merged == 0
+    assert sorted(conflicts.reviewer) == ['jane.doe', 'john.doe']
@@ -0,0 +1,19 @@
+import pandas as pd
+import pytest
+from cleaning_utils.storage import AmbiguousFrameError, STORAGE_FORMAT_VARIABLE, read_frame, write_frame
+
+
+def test_the_storage_format_setting_picks_between_a_csv_and_its_copy(tmp_path, monkeypatch):
+    path = str(tmp_path / 'frame.csv')
+    write_frame(pd.DataFrame({'value': [1]}), path, format='parquet')
+    assert read_frame(path).value.tolist() == [1]
+
+    # The CSV is written last, but a newer file doesn't decide which one is read
+    write_frame(pd.DataFrame({'value': [2]}), path)
+    with pytest.raises(AmbiguousFrameError):
+        read_frame(path)
+
+    monkeypatch.setenv(STORAGE_FORMAT_VARIABLE, 'parquet')
+    assert read_frame(path).value.tolist() == [1]
+    monkeypatch.setenv(STORAGE_FORMAT_VARIABLE, 'csv')
+    assert read_frame(path).value.tolist() == [2]
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+from synthetic_data import search_query_join
+from cleaning_utils.language_rules import apply_language_rules
+from cleaning_utils.schema import SEARCH_QUERY_SCHEMA, apply_schema
+from cleaning_utils.search_queries import normalize_search_query, prepare_entity_search_queries
+from cleaning_utils.storage import iter_frame_chunks, read_frame, write_frame
+from cleaning_utils.streaming import HashPartitioner, frames_match, stream_entities
+
+
+def clean_entities(df, key_field):
+    """
+    The per-entity steps of `stream_verify_results` that run here. Language detection isn't available, but its
+    float64 confidences are, so the output only matches if the schema is applied again at the end.
+    """
+    df, _ = prepare_entity_search_queries(df, key_field, dedupe_by_time=True)
+    df['detected_language_confidence'] = df['detected_language_confidence'].astype('float64')
+    df, _ = apply_language_rules(df, key_field)
+    return apply_schema(df.drop_duplicates(subset=[key_field, 'cleaned_search_query']), SEARCH_QUERY_SCHEMA)
+
+
+def normalized(df):
+    df['cleaned_search_query'] = normalize_search_query(df['search_query'])
+    return df
+
+
+@pytest.mark.parametrize('key_field', ['full_name', 'login'])
+def test_streamed_output_matches_in_memory_output(tmp_path, key_field):
+    input_path = write_frame(search_query_join(5000, key_field, seed=3), str(tmp_path / 'join.csv'))
+
+    in_memory = clean_entities(normalized(read_frame(input_path, schema=SEARCH_QUERY_SCHEMA)), key_field)
+    in_memory = in_memory[in_memory[key_field].notna()]
+    in_memory.to_csv(tmp_path / 'in_memory.csv', index=False)
+    chunks = (normalized(chunk) for chunk in iter_frame_chunks(input_path, 700, schema=SEARCH_QUERY_SCHEMA))
+    rows = stream_entities(chunks, key_field, lambda df: clean_entities(df, key_field), str(tmp_path / 'streamed.csv'), partitions=8, directory=str(tmp_path / 'partitions'))
+
+    assert rows == len(in_memory)
+    assert frames_match(pd.read_csv(tmp_path / 'in_memory.csv'), pd.read_csv(tmp_path / 'streamed.csv'))
+
+
+def test_stage_output_keeps_the_schema_dtypes():
+    df = clean_entities(normalized(apply_schema(search_query_join(500, seed=1), SEARCH_QUERY_SCHEMA)), 'full_name')
+    assert df.detected_language_confidence.dtype == 'float32'
+    assert df.keep_resource.dtype == 'boolean'
+
+
+@pytest.mark.parametrize('partitions', [1, 2])
+def test_overwrite_rules_dont_depend_on_the_partitioning(tmp_path, partitions):
+    # The chinese rule overwrites, and only b has an unassigned row for it
+    df = pd.DataFrame({'full_name': ['a', 'b'], 'detected_language': ['zh-cn', 'zh-tw'], 'natural_language': 'zh',
+                       'finalized_language': ['en', None], 'detected_language_confidence': 0.9, 'description': 'x' * 40, 'size': 5})
+    assert len(set(HashPartitioner('full_name', partitions).partition_ids(df.full_name))) == partitions
+
+    in_memory, _ = apply_language_rules(df.copy(), 'full_name')
+    stream_entities([df], 'full_name', lambda partition: apply_language_rules(partition, 'full_name')[0], str(tmp_path / 'streamed.csv'), partitions=partitions)
+
+    assert in_memory.finalized_language.tolist() == ['en', 'zh-tw']
+    assert frames_match(in_memory.astype(str), pd.read_csv(tmp_path / 'streamed.csv').astype(str))
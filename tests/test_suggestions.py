@@ -0,0 +1,66 @@
+import pandas as pd
+from cleaning_utils.journal import DecisionJournal
+from cleaning_utils.review_session import ReviewSession
+from cleaning_utils.suggestions import BULK_ACCEPT_SOURCE, bulk_accept, language_suggester
+
+
+def search_queries():
+    return pd.DataFrame({
+        'full_name': ['a/reviewed', 'b/reviewed', 'c/rule', 'd/pending', 'e/pending'],
+        'detected_language': ['fr', 'fr', 'en', 'fr', 'en'],
+        'natural_language': ['fr', 'fr', 'en', 'fr', 'en'],
+        'search_term_source': 'Digital Humanities',
+        'finalized_language': [None, None, 'en', None, None],
+        'keep_resource': True,
+    })
+
+
+def test_language_suggester_learns_from_journaled_decisions_only(tmp_path):
+    df = search_queries()
+    journal = DecisionJournal(str(tmp_path / 'out.csv.journal.jsonl'), key_field='full_name')
+    session = ReviewSession(df, 'full_name', journal=journal)
+    session.set_many('a/reviewed', {'finalized_language': 'fr', 'keep_resource': False})
+    # Compacted decisions are still learned from, through the history
+    journal.compact(session.df, str(tmp_path / 'out.csv'))
+    session.set_many('b/reviewed', {'finalized_language': 'fr', 'keep_resource': False})
+    # Not a reviewer decision
+    session.resolve_unambiguous(['e/pending'], 'finalized_language', 'detected_language')
+
+    suggester = language_suggester(session.df, 'full_name', journal.history())
+    language, confidence, support, source = suggester.suggest('d/pending')['finalized_language']
+    assert (language, support, source) == ('fr', 2, 'exact')
+    assert suggester.suggest('d/pending')['keep_resource'][0] is False
+    # c/rule's language came from a rule and e/pending's from resolve_unambiguous, so nothing was decided for en
+    assert suggester.suggest('e/pending')['finalized_language'][3] == 'model'
+    assert set(suggester.models['finalized_language'].class_counts) == {'fr'}
+
+
+class AcceptingConsole:
+    def print(self, *args):
+        pass
+
+    def input(self, prompt):
+        return 'y'
+
+
+def test_bulk_accepted_values_are_not_learned_from(tmp_path):
+    df = search_queries()
+    journal = DecisionJournal(str(tmp_path / 'out.csv.journal.jsonl'), key_field='full_name')
+    session = ReviewSession(df, 'full_name', journal=journal)
+    for key in ['a/reviewed', 'b/reviewed']:
+        session.set_many(key, {'finalized_language': 'fr', 'keep_resource': False})
+    suggester = language_suggester(session.df, 'full_name', journal.history())
+
+    def accept(key, values, source):
+        session.set_many(key, values, source)
+        suggester.observe(key, values, source)
+
+    # d/pending has the same signature as the reviewed repos, so its cluster is confident enough
+    remaining = bulk_accept(suggester, ['d/pending', 'e/pending'], accept, AcceptingConsole(), 'repos', confidence=0.7)
+    assert remaining == ['e/pending']
+    assert session.get('d/pending', 'finalized_language').tolist() == ['fr']
+    assert {entry.get('source') for entry in journal.entries() if entry['row_key'] == 'd/pending'} == {BULK_ACCEPT_SOURCE}
+
+    # Neither this session's suggester nor the next one counts the accepted repo as a decision
+    assert suggester.suggest('d/pending')['finalized_language'][2] == 2
+    assert language_suggester(session.df, 'full_name', journal.history()).suggest('d/pending')['finalized_language'][2] == 2